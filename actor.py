@@ -1,5 +1,6 @@
 from typing import Tuple, Optional
 from time import time
+from weakref import WeakKeyDictionary
 
 import numpy as np
 
@@ -43,22 +44,38 @@ class Actor:
 
         self.__name_s = str(name_s)
 
+        # Cached transforms. None means dirty.
+        self.__localMat = None
+        self.__worldMat = None
+        self.__worldXYZ_t = None
+
         self.__parent = None
+        self.__children_l = []
         self.setParent(parent)
 
         self.__pos_l = [ float(initPos[0]), float(initPos[1]), float(initPos[2]) ]
         self.__angles_l = [mm.Angle(0, static_b), mm.Angle(0, static_b), mm.Angle(0, static_b)]
         self.__scales_l = [1.0, 1.0, 1.0]
 
+        for angle in self.__angles_l:
+            angle.setOnChange(self.markTransformDirty)
+
         self.__static_b = bool(static_b)
 
         self.__lastUpdateTime_f = time()
 
+        if self.__static_b:  # Static actors never move, so their matrices are made only once.
+            self.getModelMatrix()
+            self.getWorldXYZ()
+
     ######## Getters for private attributes ########
 
     def getParent(self) -> "Actor":
         return self.__parent
 
+    def getChildren(self) -> Tuple["Actor", ...]:
+        return tuple(self.__children_l)
+
     def getPosX(self) -> float:
         return self.__pos_l[0]
 
@@ -102,36 +119,62 @@ class Actor:
 
     def setParent(self, parent:"Actor") -> None:
         if parent is None:
-            self.__parent = None
+            pass
         elif not isinstance(parent, Actor):
             raise ValueError( "Invalid type for being a parent: {}".format(type(parent)) )
-        else:
-            if self.getStatic() and not parent.getStatic():
-                raise InvalidForStaticActor(self.getName())
-            else:
-                self.__parent = parent
-                if self.getHierarchicalDepth() == -1:
-                    raise RecursiveHierarchy
+        elif self.getStatic() and not parent.getStatic():
+            raise InvalidForStaticActor(self.getName())
+
+        oldParent = self.__parent
+        self.__parent = parent
+        if self.getHierarchicalDepth() == -1:
+            self.__parent = oldParent
+            raise RecursiveHierarchy(self.getName())
+
+        if oldParent is not None:
+            oldParent.__children_l.remove(self)
+        if parent is not None:
+            parent.__children_l.append(self)
+
+        self.__markWorldDirty()
+
+    def setName(self, name_s:str) -> None:
+        """
+        Levels index their objects by name, so objects in a level must be renamed with Level.renameObject.
+        """
+        self.__name_s = str(name_s)
 
     def setPosX(self, x:float) -> None:
         if self.getStatic():
             raise InvalidForStaticActor(self.getName())
         self.__pos_l[0] = float(x)
+        self.markTransformDirty()
 
     def setPosY(self, y:float) -> None:
         if self.getStatic():
             raise InvalidForStaticActor(self.getName())
         self.__pos_l[1] = float(y)
+        self.markTransformDirty()
 
     def setPosZ(self, z:float) -> None:
         if self.getStatic():
             raise InvalidForStaticActor(self.getName())
         self.__pos_l[2] = float(z)
+        self.markTransformDirty()
+
+    def setPosXYZ(self, x:float, y:float, z:float) -> None:
+        if self.getStatic():
+            raise InvalidForStaticActor(self.getName())
+        self.__pos_l[0] = float(x)
+        self.__pos_l[1] = float(y)
+        self.__pos_l[2] = float(z)
+        self.markTransformDirty()
 
     def setScaleXYZ(self, x, y, z):
         self.__scales_l[0] = float(x)
         self.__scales_l[1] = float(y)
         self.__scales_l[2] = float(z)
+        self.markTransformDirty()
 
     ######## Getters for private arribs without accessing tham ########
 
@@ -145,6 +188,9 @@ class Actor:
         return self.getScaleX(), self.getScaleY(), self.getScaleZ()
 
     def getWorldXYZ(self) -> Tuple[float, float, float]:
+        if self.__worldXYZ_t is not None:
+            return self.__worldXYZ_t
+
         xWorld_f, yWorld_f, zWorld_f = self.getPosXYZ()
 
         parent = self.getParent()
@@ -154,7 +200,8 @@ class Actor:
             yWorld_f += yParent_f
             zWorld_f += zParent_f
 
-        return xWorld_f, yWorld_f, zWorld_f
+        self.__worldXYZ_t = (xWorld_f, yWorld_f, zWorld_f)
+        return self.__worldXYZ_t
 
     def getWorldAngleXYZ(self) -> Tuple[mm.Angle, mm.Angle, mm.Angle]:
         xAngle = self.getAngleX()
@@ -174,17 +221,25 @@ class Actor:
         xAngle, yAngle, zAngle = self.getWorldAngleXYZ()
         return xAngle.getDegree(), yAngle.getDegree(), zAngle.getDegree()
 
+    def getLocalMatrix(self) -> np.ndarray:
+        if self.__localMat is None:
+            self.__localMat = makeLocalMatrix(self.getScaleXYZ(), self.getAngleXYZ(), self.getPosXYZ())
+        return self.__localMat
+
     def getModelMatrix(self) -> np.ndarray:
-        a = mm.getScaleMat4(*self.getScaleXYZ()).dot(
-            mm.getRotateXYZMat4(1, self.getAngleX().getDegree(), self.getAngleY().getDegree(), self.getAngleZ().getDegree())
-        ).dot(
-            mm.getTranslateMat4(*self.getPosXYZ())
-        )
+        """
+        Returned array is cached and shared, so do not modify it in place.
+        """
+        if self.__worldMat is None:
+            a = self.getLocalMatrix()
 
-        if self.getParent() is not None:
-            a = a.dot(self.getParent().getModelMatrix())
+            if self.getParent() is not None:
+                a = a.dot(self.getParent().getModelMatrix())
+                a.flags.writeable = False
 
-        return a
+            self.__worldMat = a
+
+        return self.__worldMat
 
     ######## Setters for private arribs without accessing tham ########
 
@@ -193,6 +248,31 @@ class Actor:
         self.getAngleY().setDegree(yDegree_f)
         self.getAngleZ().setDegree(zDegree_f)
 
+    ######## Cache invalidation ########
+
+    def onTransformChanged(self) -> None:
+        """
+        Called whenever world transform of this actor gets out of date.
+        Override this to get notified, for example to update spatial structures.
+        """
+        pass
+
+    def markTransformDirty(self) -> None:
+        self.__localMat = None
+        self.__markWorldDirty()
+
+    def __markWorldDirty(self) -> None:
+        hadCache_b = self.__worldMat is not None or self.__worldXYZ_t is not None
+        self.__worldMat = None
+        self.__worldXYZ_t = None
+
+        self.onTransformChanged()
+
+        # A clean child always has clean parents, so if nothing was cached here, children are already dirty.
+        if hadCache_b:
+            for child in self.__children_l:
+                child.__markWorldDirty()
+
     ######## Tools to move ########
 
     def moveAround(self, directionVec4, distance_f:float) -> None:
@@ -234,8 +314,30 @@ class ActorGeneral:
         self.__angles_l = [mm.Angle(0, static_b), mm.Angle(0, static_b), mm.Angle(0, static_b)]
         self.__scales_l = [1.0, 1.0, 1.0]
 
+        for angle in self.__angles_l:
+            angle.setOnChange(self.markTransformDirty)
+
+        # ActorGeneral is shared by many parents, so model matrices are cached per parent.
+        # Parents are weak keys, so entries of deleted objects go away with them.
+        # { parent : (parent's model matrix, model matrix) }
+        self.__localMat = None
+        self.__modelMats_d = WeakKeyDictionary()
+
         self.__static_b = bool(static_b)
 
+        if self.__static_b:
+            self.getLocalMatrix()
+
+    def __getstate__(self) -> dict:
+        # Weak references can't be pickled, and matrices of parents in another process are of no use anyway.
+        state_d = self.__dict__.copy()
+        del state_d["_ActorGeneral__modelMats_d"]
+        return state_d
+
+    def __setstate__(self, state_d:dict) -> None:
+        self.__dict__.update(state_d)
+        self.__modelMats_d = WeakKeyDictionary()
+
     ######## Getters for private attributes ########
 
     def getPosX(self) -> float:
@@ -277,16 +379,25 @@ class ActorGeneral:
         if self.getStatic():
             raise InvalidForStaticActor(self.getName())
         self.__pos_l[0] = float(x)
+        self.markTransformDirty()
 
     def setPosY(self, y:float) -> None:
         if self.getStatic():
             raise InvalidForStaticActor(self.getName())
         self.__pos_l[1] = float(y)
+        self.markTransformDirty()
 
     def setPosZ(self, z:float) -> None:
         if self.getStatic():
             raise InvalidForStaticActor(self.getName())
         self.__pos_l[2] = float(z)
+        self.markTransformDirty()
+
+    def setScaleXYZ(self, x, y, z):
+        self.__scales_l[0] = float(x)
+        self.__scales_l[1] = float(y)
+        self.__scales_l[2] = float(z)
+        self.markTransformDirty()
 
     ######## Getters for private arribs without accessing tham ########
 
@@ -327,16 +438,30 @@ class ActorGeneral:
         xAngle, yAngle, zAngle = self.getWorldAngleXYZ(parent)
         return xAngle.getDegree(), yAngle.getDegree(), zAngle.getDegree()
 
+    def getLocalMatrix(self) -> np.ndarray:
+        if self.__localMat is None:
+            self.__localMat = makeLocalMatrix(self.getScaleXYZ(), (self.getAngleX(), self.getAngleY(), self.getAngleZ()), self.getPosXYZ())
+        return self.__localMat
+
     def getModelMatrix(self, parent:Optional[Actor]=None) -> np.ndarray:
-        a = mm.getScaleMat4(*self.getScaleXYZ()).dot(
-            mm.getRotateXYZMat4(1, self.getAngleX().getDegree(), self.getAngleY().getDegree(), self.getAngleZ().getDegree())
-        ).dot(
-            mm.getTranslateMat4(*self.getPosXYZ())
-        )
+        """
+        Returned array is cached and shared, so do not modify it in place.
+        """
+        if parent is None:
+            return self.getLocalMatrix()
 
-        if parent is not None:
-            a = a.dot(parent.getModelMatrix())
+        parentMat = parent.getModelMatrix()
+        try:
+            cachedParentMat, a = self.__modelMats_d[parent]
+        except KeyError:
+            pass
+        else:
+            if cachedParentMat is parentMat:  # Parent's matrix is replaced with new array whenever it changes.
+                return a
 
+        a = self.getLocalMatrix().dot(parentMat)
+        a.flags.writeable = False
+        self.__modelMats_d[parent] = (parentMat, a)
         return a
 
     ######## Setters for private arribs without accessing tham ########
@@ -356,9 +481,24 @@ class ActorGeneral:
 
     ########  ########
 
+    def markTransformDirty(self) -> None:
+        self.__localMat = None
+        self.__modelMats_d.clear()
+
     def __checkParentValid(self, parent:"Actor") -> bool:
         if parent is None:
             return True
         else:
             if self.getStatic() and not parent.getStatic():
                 raise InvalidForStaticActor(self.getName())
+
+
+def makeLocalMatrix(scale_t:Tuple[float, float, float], angles_t:Tuple[mm.Angle, mm.Angle, mm.Angle],
+                    pos_t:Tuple[float, float, float]) -> np.ndarray:
+    a = mm.getScaleMat4(*scale_t).dot(
+        mm.getRotateXYZMat4(1, angles_t[0].getDegree(), angles_t[1].getDegree(), angles_t[2].getDegree())
+    ).dot(
+        mm.getTranslateMat4(*pos_t)
+    )
+    a.flags.writeable = False
+    return a
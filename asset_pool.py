@@ -0,0 +1,259 @@
+"""
+One pool of worker processes for everything loaded in background: levels, models and textures.
+
+The main process sends jobs, which are LevelLoader, ObjectLoader and TextureLoader, to a router process.
+The router runs the light parts of jobs itself and gives their heavy parts to workers as tasks, such as parsing
+chunks of a level or a model and decoding an image. Tasks wait in a priority queue in the router, and a task is given
+to a worker only when one is free, so a level requested later still goes before models that are waiting.
+Every process blocks on its queue while there is nothing to do.
+
+A job is any picklable object with these methods, which the router calls:
+    start(pool:JobPool, send:Callable[[object], None]) -> None
+        Submits tasks with pool.apply_async(func, args), or sends results at once.
+    poll() -> None
+        Called whenever one of its tasks is finished. Results are sent to the main process with send(),
+        where popResult() of the kind of the job returns them in the same order.
+
+Processes stop after sentinels. Anything still queued is thrown away.
+"""
+
+import os
+import signal
+import heapq
+import traceback
+from time import time
+from itertools import count
+from collections import deque
+from multiprocessing import Process, Queue
+from queue import Empty
+from typing import Callable, Optional
+
+
+# Kinds of jobs, which are also their priorities. Tasks of a kind with lower number are given to workers first.
+JOB_LEVEL_i = 0
+JOB_TEXTURE_i = 1
+JOB_MODEL_i = 2
+JOB_KINDS_t = (JOB_LEVEL_i, JOB_TEXTURE_i, JOB_MODEL_i)
+
+# First item of messages to the router. A message of None is the sentinel from the main process.
+_MSG_JOB_i = 0             # (_, kind, job) from the main process.
+_MSG_TASK_DONE_i = 1       # (_, task id, succeeded, result or error text) from a worker.
+_MSG_WORKER_EXITED_i = 2   # (_,) from a worker which got its sentinel.
+
+
+class TaskError(Exception):
+    """
+    Raised by TaskResult.get() when the task raised on the worker. Has the type and text of that exception.
+    """
+    pass
+
+
+class AssetPool:
+    """
+    Main process side of the pool. Nothing here blocks, except terminate().
+    """
+    SHUTDOWN_TIMEOUT_f = 5.0  # Seconds to wait for processes to stop after sentinels, before they are killed.
+
+    def __init__(self, workerCount_i:Optional[int]=None):
+        self.workerCount_i = max( 1, workerCount_i or os.cpu_count() or 1 )
+
+        self.__toRouterQueue = Queue()  # Jobs from here and results from workers.
+        self.__toMainQueue = Queue()
+        self.__taskQueue = Queue()
+
+        self.__router = _Router(self.__toRouterQueue, self.__toMainQueue, self.__taskQueue, self.workerCount_i)
+        self.__workers_l = [
+            Process( target=_runWorker, args=(self.__taskQueue, self.__toRouterQueue), daemon=True )
+            for _ in range(self.workerCount_i)
+        ]
+
+        self.__results_d = { kind_i: deque() for kind_i in JOB_KINDS_t }
+        self.__started_b = False
+
+    def start(self) -> None:
+        self.__router.start()
+        for worker in self.__workers_l:
+            worker.start()
+        self.__started_b = True
+
+    def terminate(self) -> None:
+        if not self.__started_b:
+            return
+        self.__started_b = False
+
+        # The router sends a sentinel to each worker before it stops.
+        self.__toRouterQueue.put(None)
+
+        processes_l = [self.__router] + self.__workers_l
+        deadline_f = time() + self.SHUTDOWN_TIMEOUT_f
+        for process in processes_l:
+            while process.is_alive() and time() < deadline_f:
+                # The router can't exit until what it sent here is read out of the pipe.
+                self.__takeResults()
+                process.join(0.05)
+
+        for process in processes_l:
+            if process.is_alive():
+                print( "(Error) Asset pool process did not stop in time, killed: {}".format(process.name) )
+                process.kill()
+            process.join()
+
+        print("Asset pool terminated")
+
+    def submit(self, kind_i:int, job) -> None:
+        self.__toRouterQueue.put( (_MSG_JOB_i, kind_i, job) )
+
+    def popResult(self, kind_i:int):
+        """
+        Returns the next result sent by jobs of the kind, or None if there is none yet.
+        """
+        results = self.__results_d[kind_i]
+        if not results:
+            self.__takeResults()
+        return results.popleft() if results else None
+
+    def __takeResults(self) -> None:
+        while True:
+            try:
+                kind_i, result = self.__toMainQueue.get_nowait()
+            except Empty:
+                return
+            self.__results_d[kind_i].append(result)
+
+
+class TaskResult:
+    """
+    Result of a task, with the methods of multiprocessing.pool.AsyncResult that jobs use.
+    """
+    def __init__(self):
+        self.__ready_b = False
+        self.__successful_b = False
+        self.__value = None
+
+    def ready(self) -> bool:
+        return self.__ready_b
+
+    def successful(self) -> bool:
+        if not self.__ready_b:
+            raise ValueError("Task is not finished yet.")
+        return self.__successful_b
+
+    def get(self):
+        if not self.successful():
+            raise TaskError(self.__value)
+        return self.__value
+
+    def setResult(self, successful_b:bool, value) -> None:
+        self.__ready_b = True
+        self.__successful_b = bool(successful_b)
+        self.__value = value
+
+
+class JobPool:
+    """
+    Given to a job by the router. Tasks submitted through it have the priority of the job.
+    """
+    def __init__(self, router:"_Router", kind_i:int, job):
+        self.workerCount_i = router.workerCount_i
+
+        self.__router = router
+        self.__kind_i = kind_i
+        self.__job = job
+
+    def apply_async(self, func:Callable, args:tuple=()) -> TaskResult:
+        return self.__router.submitTask(self.__kind_i, func, args, self.__job)
+
+
+class _Router(Process):
+    def __init__(self, inboxQueue:Queue, toMainQueue:Queue, taskQueue:Queue, workerCount_i:int):
+        super().__init__(daemon=True)
+
+        self.inboxQueue = inboxQueue
+        self.toMainQueue = toMainQueue
+        self.taskQueue = taskQueue
+        self.workerCount_i = workerCount_i
+
+        self.__waitingTasks_l = []  # Heap of (kind, task id, func, args). Ids go up, so they keep the order of a kind.
+        self.__tasks_d = {}  # task id -> (TaskResult, job), of tasks waiting or on workers.
+        self.__taskIds = count()
+
+    def run(self) -> None:
+        # Forked from a process with pygame, whose SIGTERM handler only makes a quit event.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        while True:
+            message_t = self.inboxQueue.get()
+            if message_t is None:
+                break
+            elif message_t[0] == _MSG_JOB_i:
+                _, kind_i, job = message_t
+                self.__callJob( job, job.start, JobPool(self, kind_i, job), self.__makeSender(kind_i) )
+            elif message_t[0] == _MSG_TASK_DONE_i:
+                _, taskId_i, successful_b, value = message_t
+                taskResult, job = self.__tasks_d.pop(taskId_i)
+                taskResult.setResult(successful_b, value)
+                self.__callJob(job, job.poll)
+
+            self.__giveTasks()
+
+        self.__stopWorkers()
+
+    def submitTask(self, kind_i:int, func:Callable, args:tuple, job) -> TaskResult:
+        taskResult = TaskResult()
+        taskId_i = next(self.__taskIds)
+        heapq.heappush( self.__waitingTasks_l, (kind_i, taskId_i, func, args) )
+        self.__tasks_d[taskId_i] = (taskResult, job)
+        return taskResult
+
+    def __giveTasks(self) -> None:
+        busyCount_i = len(self.__tasks_d) - len(self.__waitingTasks_l)
+        while self.__waitingTasks_l and busyCount_i < self.workerCount_i:
+            _, taskId_i, func, args = heapq.heappop(self.__waitingTasks_l)
+            self.taskQueue.put( (taskId_i, func, args) )
+            busyCount_i += 1
+
+    def __makeSender(self, kind_i:int) -> Callable[[object], None]:
+        def send(result) -> None:
+            self.toMainQueue.put( (kind_i, result) )
+        return send
+
+    @staticmethod
+    def __callJob(job, method, *args) -> None:
+        # Jobs report their own failures to the main process. This only keeps the router alive on a bug.
+        try:
+            method(*args)
+        except Exception:
+            print( "(Error) Asset job failed: {}".format(type(job).__name__) )
+            traceback.print_exc()
+
+    def __stopWorkers(self) -> None:
+        for _ in range(self.workerCount_i):
+            self.taskQueue.put(None)
+
+        # Results of tasks still on workers are read and thrown away, so workers can flush their queues and exit.
+        exitedCount_i = 0
+        while exitedCount_i < self.workerCount_i:
+            try:
+                message_t = self.inboxQueue.get(timeout=AssetPool.SHUTDOWN_TIMEOUT_f)
+            except Empty:
+                return
+            if message_t is not None and message_t[0] == _MSG_WORKER_EXITED_i:
+                exitedCount_i += 1
+
+
+def _runWorker(taskQueue:Queue, toRouterQueue:Queue) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    while True:
+        task_t = taskQueue.get()
+        if task_t is None:
+            break
+
+        taskId_i, func, args = task_t
+        try:
+            result_t = ( True, func(*args) )
+        except Exception as e:
+            result_t = ( False, "{}: {}".format(type(e).__name__, e) )
+        toRouterQueue.put( (_MSG_TASK_DONE_i, taskId_i) + result_t )
+
+    toRouterQueue.put( (_MSG_WORKER_EXITED_i,) )
@@ -0,0 +1,254 @@
+"""
+Measures how the engine scales with level size, on levels made by stress_level.py.
+
+For each object count, a level is written to assets/levels as '_stress_(count).smll' and removed afterwards.
+    compile    : SmllCompiler on the level, best and median of --repeat runs.
+    load       : HeadlessResourceManager loading the level without cache, which is compiling and instancing objects.
+    collision  : LogicalDude ticks while the player walks across the grid, with AABB checks per tick.
+    gl         : only with --gl. ResourceManager in a hidden window, from requesting the level until every object is
+                 instanced with its buffers and textures, and then CPU time of RenderingDude.render() per frame,
+                 which is issuing the draw calls without waiting for GPU.
+
+사용법:
+    python benchmark.py --counts 100 1000 10000 --json bench.json
+    python benchmark.py --counts 1000 --gl --frames 300
+"""
+
+import os
+import sys
+import json
+import platform
+import argparse
+from multiprocessing import active_children
+from time import perf_counter
+from typing import List, Optional
+
+import numpy as np
+
+import stress_level as sl
+from level_cache import LevelCache
+from level_loader import SmllCompiler
+from headless import HeadlessConsole, HeadlessResourceManager, HeadlessRunner, InputScript
+import const
+
+
+STRESS_LEVEL_PREFIX_s = "_stress_"
+LOAD_TIMEOUT_f = 600.0
+
+
+def _getStats(times_l:List[float]) -> dict:
+    times_arr = np.array(times_l, np.float64) * 1000.0
+    return {
+        "count": int(times_arr.size),
+        "min_ms": float(times_arr.min()),
+        "median_ms": float(np.median(times_arr)),
+        "mean_ms": float(times_arr.mean()),
+        "p95_ms": float(np.percentile(times_arr, 95)),
+        "max_ms": float(times_arr.max()),
+    }
+
+
+def benchCompile(smllFileDir_s:str, repeat_i:int) -> dict:
+    times_l = []
+    for _ in range(repeat_i):
+        st = perf_counter()
+        SmllCompiler(smllFileDir_s).compile()
+        times_l.append( perf_counter() - st )
+    return _getStats(times_l)
+
+
+def benchLoad(levelName_s:str, repeat_i:int) -> dict:
+    times_l = []
+    for _ in range(repeat_i):
+        resourceManager = HeadlessResourceManager( HeadlessConsole(), LevelCache(enabled_b=False) )
+        st = perf_counter()
+        resourceManager.requestLevelLoad(levelName_s)
+        times_l.append( perf_counter() - st )
+        resourceManager.terminate()
+    return _getStats(times_l)
+
+
+def benchCollision(levelName_s:str, ticks_i:int) -> dict:
+    # Walks forward and then turns around, so the player keeps running into boxes.
+    inputScript = InputScript( [ (0, "move", ["0", "-1"]), (ticks_i // 2, "look", ["180", "0"]) ] )
+    runner = HeadlessRunner( [levelName_s], inputScript, levelCache=LevelCache(enabled_b=False) )
+    try:
+        runner.run(ticks_i)
+        report_d = runner.getReport()
+    finally:
+        runner.terminate()
+
+    stats_d = _getStats(runner.tickTimes_l)
+    stats_d["aabb_col_checks_per_tick"] = report_d["aabb_col_checks"] / max(1, report_d["ticks"])
+    stats_d["aabb_dist_checks_per_tick"] = report_d["aabb_dist_checks"] / max(1, report_d["ticks"])
+    return stats_d
+
+
+def benchGl(levelName_s:str, frames_i:int) -> dict:
+    # Imported here so benchmarks without --gl don't need a display.
+    import pygame as p
+    import pygame.locals as pl
+    import OpenGL.GL as gl
+
+    import mmath as mm
+    from resource_manager import ResourceManager
+    from rendering_dude import RenderingDude
+    from curstate import GlobalStates
+    from configs_con import Configs
+    from player import Player
+    from camera import Camera
+
+    smllFileDir_s = const.MAP_DIR_s + levelName_s + ".smll"
+    try:
+        os.remove( LevelCache().getCacheFileDir(smllFileDir_s) )
+    except FileNotFoundError:
+        pass
+
+    p.init()
+    p.display.gl_set_attribute(pl.GL_CONTEXT_MAJOR_VERSION, 3)
+    p.display.gl_set_attribute(pl.GL_CONTEXT_MINOR_VERSION, 3)
+    p.display.gl_set_attribute(pl.GL_CONTEXT_PROFILE_MASK, pl.GL_CONTEXT_PROFILE_CORE)
+    p.display.gl_set_attribute(pl.GL_CONTEXT_FLAGS, pl.GL_CONTEXT_FORWARD_COMPATIBLE_FLAG)
+    winWidth_i, winHeight_i = 800, 600
+    p.display.set_mode( (winWidth_i, winHeight_i), pl.DOUBLEBUF | pl.OPENGL | pl.HIDDEN )
+
+    globalStates = GlobalStates()
+    globalStates.winWidth_i, globalStates.winHeight_i = winWidth_i, winHeight_i
+    try:
+        resourceManager = ResourceManager(globalStates, hotReload_b=False)
+    except:
+        _killChildren()
+        p.quit()
+        raise
+
+    try:
+        resourceManager.runProcesses()
+        player = Player()
+        camera = Camera("bench_camera", player, (0.0, 1.6, 0.0))
+        renderDude = RenderingDude( player, resourceManager, camera, Configs() )
+
+        st = perf_counter()
+        resourceManager.requestLevelLoad(levelName_s)
+        while not resourceManager.isLevelReady(levelName_s):
+            if perf_counter() - st > LOAD_TIMEOUT_f:
+                raise TimeoutError( "Level '{}' is not ready after {} sec".format(levelName_s, LOAD_TIMEOUT_f) )
+            resourceManager.update()
+        loadTime_f = perf_counter() - st
+
+        level = resourceManager.findLevelByName(levelName_s)
+        drawCalls_i = sum( len(x.renderers_l) for x in level.objects_l )
+
+        gl.glViewport(0, 0, winWidth_i, winHeight_i)
+        projectionMat = mm.getPerspectiveMat4(90.0, winWidth_i / winHeight_i, 0.1, 100.0)
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+
+        # The first frame is not counted, which has drivers compile shaders and upload textures on first use.
+        renderDude.render( projectionMat, camera.getViewMatrix() )
+        p.display.flip()
+
+        frameTimes_l = []
+        for frame_i in range(frames_i):
+            player.setDegrees( 0.0, 360.0 * frame_i / frames_i, 0.0 )
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
+            gl.glEnable(gl.GL_CULL_FACE)
+            gl.glEnable(gl.GL_DEPTH_TEST)
+
+            st = perf_counter()
+            renderDude.render( projectionMat, camera.getViewMatrix() )
+            frameTimes_l.append( perf_counter() - st )
+
+            p.display.flip()
+    finally:
+        resourceManager.terminate()
+        _killChildren()
+        p.quit()
+
+    stats_d = _getStats(frameTimes_l)
+    stats_d["load_to_ready_sec"] = loadTime_f
+    stats_d["draw_calls_per_frame"] = drawCalls_i
+    return stats_d
+
+
+def _killChildren() -> None:
+    """
+    Kills processes that are still running after ResourceManager.terminate(), which happens only after an error,
+    so they would not keep this process from exiting.
+    """
+    for process in active_children():
+        process.kill()
+        process.join()
+
+
+def runOne(spec:sl.StressLevelSpec, repeat_i:int, ticks_i:int, frames_i:Optional[int]) -> dict:
+    levelName_s = "{}{}".format( STRESS_LEVEL_PREFIX_s, spec.getObjectCount() )
+    smllFileDir_s = const.MAP_DIR_s + levelName_s + ".smll"
+    sl.writeStressLevel(smllFileDir_s, spec)
+    try:
+        result_d = {
+            "object_count": spec.getObjectCount(),
+            "spec": spec.toDict(),
+            "smll_size": os.path.getsize(smllFileDir_s),
+            "compile": benchCompile(smllFileDir_s, repeat_i),
+            "load": benchLoad(levelName_s, repeat_i),
+            "collision": benchCollision(levelName_s, ticks_i),
+            "gl": None if frames_i is None else benchGl(levelName_s, frames_i),
+        }
+    finally:
+        os.remove(smllFileDir_s)
+        try:
+            os.remove( LevelCache().getCacheFileDir(smllFileDir_s) )
+        except FileNotFoundError:
+            pass
+
+    return result_d
+
+
+def printResult(result_d:dict) -> None:
+    print( "{} objects ({:.1f} KB)".format(result_d["object_count"], result_d["smll_size"] / 1024) )
+    print( "\tcompile: median {:.2f} ms, min {:.2f} ms".format(result_d["compile"]["median_ms"], result_d["compile"]["min_ms"]) )
+    print( "\tload: median {:.2f} ms, min {:.2f} ms".format(result_d["load"]["median_ms"], result_d["load"]["min_ms"]) )
+    collision_d = result_d["collision"]
+    print( "\tcollision: mean {:.3f} ms, p95 {:.3f} ms per tick, {:.1f} aabb col checks per tick".format(
+        collision_d["mean_ms"], collision_d["p95_ms"], collision_d["aabb_col_checks_per_tick"]
+    ) )
+    gl_d = result_d["gl"]
+    if gl_d is not None:
+        print( "\tgl: load to ready {:.3f} sec, {} draw calls, submission mean {:.3f} ms, p95 {:.3f} ms per frame".format(
+            gl_d["load_to_ready_sec"], gl_d["draw_calls_per_frame"], gl_d["mean_ms"], gl_d["p95_ms"]
+        ) )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks compiling, loading, collision and rendering on synthetic levels.")
+    parser.add_argument("--counts", type=int, nargs='+', default=[100, 1000, 5000], help="object counts of levels")
+    parser.add_argument("--colliders", type=int, default=1, help="collider::aabb per define")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of compile and load for each level")
+    parser.add_argument("--ticks", type=int, default=600, help="ticks of collision benchmark")
+    parser.add_argument("--gl", action="store_true", help="also measures load to ready and draw submission with OpenGL")
+    parser.add_argument("--frames", type=int, default=120, help="frames of draw submission benchmark")
+    parser.add_argument("--json", default=None, help="writes results to this file")
+    args = parser.parse_args()
+
+    results_l = []
+    for objectCount_i in args.counts:
+        spec = sl.StressLevelSpec.fromObjectCount(objectCount_i)
+        spec.collidersPerObject_i = args.colliders
+        result_d = runOne( spec, args.repeat, args.ticks, args.frames if args.gl else None )
+        printResult(result_d)
+        results_l.append(result_d)
+
+    if args.json is not None:
+        report_d = {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "results": results_l,
+        }
+        with open(args.json, "w", encoding="utf8") as file:
+            json.dump(report_d, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
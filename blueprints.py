@@ -11,6 +11,8 @@ class LevelBlueprint:
         self.boundingBox = None
         self.colGroups_l = []
 
+        self.gridCellSize_f = 4.0
+
 
 class ObjectDefineBlueprint:
     def __init__(self):
@@ -25,6 +27,8 @@ class ObjectDefineBlueprint:
         self.colliders_l = []
         self.colGroupTargets_l = []
 
+        self.collisionMesh = None  # co.TriangleBvh of a model, only on the last piece sent by ObjectLoader or CollisionMeshLoader.
+
 
 class ObjectUseBlueprint:
     def __init__(self):
@@ -50,6 +54,8 @@ class ObjectObjStaticBlueprint:
         self.colliders_l = []
         self.colGroupTargets_l = []
 
+        self.meshCollision_b = False  # Collides with triangles of the model, with the collision tree in mesh cache.
+
 
 class RendererBlueprint:
     def __init__(self):
@@ -60,6 +66,12 @@ class RendererBlueprint:
         self.vertexNdarray = None
         self.texCoordNdarray = None
         self.normalNdarray = None
+        self.indexNdarray = None  # uint32 triangle indices into the arrays above. None if they are drawn in order.
+        self.lodIndexNdarrays_l = []  # uint32 indices of simplified meshes of the same vertices, from the most detailed.
+
+        # renderer::aab which is drawn with the shared unit cube has these instead of the arrays above.
+        self.boxMin_t = None
+        self.boxMax_t = None
 
         self.textureDir_s = None
 
@@ -1,4 +1,7 @@
 from typing import Tuple, Optional, Union, List
+import math
+
+import numpy as np
 
 import mmath as mm
 from actor import Actor, ActorGeneral
@@ -43,6 +46,15 @@ def checkAabbAabb(a:"Aabb", parentA:Actor, b:"Aabb", parentB:Actor) -> bool:
     else:
         return True
 
+def checkAabbAabbMany(minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float],
+                      mins:np.ndarray, maxs:np.ndarray) -> np.ndarray:
+    """
+    Vectorized version of checkAabbAabb.
+    mins and maxs are (N, 3) arrays of world space corners, and the result is (N,) bool array.
+    For M boxes at once, give (M, 1, 3) arrays as minXYZ and maxXYZ to get (M, N) array.
+    """
+    return np.all( (maxs >= minXYZ) & (mins <= maxXYZ), axis=-1 )
+
 def checkAabbSegment(aabb:"Aabb", parentA:Optional[Actor],  seg:"Segment", parentB:Optional[Actor]):
     xSegPos_f, ySegPos_f, zSegPos_f = seg.getSegmentPos(parentB)
     xSegVec_f, ySegVec_f, zSegVec_f = seg.getSegmentDirection(parentB)
@@ -124,6 +136,112 @@ def checkAabbSegment(aabb:"Aabb", parentA:Optional[Actor],  seg:"Segment", paren
     else:
         return True
 
+def checkRayBoxRange(originXYZ:Tuple[float, float, float], directionXYZ:Tuple[float, float, float], tMax_f:float,
+                     minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> bool:
+    """
+    Slab test for the ray origin + t*direction where 0 <= t <= tMax_f, against a box given by world space corners.
+    """
+    tMin_f = 0.0
+    for x in range(3):
+        pos_f = originXYZ[x]
+        vec_f = directionXYZ[x]
+        if vec_f == 0.0:
+            if pos_f < minXYZ[x] or pos_f > maxXYZ[x]:
+                return False
+        else:
+            t0 = (minXYZ[x] - pos_f) / vec_f
+            t1 = (maxXYZ[x] - pos_f) / vec_f
+            if t0 > t1:
+                t0, t1 = t1, t0
+            if t0 > tMin_f:
+                tMin_f = t0
+            if t1 < tMax_f:
+                tMax_f = t1
+            if tMin_f > tMax_f:
+                return False
+
+    return True
+
+def getRayAabbHitMany(originXYZ:np.ndarray, directionXYZ:np.ndarray, tMax, mins:np.ndarray, maxs:np.ndarray) -> np.ndarray:
+    """
+    Vectorized slab test, same as checkAabbSegment but returns where the ray enters each box.
+    Ray is origin + t*direction where 0 <= t <= tMax, and t is 0 if the origin is inside a box.
+    Result is t for each box, or inf if missed.
+
+    For one ray, origin and direction are (3,) arrays, tMax is float and the result is (N,) array.
+    For M rays, they are (M, 1, 3), (M, 1, 3) and (M, 1) arrays, and the result is (M, N) array.
+    """
+    originXYZ = np.asarray(originXYZ, np.float64)
+    directionXYZ = np.asarray(directionXYZ, np.float64)
+
+    zero_arr = directionXYZ == 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t0_arr = (mins - originXYZ) / directionXYZ
+        t1_arr = (maxs - originXYZ) / directionXYZ
+
+    # Axes the ray is parallel to either contain the origin for any t, or for no t.
+    inSlab_arr = (originXYZ >= mins) & (originXYZ <= maxs)
+    tNear_arr = np.where( zero_arr, np.where(inSlab_arr, -np.inf, np.inf), np.minimum(t0_arr, t1_arr) )
+    tFar_arr = np.where( zero_arr, np.where(inSlab_arr, np.inf, -np.inf), np.maximum(t0_arr, t1_arr) )
+
+    tEnter_arr = np.maximum( tNear_arr.max(axis=-1), 0.0 )
+    tExit_arr = np.minimum( tFar_arr.min(axis=-1), tMax )
+
+    return np.where( tEnter_arr <= tExit_arr, tEnter_arr, np.inf )
+
+def getRayTriangleHitMany(originXYZ, directionXYZ, tMax_f:float, triangles_arr:np.ndarray) -> np.ndarray:
+    """
+    Vectorized Moller-Trumbore test of the ray origin + t*direction where 0 <= t <= tMax_f, against (N, 3, 3) triangles.
+    Both sides of triangles are hit. Result is t for each triangle, or inf if missed.
+    """
+    origin_arr = np.asarray(originXYZ, np.float64)
+    direction_arr = np.asarray(directionXYZ, np.float64)
+    triangles_arr = np.asarray(triangles_arr, np.float64)
+
+    edge1_arr = triangles_arr[:, 1] - triangles_arr[:, 0]
+    edge2_arr = triangles_arr[:, 2] - triangles_arr[:, 0]
+    p_arr = np.cross(direction_arr, edge2_arr)
+    det_arr = np.einsum("ij,ij->i", edge1_arr, p_arr)
+
+    # Rays parallel to a triangle have det of 0, whose inf and nan fail every comparison below.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        invDet_arr = 1.0 / det_arr
+        s_arr = origin_arr - triangles_arr[:, 0]
+        u_arr = np.einsum("ij,ij->i", s_arr, p_arr) * invDet_arr
+        q_arr = np.cross(s_arr, edge1_arr)
+        v_arr = q_arr.dot(direction_arr) * invDet_arr
+        t_arr = np.einsum("ij,ij->i", edge2_arr, q_arr) * invDet_arr
+
+        hit_arr = (u_arr >= 0.0) & (v_arr >= 0.0) & (u_arr + v_arr <= 1.0) & (t_arr >= 0.0) & (t_arr <= tMax_f)
+    return np.where(hit_arr, t_arr, np.inf)
+
+def checkAabbTriangleMany(minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float],
+                          triangles_arr:np.ndarray) -> np.ndarray:
+    """
+    Separating axis test of Akenine-Moller between a box and (N, 3, 3) triangles, and the result is (N,) bool array.
+    Axes are the box's faces, the triangle's normal and cross products of their edges.
+    """
+    min_arr = np.asarray(minXYZ, np.float64)
+    max_arr = np.asarray(maxXYZ, np.float64)
+    half_arr = (max_arr - min_arr) / 2.0
+    verts_arr = np.asarray(triangles_arr, np.float64) - (min_arr + max_arr) / 2.0
+    edges_arr = verts_arr[:, [1, 2, 0]] - verts_arr
+
+    separated_arr = np.any( (verts_arr.min(axis=1) > half_arr) | (verts_arr.max(axis=1) < -half_arr), axis=1 )
+
+    normals_arr = np.cross(edges_arr[:, 0], edges_arr[:, 1])
+    separated_arr |= np.abs( np.einsum("ij,ij->i", normals_arr, verts_arr[:, 0]) ) > np.abs(normals_arr).dot(half_arr)
+
+    for axis_i in range(3):
+        unit_arr = np.zeros(3)
+        unit_arr[axis_i] = 1.0
+        axes_arr = np.cross(edges_arr, unit_arr)  # (N, edge, 3)
+        projections_arr = np.einsum("nkj,nej->nek", verts_arr, axes_arr)
+        radii_arr = np.abs(axes_arr).dot(half_arr)
+        separated_arr |= np.any( (projections_arr.min(axis=2) > radii_arr) | (projections_arr.max(axis=2) < -radii_arr), axis=1 )
+
+    return ~separated_arr
+
 ######## Return how far shoud it move to resolve collision ########
 
 def getDistanceToPushBackAabbAabb(a:"Aabb", parentA:Actor, b:"Aabb", parentB:Actor) -> Tuple[float, float, float, float, float, float]:
@@ -260,6 +378,634 @@ class Aabb(ActorGeneral):
         return self.__triggerCommand_l
 
 
+class UniformGrid:
+    """
+    Spatial hash of boxes that never move.
+    Each cell of size cellSize_f maps to ids of boxes overlapping it.
+    Boxes that cover too many cells are kept in a separate list and returned by every query.
+    """
+    def __init__(self, cellSize_f:float, maxCellsPerBox_i:int=64):
+        self.cellSize_f = float(cellSize_f)
+        self.maxCellsPerBox_i = int(maxCellsPerBox_i)
+
+        self.cells_d = {}  # (x, y, z) cell index -> ids
+        self.oversized_l = []
+        self.count_i = 0
+
+    def __repr__(self) -> str:
+        return "< {}.UniformGrid object at 0x{:0>16X}, cellSize: {}, cells: {}, boxes: {}, oversized: {} >".format(
+            __name__, id(self), self.cellSize_f, len(self.cells_d), self.count_i, len(self.oversized_l)
+        )
+
+    def insert(self, id_i:int, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> None:
+        xMin_i, yMin_i, zMin_i = self.getCellIndex(minXYZ)
+        xMax_i, yMax_i, zMax_i = self.getCellIndex(maxXYZ)
+        self.count_i += 1
+
+        cellCount_i = (xMax_i - xMin_i + 1) * (yMax_i - yMin_i + 1) * (zMax_i - zMin_i + 1)
+        if cellCount_i > self.maxCellsPerBox_i:
+            self.oversized_l.append(id_i)
+            return
+
+        for x in range(xMin_i, xMax_i + 1):
+            for y in range(yMin_i, yMax_i + 1):
+                for z in range(zMin_i, zMax_i + 1):
+                    try:
+                        self.cells_d[(x, y, z)].append(id_i)
+                    except KeyError:
+                        self.cells_d[(x, y, z)] = [id_i]
+
+    def query(self, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> np.ndarray:
+        """
+        Returns sorted unique ids of boxes which share a cell with given box.
+        It may contain boxes that don't actually overlap, so exact tests must follow.
+        """
+        xMin_i, yMin_i, zMin_i = self.getCellIndex(minXYZ)
+        xMax_i, yMax_i, zMax_i = self.getCellIndex(maxXYZ)
+
+        found_l = list(self.oversized_l)
+        for x in range(xMin_i, xMax_i + 1):
+            for y in range(yMin_i, yMax_i + 1):
+                for z in range(zMin_i, zMax_i + 1):
+                    try:
+                        found_l += self.cells_d[(x, y, z)]
+                    except KeyError:
+                        pass
+
+        return np.unique( np.array(found_l, np.int64) )
+
+    def getCellIndex(self, xyz:Tuple[float, float, float]) -> Tuple[int, int, int]:
+        return (
+            int(math.floor(xyz[0] / self.cellSize_f)),
+            int(math.floor(xyz[1] / self.cellSize_f)),
+            int(math.floor(xyz[2] / self.cellSize_f))
+        )
+
+
+class AabbTree:
+    """
+    Dynamic bounding volume hierarchy of boxes that may move.
+    Leaves store fat boxes, enlarged by margin_f, so small moves don't change the tree at all.
+    Inner nodes are kept balanced with rotations like AVL tree, so queries are logarithmic.
+    """
+    def __init__(self, margin_f:float=0.1):
+        self.margin_f = float(margin_f)
+
+        # Node pool, a node is an index of these lists.
+        self.__min_l = []
+        self.__max_l = []
+        self.__parent_l = []
+        self.__child1_l = []
+        self.__child2_l = []
+        self.__height_l = []  # -1 for free nodes, 0 for leaves.
+        self.__id_l = []
+
+        self.__freeNodes_l = []
+        self.__root_i = -1
+        self.count_i = 0
+
+    def __repr__(self) -> str:
+        return "< {}.AabbTree object at 0x{:0>16X}, leaves: {}, height: {} >".format(
+            __name__, id(self), self.count_i, self.getHeight()
+        )
+
+    def getHeight(self) -> int:
+        if self.__root_i == -1:
+            return 0
+        else:
+            return self.__height_l[self.__root_i]
+
+    def insert(self, id_i:int, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> int:
+        """
+        Returns proxy which is needed for move() and remove().
+        """
+        proxy_i = self.__allocateNode()
+        self.__min_l[proxy_i], self.__max_l[proxy_i] = self.__makeFatBox(minXYZ, maxXYZ)
+        self.__height_l[proxy_i] = 0
+        self.__id_l[proxy_i] = id_i
+
+        self.__insertLeaf(proxy_i)
+        self.count_i += 1
+        return proxy_i
+
+    def remove(self, proxy_i:int) -> None:
+        self.__removeLeaf(proxy_i)
+        self.__freeNode(proxy_i)
+        self.count_i -= 1
+
+    def move(self, proxy_i:int, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> bool:
+        """
+        Returns True if the leaf had to be reinserted, False if the box is still inside the fat box.
+        """
+        fatMin_t = self.__min_l[proxy_i]
+        fatMax_t = self.__max_l[proxy_i]
+        if fatMin_t[0] <= minXYZ[0] and fatMin_t[1] <= minXYZ[1] and fatMin_t[2] <= minXYZ[2] and \
+                maxXYZ[0] <= fatMax_t[0] and maxXYZ[1] <= fatMax_t[1] and maxXYZ[2] <= fatMax_t[2]:
+            return False
+
+        self.__removeLeaf(proxy_i)
+        self.__min_l[proxy_i], self.__max_l[proxy_i] = self.__makeFatBox(minXYZ, maxXYZ)
+        self.__insertLeaf(proxy_i)
+        return True
+
+    def getId(self, proxy_i:int) -> int:
+        return self.__id_l[proxy_i]
+
+    def getFatBox(self, proxy_i:int) -> Tuple[Tuple[float, float, float], Tuple[float, float, float]]:
+        return self.__min_l[proxy_i], self.__max_l[proxy_i]
+
+    ######## Queries ########
+
+    def queryOverlap(self, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> np.ndarray:
+        """
+        Returns ids of leaves whose fat box overlaps given box.
+        Fat boxes are bigger than actual ones so exact tests must follow.
+        """
+        found_l = []
+        if self.__root_i == -1:
+            return np.array(found_l, np.int64)
+
+        xMin_f, yMin_f, zMin_f = minXYZ
+        xMax_f, yMax_f, zMax_f = maxXYZ
+
+        stack_l = [self.__root_i]
+        while stack_l:
+            node_i = stack_l.pop()
+            nodeMin_t = self.__min_l[node_i]
+            nodeMax_t = self.__max_l[node_i]
+            if nodeMax_t[0] < xMin_f or nodeMin_t[0] > xMax_f or \
+                    nodeMax_t[1] < yMin_f or nodeMin_t[1] > yMax_f or \
+                    nodeMax_t[2] < zMin_f or nodeMin_t[2] > zMax_f:
+                continue
+
+            if self.__height_l[node_i] == 0:
+                found_l.append(self.__id_l[node_i])
+            else:
+                stack_l.append(self.__child1_l[node_i])
+                stack_l.append(self.__child2_l[node_i])
+
+        return np.array(found_l, np.int64)
+
+    def queryRay(self, originXYZ:Tuple[float, float, float], directionXYZ:Tuple[float, float, float], maxDist_f:float) -> np.ndarray:
+        """
+        Returns ids of leaves whose fat box is hit by the ray within maxDist_f.
+        Distance is measured in length of directionXYZ, so pass normalized vector to get world unit distance.
+        """
+        return self.__queryRayRange(originXYZ, directionXYZ, float(maxDist_f))
+
+    def querySegment(self, segPosXYZ:Tuple[float, float, float], segVecXYZ:Tuple[float, float, float]) -> np.ndarray:
+        """
+        Segment is segPosXYZ to segPosXYZ + segVecXYZ, same as Segment class.
+        """
+        return self.__queryRayRange(segPosXYZ, segVecXYZ, 1.0)
+
+    def __queryRayRange(self, originXYZ:Tuple[float, float, float], directionXYZ:Tuple[float, float, float], tMax_f:float) -> np.ndarray:
+        found_l = []
+        if self.__root_i == -1:
+            return np.array(found_l, np.int64)
+
+        stack_l = [self.__root_i]
+        while stack_l:
+            node_i = stack_l.pop()
+            if not checkRayBoxRange(originXYZ, directionXYZ, tMax_f, self.__min_l[node_i], self.__max_l[node_i]):
+                continue
+
+            if self.__height_l[node_i] == 0:
+                found_l.append(self.__id_l[node_i])
+            else:
+                stack_l.append(self.__child1_l[node_i])
+                stack_l.append(self.__child2_l[node_i])
+
+        return np.array(found_l, np.int64)
+
+    ######## Node pool ########
+
+    def __allocateNode(self) -> int:
+        if self.__freeNodes_l:
+            node_i = self.__freeNodes_l.pop()
+        else:
+            node_i = len(self.__height_l)
+            self.__min_l.append(None)
+            self.__max_l.append(None)
+            self.__parent_l.append(-1)
+            self.__child1_l.append(-1)
+            self.__child2_l.append(-1)
+            self.__height_l.append(-1)
+            self.__id_l.append(-1)
+
+        self.__parent_l[node_i] = -1
+        self.__child1_l[node_i] = -1
+        self.__child2_l[node_i] = -1
+        self.__height_l[node_i] = 0
+        self.__id_l[node_i] = -1
+        return node_i
+
+    def __freeNode(self, node_i:int) -> None:
+        self.__height_l[node_i] = -1
+        self.__min_l[node_i] = None
+        self.__max_l[node_i] = None
+        self.__freeNodes_l.append(node_i)
+
+    def __makeFatBox(self, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> Tuple[tuple, tuple]:
+        m = self.margin_f
+        return (
+            ( float(minXYZ[0]) - m, float(minXYZ[1]) - m, float(minXYZ[2]) - m ),
+            ( float(maxXYZ[0]) + m, float(maxXYZ[1]) + m, float(maxXYZ[2]) + m ),
+        )
+
+    ######## Tree structure ########
+
+    def __insertLeaf(self, leaf_i:int) -> None:
+        if self.__root_i == -1:
+            self.__root_i = leaf_i
+            self.__parent_l[leaf_i] = -1
+            return
+
+        leafMin_t = self.__min_l[leaf_i]
+        leafMax_t = self.__max_l[leaf_i]
+
+        # Find the best sibling, by surface area heuristic.
+        index_i = self.__root_i
+        while self.__height_l[index_i] != 0:
+            child1_i = self.__child1_l[index_i]
+            child2_i = self.__child2_l[index_i]
+
+            area_f = _getBoxArea(self.__min_l[index_i], self.__max_l[index_i])
+            combinedArea_f = _getBoxArea( *_getUnionBox(self.__min_l[index_i], self.__max_l[index_i], leafMin_t, leafMax_t) )
+
+            # Cost of creating a new parent for this node and the new leaf
+            cost_f = 2.0 * combinedArea_f
+            # Minimum cost of pushing the leaf further down the tree
+            inheritanceCost_f = 2.0 * (combinedArea_f - area_f)
+
+            cost1_f = self.__getDescendCost(child1_i, leafMin_t, leafMax_t) + inheritanceCost_f
+            cost2_f = self.__getDescendCost(child2_i, leafMin_t, leafMax_t) + inheritanceCost_f
+
+            if cost_f < cost1_f and cost_f < cost2_f:
+                break
+            index_i = child1_i if cost1_f < cost2_f else child2_i
+
+        sibling_i = index_i
+
+        oldParent_i = self.__parent_l[sibling_i]
+        newParent_i = self.__allocateNode()
+        self.__parent_l[newParent_i] = oldParent_i
+        self.__min_l[newParent_i], self.__max_l[newParent_i] = _getUnionBox(
+            leafMin_t, leafMax_t, self.__min_l[sibling_i], self.__max_l[sibling_i]
+        )
+        self.__height_l[newParent_i] = self.__height_l[sibling_i] + 1
+        self.__child1_l[newParent_i] = sibling_i
+        self.__child2_l[newParent_i] = leaf_i
+        self.__parent_l[sibling_i] = newParent_i
+        self.__parent_l[leaf_i] = newParent_i
+
+        if oldParent_i == -1:
+            self.__root_i = newParent_i
+        elif self.__child1_l[oldParent_i] == sibling_i:
+            self.__child1_l[oldParent_i] = newParent_i
+        else:
+            self.__child2_l[oldParent_i] = newParent_i
+
+        self.__refitUpward( self.__parent_l[leaf_i] )
+
+    def __getDescendCost(self, child_i:int, leafMin_t:tuple, leafMax_t:tuple) -> float:
+        unionArea_f = _getBoxArea( *_getUnionBox(self.__min_l[child_i], self.__max_l[child_i], leafMin_t, leafMax_t) )
+        if self.__height_l[child_i] == 0:
+            return unionArea_f
+        else:
+            return unionArea_f - _getBoxArea(self.__min_l[child_i], self.__max_l[child_i])
+
+    def __removeLeaf(self, leaf_i:int) -> None:
+        if leaf_i == self.__root_i:
+            self.__root_i = -1
+            return
+
+        parent_i = self.__parent_l[leaf_i]
+        grandParent_i = self.__parent_l[parent_i]
+        if self.__child1_l[parent_i] == leaf_i:
+            sibling_i = self.__child2_l[parent_i]
+        else:
+            sibling_i = self.__child1_l[parent_i]
+
+        if grandParent_i == -1:
+            self.__root_i = sibling_i
+            self.__parent_l[sibling_i] = -1
+            self.__freeNode(parent_i)
+        else:
+            if self.__child1_l[grandParent_i] == parent_i:
+                self.__child1_l[grandParent_i] = sibling_i
+            else:
+                self.__child2_l[grandParent_i] = sibling_i
+            self.__parent_l[sibling_i] = grandParent_i
+            self.__freeNode(parent_i)
+
+            self.__refitUpward(grandParent_i)
+
+        self.__parent_l[leaf_i] = -1
+
+    def __refitUpward(self, index_i:int) -> None:
+        while index_i != -1:
+            index_i = self.__balance(index_i)
+
+            child1_i = self.__child1_l[index_i]
+            child2_i = self.__child2_l[index_i]
+            self.__height_l[index_i] = 1 + max(self.__height_l[child1_i], self.__height_l[child2_i])
+            self.__min_l[index_i], self.__max_l[index_i] = _getUnionBox(
+                self.__min_l[child1_i], self.__max_l[child1_i], self.__min_l[child2_i], self.__max_l[child2_i]
+            )
+
+            index_i = self.__parent_l[index_i]
+
+    def __balance(self, a_i:int) -> int:
+        """
+        Rotates the subtree rooted at a_i if one child is 2 or more levels higher than the other.
+        Returns the new root of the subtree.
+        """
+        if self.__height_l[a_i] < 2:
+            return a_i
+
+        b_i = self.__child1_l[a_i]
+        c_i = self.__child2_l[a_i]
+        balance_i = self.__height_l[c_i] - self.__height_l[b_i]
+
+        if balance_i > 1:
+            return self.__rotateUp(a_i, c_i, b_i, True)
+        elif balance_i < -1:
+            return self.__rotateUp(a_i, b_i, c_i, False)
+        else:
+            return a_i
+
+    def __rotateUp(self, a_i:int, up_i:int, other_i:int, upIsChild2_b:bool) -> int:
+        """
+        Makes up_i the parent of a_i. a_i keeps other_i and takes the lower child of up_i.
+        """
+        f_i = self.__child1_l[up_i]
+        g_i = self.__child2_l[up_i]
+
+        # Swap a and up
+        self.__child1_l[up_i] = a_i
+        self.__parent_l[up_i] = self.__parent_l[a_i]
+        self.__parent_l[a_i] = up_i
+
+        oldParent_i = self.__parent_l[up_i]
+        if oldParent_i == -1:
+            self.__root_i = up_i
+        elif self.__child1_l[oldParent_i] == a_i:
+            self.__child1_l[oldParent_i] = up_i
+        else:
+            self.__child2_l[oldParent_i] = up_i
+
+        # Higher child of up stays with up, lower one goes to a.
+        if self.__height_l[f_i] > self.__height_l[g_i]:
+            stay_i, move_i = f_i, g_i
+        else:
+            stay_i, move_i = g_i, f_i
+
+        self.__child2_l[up_i] = stay_i
+        if upIsChild2_b:
+            self.__child2_l[a_i] = move_i
+        else:
+            self.__child1_l[a_i] = move_i
+        self.__parent_l[move_i] = a_i
+
+        self.__min_l[a_i], self.__max_l[a_i] = _getUnionBox(
+            self.__min_l[other_i], self.__max_l[other_i], self.__min_l[move_i], self.__max_l[move_i]
+        )
+        self.__height_l[a_i] = 1 + max(self.__height_l[other_i], self.__height_l[move_i])
+
+        self.__min_l[up_i], self.__max_l[up_i] = _getUnionBox(
+            self.__min_l[a_i], self.__max_l[a_i], self.__min_l[stay_i], self.__max_l[stay_i]
+        )
+        self.__height_l[up_i] = 1 + max(self.__height_l[a_i], self.__height_l[stay_i])
+
+        return up_i
+
+
+def _getUnionBox(minA:tuple, maxA:tuple, minB:tuple, maxB:tuple) -> Tuple[tuple, tuple]:
+    return (
+        ( min(minA[0], minB[0]), min(minA[1], minB[1]), min(minA[2], minB[2]) ),
+        ( max(maxA[0], maxB[0]), max(maxA[1], maxB[1]), max(maxA[2], maxB[2]) ),
+    )
+
+def _getBoxArea(minXYZ:tuple, maxXYZ:tuple) -> float:
+    x_f = maxXYZ[0] - minXYZ[0]
+    y_f = maxXYZ[1] - minXYZ[1]
+    z_f = maxXYZ[2] - minXYZ[2]
+    return 2.0 * (x_f*y_f + y_f*z_f + z_f*x_f)
+
+
+class TriangleBvh:
+    """
+    Static bounding volume hierarchy of triangles, for objects which collide with their mesh rather than boxes.
+    Triangles are in local space of the object, so callers transform queries into it.
+
+    Nodes are flat arrays, so the tree is built with array operations and stored in mesh cache as it is.
+    Inner nodes have two children next to each other, and leaves have a range of triangles_arr which is sorted by leaves.
+    """
+    MAX_PUSH_ITERATIONS_i = 8
+    FLOOR_COS_f = 0.7  # Triangles facing up more than this push boxes only upward, so they don't slide down slopes.
+
+    def __init__(self, nodeMin_arr:np.ndarray, nodeMax_arr:np.ndarray, nodeStarts_arr:np.ndarray, nodeCounts_arr:np.ndarray,
+                 triangles_arr:np.ndarray):
+        """
+        nodeStarts_arr is the first child for inner nodes and the first triangle for leaves,
+        and nodeCounts_arr is the number of triangles of leaves, 0 for inner nodes. Arrays may be memory mapped.
+        """
+        self.nodeMin_arr = nodeMin_arr
+        self.nodeMax_arr = nodeMax_arr
+        self.nodeStarts_arr = nodeStarts_arr
+        self.nodeCounts_arr = nodeCounts_arr
+        self.triangles_arr = triangles_arr  # (m, 3, 3) float32
+
+        # Traversal is done one node at a time, which is much faster with plain Python values.
+        self.__min_l = [ tuple(x) for x in nodeMin_arr.tolist() ]
+        self.__max_l = [ tuple(x) for x in nodeMax_arr.tolist() ]
+        self.__starts_l = nodeStarts_arr.tolist()
+        self.__counts_l = nodeCounts_arr.tolist()
+
+    def __reduce__(self):
+        # Sent to the main process by workers. The lists are made again from the arrays, which are much smaller to pickle.
+        return type(self), (self.nodeMin_arr, self.nodeMax_arr, self.nodeStarts_arr, self.nodeCounts_arr, self.triangles_arr)
+
+    def __repr__(self) -> str:
+        return "< {}.TriangleBvh object at 0x{:0>16X}, nodes: {}, triangles: {} >".format(
+            __name__, id(self), len(self.__starts_l), len(self.triangles_arr)
+        )
+
+    @classmethod
+    def build(cls, triangles_arr:np.ndarray, leafSize_i:int=8) -> "TriangleBvh":
+        """
+        triangles_arr is (m, 3, 3) array of corners. Nodes are split at the median of triangle centers
+        along the longest axis of the centers, so the tree is balanced.
+        """
+        triangles_arr = np.asarray(triangles_arr, np.float32).reshape(-1, 3, 3)
+        triangleCount_i = len(triangles_arr)
+        if not triangleCount_i:
+            return cls( np.zeros((0, 3), np.float32), np.zeros((0, 3), np.float32), np.zeros(0, np.int32),
+                        np.zeros(0, np.int32), triangles_arr )
+
+        centers_arr = triangles_arr.mean(axis=1)
+        order_arr = np.arange(triangleCount_i)
+
+        # Nodes are split in the order they are made, so children always come after their parent.
+        begins_l = [0]
+        ends_l = [triangleCount_i]
+        starts_l = [0]
+        counts_l = [triangleCount_i]
+        node_i = 0
+        while node_i < len(begins_l):
+            begin_i = begins_l[node_i]
+            end_i = ends_l[node_i]
+            if end_i - begin_i > leafSize_i:
+                members_arr = order_arr[begin_i:end_i]
+                memberCenters_arr = centers_arr[members_arr]
+                axis_i = int(np.argmax( memberCenters_arr.max(axis=0) - memberCenters_arr.min(axis=0) ))
+                half_i = (end_i - begin_i) // 2
+                order_arr[begin_i:end_i] = members_arr[ np.argpartition(memberCenters_arr[:, axis_i], half_i) ]
+
+                starts_l[node_i] = len(begins_l)
+                counts_l[node_i] = 0
+                for childBegin_i, childEnd_i in ( (begin_i, begin_i + half_i), (begin_i + half_i, end_i) ):
+                    begins_l.append(childBegin_i)
+                    ends_l.append(childEnd_i)
+                    starts_l.append(childBegin_i)
+                    counts_l.append(childEnd_i - childBegin_i)
+            node_i += 1
+
+        # Every node's box is the reduction over its range of sorted triangles, and the sentinel row lets ranges end at the last one.
+        sorted_arr = triangles_arr[order_arr]
+        ranges_arr = np.column_stack( (begins_l, ends_l) ).ravel()
+        triangleMin_arr = sorted_arr.min(axis=1)
+        triangleMax_arr = sorted_arr.max(axis=1)
+        nodeMin_arr = np.minimum.reduceat( np.concatenate((triangleMin_arr, triangleMin_arr[:1])), ranges_arr )[::2]
+        nodeMax_arr = np.maximum.reduceat( np.concatenate((triangleMax_arr, triangleMax_arr[:1])), ranges_arr )[::2]
+
+        return cls( nodeMin_arr, nodeMax_arr, np.array(starts_l, np.int32), np.array(counts_l, np.int32), sorted_arr )
+
+    def getBounds(self) -> Optional[ Tuple[Tuple[float, float, float], Tuple[float, float, float]] ]:
+        if not self.__starts_l:
+            return None
+        return self.__min_l[0], self.__max_l[0]
+
+    def getTypes(self) -> Tuple[bool, bool, bool]:
+        """
+        Same as Aabb, so mesh colliders can be returned from raycasts with boxes. It only blocks.
+        """
+        return False, True, False
+
+    ######## Queries ########
+
+    def queryBox(self, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> np.ndarray:
+        """
+        Returns indices of triangles_arr which overlap given box.
+        """
+        candidates_arr = self.__findBoxCandidates(minXYZ, maxXYZ)
+        return candidates_arr[ checkAabbTriangleMany(minXYZ, maxXYZ, self.triangles_arr[candidates_arr]) ]
+
+    def raycast(self, originXYZ:Tuple[float, float, float], directionXYZ:Tuple[float, float, float],
+                maxDist_f:float) -> Optional[Tuple[float, int]]:
+        """
+        Returns the nearest hit as (t, index of triangles_arr), or None.
+        Distance is measured in length of directionXYZ, same as AabbTree.
+        """
+        leaves_l = []
+        tMax_f = float(maxDist_f)
+        stack_l = [0] if self.__starts_l else []
+        while stack_l:
+            node_i = stack_l.pop()
+            if not checkRayBoxRange(originXYZ, directionXYZ, tMax_f, self.__min_l[node_i], self.__max_l[node_i]):
+                continue
+
+            if self.__counts_l[node_i]:
+                leaves_l.append(node_i)
+            else:
+                stack_l.append(self.__starts_l[node_i])
+                stack_l.append(self.__starts_l[node_i] + 1)
+
+        candidates_arr = self.__getLeafTriangles(leaves_l)
+        if not candidates_arr.size:
+            return None
+        t_arr = getRayTriangleHitMany(originXYZ, directionXYZ, tMax_f, self.triangles_arr[candidates_arr])
+        nearest_i = int(np.argmin(t_arr))
+        if not np.isfinite(t_arr[nearest_i]):
+            return None
+        return float(t_arr[nearest_i]), int(candidates_arr[nearest_i])
+
+    def querySegment(self, segPosXYZ:Tuple[float, float, float], segVecXYZ:Tuple[float, float, float]) -> Optional[Tuple[float, int]]:
+        """
+        Segment is segPosXYZ to segPosXYZ + segVecXYZ, same as Segment class, and t is in 0 ~ 1.
+        """
+        return self.raycast(segPosXYZ, segVecXYZ, 1.0)
+
+    def getPushOut(self, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> Tuple[float, float, float]:
+        """
+        Returns how far the box should move to stop overlapping triangles.
+        The box is pushed along the normal of the overlapping triangle which needs the shortest push, towards the side its center is on,
+        and this is repeated a few times since getting out of one triangle may not be enough.
+        Floors, whose normal is within FLOOR_COS_f of up, push straight up instead.
+        """
+        min_arr = np.asarray(minXYZ, np.float64)
+        max_arr = np.asarray(maxXYZ, np.float64)
+        half_arr = (max_arr - min_arr) / 2.0
+        push_arr = np.zeros(3)
+
+        for _ in range(self.MAX_PUSH_ITERATIONS_i):
+            overlaps_arr = self.queryBox(min_arr + push_arr, max_arr + push_arr)
+            if not overlaps_arr.size:
+                break
+
+            triangles_arr = self.triangles_arr[overlaps_arr].astype(np.float64)
+            normals_arr = np.cross( triangles_arr[:, 1] - triangles_arr[:, 0], triangles_arr[:, 2] - triangles_arr[:, 0] )
+            lengths_arr = np.linalg.norm(normals_arr, axis=1)
+            valid_arr = lengths_arr > 0.0
+            if not np.any(valid_arr):
+                break
+            normals_arr = normals_arr[valid_arr] / lengths_arr[valid_arr, None]
+
+            center_arr = min_arr + push_arr + half_arr
+            sides_arr = np.einsum("ij,ij->i", normals_arr, center_arr - triangles_arr[valid_arr, 0])
+            normals_arr[sides_arr < 0.0] *= -1.0
+            depths_arr = np.abs(normals_arr).dot(half_arr) - np.abs(sides_arr) + 1e-4
+
+            # Moving up by depth / normal y takes the box out of a floor's plane just as well.
+            floors_arr = normals_arr[:, 1] >= self.FLOOR_COS_f
+            directions_arr = np.where( floors_arr[:, None], (0.0, 1.0, 0.0), normals_arr )
+            distances_arr = np.where( floors_arr, depths_arr / np.maximum(normals_arr[:, 1], self.FLOOR_COS_f), depths_arr )
+
+            shallowest_i = int(np.argmin(distances_arr))
+            push_arr += directions_arr[shallowest_i] * distances_arr[shallowest_i]
+
+        return tuple(push_arr.tolist())
+
+    def __findBoxCandidates(self, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> np.ndarray:
+        xMin_f, yMin_f, zMin_f = ( float(x) for x in minXYZ )
+        xMax_f, yMax_f, zMax_f = ( float(x) for x in maxXYZ )
+
+        leaves_l = []
+        stack_l = [0] if self.__starts_l else []
+        while stack_l:
+            node_i = stack_l.pop()
+            nodeMin_t = self.__min_l[node_i]
+            nodeMax_t = self.__max_l[node_i]
+            if nodeMax_t[0] < xMin_f or nodeMin_t[0] > xMax_f or \
+                    nodeMax_t[1] < yMin_f or nodeMin_t[1] > yMax_f or \
+                    nodeMax_t[2] < zMin_f or nodeMin_t[2] > zMax_f:
+                continue
+
+            if self.__counts_l[node_i]:
+                leaves_l.append(node_i)
+            else:
+                stack_l.append(self.__starts_l[node_i])
+                stack_l.append(self.__starts_l[node_i] + 1)
+
+        return self.__getLeafTriangles(leaves_l)
+
+    def __getLeafTriangles(self, leaves_l:List[int]) -> np.ndarray:
+        if not leaves_l:
+            return np.zeros(0, np.int64)
+        return np.concatenate( [ np.arange(self.__starts_l[x], self.__starts_l[x] + self.__counts_l[x]) for x in leaves_l ] )
+
+
 class Segment(ActorGeneral):
     def __init__(self, name_s, static_b, initPos_t:Tuple[float, float, float], initVec:mm.Vec4):
         super().__init__(name_s, static_b, initPos_t)
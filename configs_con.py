@@ -17,6 +17,9 @@ class Configs:
         self.mouseSensitivity_f = None
         self.keyboardLookSensitivity_f = None
 
+        # loading
+        self.assetWorkers_i = None  # Processes of AssetPool. null in the file for one per core.
+
         self.loadJson()
 
     def loadJson(self):
@@ -31,6 +34,8 @@ class Configs:
         self.mouseSensitivity_f = a["mouseLookSensitivity_f"]
         self.keyboardLookSensitivity_f = a["keyboardLookSensitivity_f"]
 
+        self.assetWorkers_i = a["assetWorkers_i"]
+
 def main():
     a = Configs()
     print(a.mouseSensitivity_f)
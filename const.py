@@ -15,5 +15,12 @@ FONT_DIR_s = ASSET_DIR_s + "fonts/"
 DEFAULT_FONT_DIR_s = FONT_DIR_s + "NanumGothic.ttf"
 
 
+CACHE_DIR_s = "./cache/"
+
+LEVEL_CACHE_DIR_s = CACHE_DIR_s + "levels/"
+
+MESH_CACHE_DIR_s = CACHE_DIR_s + "meshes/"
+
+
 CONFIGS_DIR_s = "./configs/"
 CONFIGS_FILE_s = CONFIGS_DIR_s + "configs.json"
@@ -1,8 +1,13 @@
+import math
+import ctypes
 from typing import Tuple, List, Optional
 
-import OpenGL.GL as gl
+import numpy as np
+from lazy_gl import gl
 
 from actor import Actor, ActorGeneral
+import collide as co
+import mmath as mm
 from uniloc import UniformLocs
 from uniloc_shadow import UniformLocsShadow
 
@@ -15,12 +20,54 @@ class Level(Actor):
         self.colGroups_l = None
 
         self.objects_l = []
+        self.objectListVersion_i = 0  # Increased whenever objects_l changes.
+        self.__objectsByName_d = {}  # object name -> objects with the name, in the order of objects_l.
 
         self.objectBlueprints_l = []
         self.objectObjInitInfo_l = []
+        self.templateKeys_d = {}  # define name -> template key from level_diff, recorded when blueprints are consumed.
 
         self.pointLights_l = []
 
+        # World space boxes of every collider in objects_l, one row per collider.
+        # Rows are ordered by objects_l and then by each object's colliders_l.
+        self.colliderMin_arr = np.zeros( (0, 3), np.float64 )
+        self.colliderMax_arr = np.zeros( (0, 3), np.float64 )
+        self.colliderObjIndex_arr = np.zeros( 0, np.int64 )
+        self.colliderBlocking_arr = np.zeros( 0, np.bool_ )
+        self.colliderTrigger_arr = np.zeros( 0, np.bool_ )
+        self.colliderPress_arr = np.zeros( 0, np.bool_ )
+        self.colliderRefs_l = []  # row -> (Object, Aabb)
+
+        # Objects which collide with triangles of their model, and their index in objects_l.
+        self.meshObjects_l = []
+        self.meshObjIndex_arr = np.zeros( 0, np.int64 )
+
+        # Per object data, one row per object in objects_l.
+        self.objBoundingMin_arr = np.zeros( (0, 3), np.float64 )
+        self.objBoundingMax_arr = np.zeros( (0, 3), np.float64 )
+        self.objHasBounding_arr = np.zeros( 0, np.bool_ )
+        self.objColGroupReq_arr = np.zeros( (0, 1), np.bool_ )  # Last column is for col groups that don't exist.
+
+        self.colGroupMin_arr = None
+        self.colGroupMax_arr = None
+
+        # Baked by the compiler for colliders of static objects.
+        self.staticGrid = None
+        self.staticGridKeys_l = []  # grid id -> (object name, object initpos, index in object's colliders_l)
+        self.__gridRows_arr = np.zeros( 0, np.int64 )  # grid id -> collider row, -1 if the object is not instanced yet.
+        self.__nonGridRows_arr = np.zeros( 0, np.int64 )  # collider rows that are not in the grid.
+
+        # Colliders not in the grid are kept in the dynamic tree, and refit as their objects move.
+        # Grid colliders are also put in the static tree, only for ray and segment queries.
+        self.__dynamicTree = co.AabbTree()
+        self.__staticTree = co.AabbTree(0.0)
+        self.__rowProxies_arr = np.zeros( 0, np.int64 )  # collider row -> proxy in the dynamic tree, -1 if none.
+
+        self.__objRows_d = {}  # id(Object) -> (object index, first collider row, last collider row + 1)
+        self.__movedObjects_d = {}  # id(Object) -> Object
+        self.__colliderArraysDirty_b = True
+
     def __del__(self):
         # print( "Deleted Level: '{}'".format(self.getName()) )
         pass
@@ -30,18 +77,19 @@ class Level(Actor):
         objTempNames_l = []
         for obj in self.objects_l:
             objTempNames_l.append( obj.objTempName_s )
+            obj.setParent(None)
 
-        del self.objects_l
+        del self.objects_l, self.__objectsByName_d
         del self.objectBlueprints_l
         del self.objectObjInitInfo_l
         del self.pointLights_l
 
         return objTempNames_l
 
-    def renderAll(self, uniLoc:UniformLocs) -> None:
+    def renderAll(self, uniLoc:UniformLocs, viewPos_t:Optional[Tuple[float, float, float]]=None) -> None:
         self.makePointLightDataReady(uniLoc)
         for obj in self.objects_l:
-            obj.renderAll(uniLoc)
+            obj.renderAll(uniLoc, viewPos_t)
 
     def renderShadow(self, uniLocShadow) -> None:
         for obj in self.objects_l:
@@ -72,12 +120,419 @@ class Level(Actor):
         for x in self.pointLights_l:
             print("\t{}".format(x))
 
-    def findObjectByName(self, objectName_s:str) -> Optional["Object"]:
+    def addObject(self, anObject:"Object") -> None:
+        self.objects_l.append(anObject)
+        self.__objectsByName_d.setdefault(anObject.getName(), []).append(anObject)
+        self.objectListVersion_i += 1
+        self.__colliderArraysDirty_b = True
+
+    def deleteObjects(self, objects_l:List["Object"]) -> List[str]:
+        """
+        Deletes given objects at once, and returns their template names.
+        """
+        deleteIds_s = set( id(x) for x in objects_l )
+        objTempNames_l = []
+        remaining_l = []
+        objectsByName_d = {}
         for anObject in self.objects_l:
-            if anObject.getName() == objectName_s:
-                return anObject
-        else:
+            if id(anObject) in deleteIds_s:
+                objTempNames_l.append(anObject.objTempName_s)
+                anObject.setParent(None)
+            else:
+                remaining_l.append(anObject)
+                objectsByName_d.setdefault(anObject.getName(), []).append(anObject)
+
+        self.objects_l = remaining_l
+        self.__objectsByName_d = objectsByName_d
+        self.objectListVersion_i += 1
+        self.__colliderArraysDirty_b = True
+        return objTempNames_l
+
+    def addColGroup(self, colGroup:co.Aabb) -> None:
+        self.colGroups_l.append(colGroup)
+        self.__colliderArraysDirty_b = True
+
+    def takeLayoutFrom(self, newLevel:"Level") -> None:
+        """
+        Takes everything but objects from a recompiled level of the same file.
+        """
+        self.boundingBox = newLevel.boundingBox
+        self.colGroups_l = newLevel.colGroups_l
+        self.pointLights_l = newLevel.pointLights_l
+        self.staticGrid = newLevel.staticGrid
+        self.staticGridKeys_l = newLevel.staticGridKeys_l
+        self.__colliderArraysDirty_b = True
+
+    def getColliderRowRange(self, anObject:"Object") -> Tuple[int, int]:
+        """
+        Returns first collider row of the object and last one + 1. Collider arrays must be up to date.
+        """
+        _, rowBegin_i, rowEnd_i = self.__objRows_d[id(anObject)]
+        return rowBegin_i, rowEnd_i
+
+    def notifyObjectMoved(self, anObject:"Object") -> None:
+        if id(anObject) in self.__objRows_d:
+            self.__movedObjects_d[id(anObject)] = anObject
+
+    def updateColliderArrays(self) -> None:
+        """
+        Makes collider arrays up to date.
+        Whole arrays are rebuilt only when objects are added or deleted, otherwise only rows of moved objects are refreshed and refit in the dynamic tree.
+        """
+        if self.__colliderArraysDirty_b:
+            self.__rebuildColliderArrays()
+        elif self.__movedObjects_d:
+            for anObject in self.__movedObjects_d.values():
+                self.__refreshObjectRows(anObject)
+            self.__movedObjects_d = {}
+
+    def getActiveObjectMask(self, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> np.ndarray:
+        """
+        Returns bool array for objects_l telling which objects pass both col group and bounding box test against given box.
+        """
+        colGroupCount_i = self.colGroupMin_arr.shape[0]
+        activeGroups_arr = np.zeros( colGroupCount_i + 1, np.bool_ )
+        if colGroupCount_i:
+            activeGroups_arr[:colGroupCount_i] = co.checkAabbAabbMany(minXYZ, maxXYZ, self.colGroupMin_arr, self.colGroupMax_arr)
+        groupPass_arr = ~np.any(self.objColGroupReq_arr & ~activeGroups_arr, axis=1)
+
+        boundingPass_arr = ~self.objHasBounding_arr | co.checkAabbAabbMany(
+            minXYZ, maxXYZ, self.objBoundingMin_arr, self.objBoundingMax_arr
+        )
+
+        return groupPass_arr & boundingPass_arr
+
+    def queryColliderRows(self, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> np.ndarray:
+        """
+        Returns bool array for collider rows telling which colliders overlap given box.
+        Colliders in the static grid are looked up by cells, and only the rest are tested all together.
+        """
+        rowMask_arr = np.zeros( len(self.colliderRefs_l), np.bool_ )
+        rowMask_arr[ self.findColliderRows(minXYZ, maxXYZ) ] = True
+        return rowMask_arr
+
+    def findColliderRows(self, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float]) -> np.ndarray:
+        """
+        Same as queryColliderRows but returns the rows, so small boxes cost only as much as what is around them.
+        Rows are in no order, and one may come twice if objects share a key of the static grid.
+        """
+        rows_l = []
+
+        if self.staticGrid is not None and self.__gridRows_arr.size:
+            rows_arr = self.__gridRows_arr[ self.staticGrid.query(minXYZ, maxXYZ) ]
+            rows_l.append( rows_arr[rows_arr >= 0] )
+
+        rows_l.append( self.__dynamicTree.queryOverlap(minXYZ, maxXYZ) )
+
+        rows_arr = np.concatenate(rows_l).astype(np.int64, copy=False)
+        return rows_arr[ co.checkAabbAabbMany(minXYZ, maxXYZ, self.colliderMin_arr[rows_arr], self.colliderMax_arr[rows_arr]) ]
+
+    def querySegmentRows(self, segPosXYZ:Tuple[float, float, float], segVecXYZ:Tuple[float, float, float]) -> np.ndarray:
+        """
+        Returns collider rows hit by the segment from segPosXYZ to segPosXYZ + segVecXYZ.
+        """
+        return self.__queryRayRangeRows(segPosXYZ, segVecXYZ, 1.0)
+
+    def queryRayRows(self, originXYZ:Tuple[float, float, float], directionXYZ:Tuple[float, float, float], maxDist_f:float) -> np.ndarray:
+        """
+        Returns collider rows hit by the ray within maxDist_f, measured in length of directionXYZ.
+        """
+        return self.__queryRayRangeRows(originXYZ, directionXYZ, float(maxDist_f))
+
+    def raycast(self, originXYZ:Tuple[float, float, float], directionXYZ:Tuple[float, float, float], maxDist_f:float,
+                blockingOnly_b:bool=False, pressOnly_b:bool=False) -> Optional[Tuple[float, Tuple[float, float, float], "Object", co.Aabb]]:
+        """
+        Returns the nearest hit as (distance, world point, object, collider), or None.
+        directionXYZ doesn't need to be normalized, distance is always in world unit.
+        Collider is co.TriangleBvh of the object if the ray hit its mesh collider.
+        If pressOnly_b is True, only key press triggers are hit, and mesh colliders are not tested.
+        """
+        self.updateColliderArrays()
+
+        direction_arr = np.asarray(directionXYZ, np.float64)
+        length_f = float(np.linalg.norm(direction_arr))
+        if length_f == 0.0:
             return None
+        direction_arr = direction_arr / length_f
+
+        rows_arr, t_arr = self.__castRay(originXYZ, direction_arr, float(maxDist_f))
+        if blockingOnly_b:
+            t_arr = np.where(self.colliderBlocking_arr[rows_arr], t_arr, np.inf)
+        if pressOnly_b:
+            t_arr = np.where(self.colliderPress_arr[rows_arr], t_arr, np.inf)
+
+        hit_t = None
+        if rows_arr.size:
+            nearest_i = int(np.argmin(t_arr))
+            if np.isfinite(t_arr[nearest_i]):
+                hit_t = self.__makeRayHit( int(rows_arr[nearest_i]), float(t_arr[nearest_i]), originXYZ, direction_arr )
+
+        if pressOnly_b:
+            return hit_t
+
+        # Mesh colliders always block, and only ones nearer than the box hit matter.
+        meshHit_t = self.__castRayMeshes( originXYZ, direction_arr, float(maxDist_f) if hit_t is None else hit_t[0] )
+        return hit_t if meshHit_t is None else meshHit_t
+
+    def raycastMany(self, originXYZs, directionXYZs, maxDists, blockingOnly_b:bool=False, pressOnly_b:bool=False) \
+            -> List[Optional[Tuple[float, Tuple[float, float, float], "Object", co.Aabb]]]:
+        """
+        Batched version of raycast, for things like line of sight checks of many actors.
+        originXYZs and directionXYZs are (M, 3) array likes, and maxDists is float or (M,) array like.
+        Every ray is tested against every collider all together, so it doesn't use the trees.
+        Mesh colliders are tested after that one ray at a time, only up to the box each ray hit.
+        """
+        self.updateColliderArrays()
+
+        origins_arr = np.asarray(originXYZs, np.float64).reshape(-1, 3)
+        directions_arr = np.asarray(directionXYZs, np.float64).reshape(-1, 3)
+        rayCount_i = origins_arr.shape[0]
+        maxDists_arr = np.broadcast_to( np.asarray(maxDists, np.float64), (rayCount_i,) ).copy()
+
+        lengths_arr = np.linalg.norm(directions_arr, axis=1)
+        zero_arr = lengths_arr == 0.0
+        lengths_arr[zero_arr] = 1.0
+        maxDists_arr[zero_arr] = -1.0  # Never hits anything.
+        directions_arr = directions_arr / lengths_arr[:, None]
+
+        result_l = [None] * rayCount_i
+        colliderCount_i = len(self.colliderRefs_l)
+
+        # Limit size of (rays, colliders) arrays.
+        chunk_i = max( 1, (1 << 20) // max(colliderCount_i, 1) )
+        for begin_i in range(0, rayCount_i if colliderCount_i else 0, chunk_i):
+            end_i = min(begin_i + chunk_i, rayCount_i)
+            t_arr = co.getRayAabbHitMany(
+                origins_arr[begin_i:end_i, None, :], directions_arr[begin_i:end_i, None, :], maxDists_arr[begin_i:end_i, None],
+                self.colliderMin_arr, self.colliderMax_arr
+            )
+            if blockingOnly_b:
+                t_arr[:, ~self.colliderBlocking_arr] = np.inf
+            if pressOnly_b:
+                t_arr[:, ~self.colliderPress_arr] = np.inf
+
+            nearest_arr = np.argmin(t_arr, axis=1)
+            nearestT_arr = t_arr[np.arange(end_i - begin_i), nearest_arr]
+            for x in np.flatnonzero(np.isfinite(nearestT_arr)):
+                result_l[begin_i + x] = self.__makeRayHit(
+                    int(nearest_arr[x]), float(nearestT_arr[x]), origins_arr[begin_i + x], directions_arr[begin_i + x]
+                )
+
+        if self.meshObjects_l and not pressOnly_b:
+            for x in np.flatnonzero(maxDists_arr >= 0.0):
+                meshHit_t = self.__castRayMeshes(
+                    origins_arr[x], directions_arr[x], float(maxDists_arr[x]) if result_l[x] is None else result_l[x][0]
+                )
+                if meshHit_t is not None:
+                    result_l[x] = meshHit_t
+
+        return result_l
+
+    def getMeshPushOut(self, minXYZ:Tuple[float, float, float], maxXYZ:Tuple[float, float, float],
+                       activeObjMask_arr:np.ndarray) -> Tuple[float, float, float]:
+        """
+        Returns how far the box should move to stop overlapping triangles of mesh colliders, whose objects pass activeObjMask_arr.
+        Collider arrays must be up to date.
+        The box is turned into local space of each object as a box which contains it, so it gets bigger on rotated objects.
+        """
+        push_arr = np.zeros(3)
+        min_arr = np.asarray(minXYZ, np.float64)
+        max_arr = np.asarray(maxXYZ, np.float64)
+        for anObject in ( self.meshObjects_l[x] for x in np.flatnonzero(activeObjMask_arr[self.meshObjIndex_arr]) ):
+            modelMat = anObject.getModelMatrix()
+            invMat3 = np.linalg.inv(modelMat[:3, :3])
+            center_arr = ( (min_arr + max_arr) / 2.0 + push_arr - modelMat[3, :3] ).dot(invMat3)
+            half_arr = ( (max_arr - min_arr) / 2.0 ).dot( np.abs(invMat3) )
+
+            localPush_t = anObject.collisionMesh.getPushOut(center_arr - half_arr, center_arr + half_arr)
+            push_arr += np.asarray(localPush_t).dot(modelMat[:3, :3])
+
+        return tuple(push_arr.tolist())
+
+    def __makeRayHit(self, row_i:int, t_f:float, originXYZ, direction_arr:np.ndarray) -> Tuple[float, Tuple[float, float, float], "Object", co.Aabb]:
+        point_t = tuple( (np.asarray(originXYZ, np.float64) + direction_arr*t_f).tolist() )
+        anObject, collider = self.colliderRefs_l[row_i]
+        return t_f, point_t, anObject, collider
+
+    def __castRayMeshes(self, originXYZ, direction_arr:np.ndarray, maxDist_f:float) \
+            -> Optional[ Tuple[float, Tuple[float, float, float], "Object", co.TriangleBvh] ]:
+        """
+        Nearest hit on mesh colliders within maxDist_f, with the tree as the collider. direction_arr must be normalized.
+        Rays are turned into local space of each object, where t stays the same.
+        """
+        hit_t = None
+        for anObject in self.meshObjects_l:
+            modelMat = anObject.getModelMatrix()
+            invMat3 = np.linalg.inv(modelMat[:3, :3])
+            localHit_t = anObject.collisionMesh.raycast(
+                tuple( ( np.asarray(originXYZ, np.float64) - modelMat[3, :3] ).dot(invMat3).tolist() ),
+                tuple( direction_arr.dot(invMat3).tolist() ), maxDist_f
+            )
+            if localHit_t is not None and localHit_t[0] < maxDist_f:
+                maxDist_f = localHit_t[0]
+                point_t = tuple( (np.asarray(originXYZ, np.float64) + direction_arr*maxDist_f).tolist() )
+                hit_t = maxDist_f, point_t, anObject, anObject.collisionMesh
+
+        return hit_t
+
+    def __queryRayRangeRows(self, originXYZ:Tuple[float, float, float], directionXYZ:Tuple[float, float, float], tMax_f:float) -> np.ndarray:
+        rows_arr, t_arr = self.__castRay(originXYZ, directionXYZ, tMax_f)
+        return rows_arr[np.isfinite(t_arr)]
+
+    def __castRay(self, originXYZ:Tuple[float, float, float], directionXYZ, tMax_f:float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns candidate rows from the trees, and where the ray enters each of them (inf if missed).
+        """
+        # Sorted, so ties are broken by row order like raycastMany.
+        rows_arr = np.sort( np.concatenate( [
+            self.__staticTree.queryRay(originXYZ, directionXYZ, tMax_f),
+            self.__dynamicTree.queryRay(originXYZ, directionXYZ, tMax_f),
+        ] ) )
+        t_arr = co.getRayAabbHitMany(
+            originXYZ, directionXYZ, tMax_f, self.colliderMin_arr[rows_arr], self.colliderMax_arr[rows_arr]
+        )
+        return rows_arr, t_arr
+
+    def __rebuildColliderArrays(self) -> None:
+        colGroupIndices_d = {}
+        colGroupMin_l = []
+        colGroupMax_l = []
+        for x, aabb in enumerate(self.colGroups_l or ()):
+            colGroupIndices_d[aabb.getName()] = x
+            colGroupMin_l.append( aabb.getWorldMinXYZ(self) )
+            colGroupMax_l.append( aabb.getWorldMaxXYZ(self) )
+        self.colGroupMin_arr = np.array(colGroupMin_l, np.float64).reshape(-1, 3)
+        self.colGroupMax_arr = np.array(colGroupMax_l, np.float64).reshape(-1, 3)
+
+        objCount_i = len(self.objects_l)
+        colliderCount_i = sum( len(obj.colliders_l) for obj in self.objects_l )
+
+        self.colliderMin_arr = np.zeros( (colliderCount_i, 3), np.float64 )
+        self.colliderMax_arr = np.zeros( (colliderCount_i, 3), np.float64 )
+        self.colliderObjIndex_arr = np.zeros( colliderCount_i, np.int64 )
+        self.colliderBlocking_arr = np.zeros( colliderCount_i, np.bool_ )
+        self.colliderTrigger_arr = np.zeros( colliderCount_i, np.bool_ )
+        self.colliderPress_arr = np.zeros( colliderCount_i, np.bool_ )
+        self.colliderRefs_l = []
+
+        self.objBoundingMin_arr = np.zeros( (objCount_i, 3), np.float64 )
+        self.objBoundingMax_arr = np.zeros( (objCount_i, 3), np.float64 )
+        self.objHasBounding_arr = np.zeros( objCount_i, np.bool_ )
+        self.objColGroupReq_arr = np.zeros( (objCount_i, len(colGroupIndices_d) + 1), np.bool_ )
+
+        self.meshObjects_l = []
+        meshObjIndices_l = []
+
+        self.__objRows_d = {}
+        self.__rowProxies_arr = np.full( colliderCount_i, -1, np.int64 )
+        row_i = 0
+        for x, anObject in enumerate(self.objects_l):
+            for colGroupName_s in anObject.colGroupTargets_l or ():
+                self.objColGroupReq_arr[x, colGroupIndices_d.get(colGroupName_s, -1)] = True
+
+            for collider in anObject.colliders_l:
+                _, blocking_b, trigger_b = collider.getTypes()
+                self.colliderObjIndex_arr[row_i] = x
+                self.colliderBlocking_arr[row_i] = blocking_b
+                self.colliderTrigger_arr[row_i] = trigger_b
+                self.colliderPress_arr[row_i] = trigger_b and collider.activateOption_i == 3
+                self.colliderRefs_l.append( (anObject, collider) )
+                row_i += 1
+
+            self.__objRows_d[id(anObject)] = ( x, row_i - len(anObject.colliders_l), row_i )
+            self.__refreshObjectRows(anObject)
+
+            if anObject.collisionMesh is not None and anObject.collisionMesh.getBounds() is not None:
+                self.meshObjects_l.append(anObject)
+                meshObjIndices_l.append(x)
+
+        self.meshObjIndex_arr = np.array(meshObjIndices_l, np.int64)
+
+        self.__mapStaticGridToRows()
+        self.__buildTrees()
+
+        self.__movedObjects_d = {}
+        self.__colliderArraysDirty_b = False
+
+    def __mapStaticGridToRows(self) -> None:
+        # If several objects share a key, only the first one uses the grid and the others are tested without it.
+        staticObjRows_d = {}
+        for anObject in self.objects_l:
+            if anObject.getStatic():
+                staticObjRows_d.setdefault( (anObject.getName(), anObject.getPosXYZ()), self.__objRows_d[id(anObject)] )
+
+        self.__gridRows_arr = np.full( len(self.staticGridKeys_l), -1, np.int64 )
+        inGrid_arr = np.zeros( len(self.colliderRefs_l), np.bool_ )
+        for x, (objName_s, initPos_t, colliderIndex_i) in enumerate(self.staticGridKeys_l):
+            try:
+                _, rowBegin_i, rowEnd_i = staticObjRows_d[(objName_s, initPos_t)]
+            except KeyError:
+                continue
+            if rowBegin_i + colliderIndex_i < rowEnd_i:
+                self.__gridRows_arr[x] = rowBegin_i + colliderIndex_i
+                inGrid_arr[rowBegin_i + colliderIndex_i] = True
+
+        self.__nonGridRows_arr = np.flatnonzero(~inGrid_arr)
+
+    def __buildTrees(self) -> None:
+        self.__dynamicTree = co.AabbTree(self.__dynamicTree.margin_f)
+        for row_i in self.__nonGridRows_arr.tolist():
+            self.__rowProxies_arr[row_i] = self.__dynamicTree.insert(
+                row_i, self.colliderMin_arr[row_i], self.colliderMax_arr[row_i]
+            )
+
+        self.__staticTree = co.AabbTree(0.0)
+        for row_i in np.unique( self.__gridRows_arr[self.__gridRows_arr >= 0] ).tolist():
+            self.__staticTree.insert( row_i, self.colliderMin_arr[row_i], self.colliderMax_arr[row_i] )
+
+    def __refreshObjectRows(self, anObject:"Object") -> None:
+        try:
+            objIndex_i, rowBegin_i, rowEnd_i = self.__objRows_d[id(anObject)]
+        except KeyError:
+            return
+
+        if anObject.boundingBox is not None:
+            self.objHasBounding_arr[objIndex_i] = True
+            self.objBoundingMin_arr[objIndex_i] = anObject.boundingBox.getWorldMinXYZ(anObject)
+            self.objBoundingMax_arr[objIndex_i] = anObject.boundingBox.getWorldMaxXYZ(anObject)
+
+        for row_i, collider in zip( range(rowBegin_i, rowEnd_i), anObject.colliders_l ):
+            self.colliderMin_arr[row_i] = collider.getWorldMinXYZ(anObject)
+            self.colliderMax_arr[row_i] = collider.getWorldMaxXYZ(anObject)
+
+            proxy_i = self.__rowProxies_arr[row_i]
+            if proxy_i != -1:
+                self.__dynamicTree.move( proxy_i, self.colliderMin_arr[row_i], self.colliderMax_arr[row_i] )
+
+    def findObjectByName(self, objectName_s:str) -> Optional["Object"]:
+        """
+        Names are not unique, so the first one in objects_l is returned.
+        """
+        try:
+            return self.__objectsByName_d[objectName_s][0]
+        except KeyError:
+            return None
+
+    def renameObject(self, objName_s:str, newName_s:str) -> bool:
+        """
+        Renames the object findObjectByName returns. False if there is no such object.
+        """
+        anObject = self.findObjectByName(objName_s)
+        if anObject is None:
+            return False
+
+        self.__removeFromNameIndex(anObject)
+        anObject.setName(newName_s)
+        # Objects are kept in the order of objects_l, which is not known here, so the list is sorted again.
+        sameNames_l = self.__objectsByName_d.setdefault(anObject.getName(), [])
+        sameNames_l.append(anObject)
+        if len(sameNames_l) > 1:
+            order_d = { id(x): i for i, x in enumerate(self.objects_l) }
+            sameNames_l.sort( key=lambda x: order_d[id(x)] )
+
+        # Static grid is keyed by object names.
+        self.__colliderArraysDirty_b = True
+        return True
 
     def makePointLightDataReady(self, uniLoc:UniformLocs) -> None:
         pointLightCount_i = 0
@@ -96,19 +551,38 @@ class Level(Actor):
         gl.glUniform3fv( uniLoc.pointLightColor, pointLightCount_i, pointLightColor_t )
         gl.glUniform1fv( uniLoc.pointLightMaxDistance, pointLightCount_i, pointLightMaxDist_t )
 
-    def deleteAnObject(self, objName_s:str):
-        for x in range(len(self.objects_l) -1, -1, -1):
-            anObject = self.objects_l[x]
-            if anObject.getName() == objName_s:
-                tempName_s = anObject.objTempName_s
-                del self.objects_l[x]
-                return tempName_s
-        else:
+    def deleteAnObject(self, objName_s:str) -> Optional[str]:
+        """
+        Deletes the last object with the name, and returns its template name. None if there is no such object.
+        """
+        try:
+            anObject = self.__objectsByName_d[objName_s][-1]
+        except KeyError:
             return None
 
+        self.__removeFromNameIndex(anObject)
+        for x in range(len(self.objects_l) - 1, -1, -1):
+            if self.objects_l[x] is anObject:
+                del self.objects_l[x]
+                break
+        anObject.setParent(None)
+        self.objectListVersion_i += 1
+        self.__colliderArraysDirty_b = True
+        return anObject.objTempName_s
+
+    def __removeFromNameIndex(self, anObject:"Object") -> None:
+        sameNames_l = self.__objectsByName_d[anObject.getName()]
+        for x in range(len(sameNames_l) - 1, -1, -1):
+            if sameNames_l[x] is anObject:
+                del sameNames_l[x]
+                break
+        if not sameNames_l:
+            del self.__objectsByName_d[anObject.getName()]
+
 
 class Object(Actor):
     def __init__(self, name_s, parent, initPos, static_b):
+        self.physicsWorld = None  # PhysicsWorld which moves this object as a body, told whenever it is moved. Set first for onTransformChanged.
         super().__init__(name_s, parent, initPos, static_b)
 
         self.renderers_l = []
@@ -116,8 +590,10 @@ class Object(Actor):
 
         self.boundingBox = None
         self.colGroupTargets_l = None
+        self.collisionMesh = None  # co.TriangleBvh in local space, shared with the template, for meshcollision(true).
 
         self.objTempName_s = None
+        self.sourceKey_t = None  # (instance key, initpos) from level_diff, to match it with blueprints on hot reload.
 
         self.seleted_b = False
 
@@ -129,14 +605,23 @@ class Object(Actor):
     def __del__(self):
         print( "Deleted Object: '{}'".format(self.getName()) )
 
-    def renderAll(self, uniLoc:UniformLocs) -> None:
+    def onTransformChanged(self) -> None:
+        if self.getStatic():
+            return
+        parent = self.getParent()
+        if isinstance(parent, Level):
+            parent.notifyObjectMoved(self)
+        if self.physicsWorld is not None:
+            self.physicsWorld.notifyBodyMoved(self)
+
+    def renderAll(self, uniLoc:UniformLocs, viewPos_t:Optional[Tuple[float, float, float]]=None) -> None:
         if self.seleted_b:
             gl.glUniform1i(uniLoc.selected_i, 1)
             print("selected")
         else:
             gl.glUniform1i(uniLoc.selected_i, 0)
         for renderer in self.renderers_l:
-            renderer.render(self, uniLoc)
+            renderer.render(self, uniLoc, viewPos_t)
 
     def renderShadow(self, uniLocShadow) -> None:
         for renderer in self.renderers_l:
@@ -144,15 +629,25 @@ class Object(Actor):
 
 
 class Renderer(ActorGeneral):
+    # Simplified meshes are drawn when the camera is further than these from bounds of vertices, in radius of the bounds.
+    LOD_DISTANCES_t = (4.0, 10.0, 25.0)
+
     def __init__( self, name_s:str, initPos:Tuple[float, float, float]=(0, 0, 0), static_b:bool=False ):
         super().__init__( name_s, static_b, initPos )
 
         self.vao_i = None
         self.vertexSize_i = None
+        self.indexCount_i = None  # Drawn with the index buffer bound to vao_i if not None.
 
         self.vertexArrayBuffer_i = None
         self.textureArrayBuffer_i = None
         self.normalArrayBuffe_i = None
+        self.indexArrayBuffer_i = None
+
+        # Offset in bytes and count of indices of each simplified mesh in the index buffer, from the most detailed.
+        self.lodIndexRanges_l = []
+        self.lodCenter_t = None  # Center of bounds of vertices.
+        self.lodRadius_f = 0.0
 
         self.diffuseMap_i = None
         self.diffuseMapName_s = None
@@ -175,13 +670,17 @@ class Renderer(ActorGeneral):
             __name__, id(self), self.getName(), self.vertexSize_i, self.diffuseMap_i
         )
 
-    def render(self, parent:Actor, uniLoc:UniformLocs) -> None:
+    def render(self, parent:Actor, uniLoc:UniformLocs, viewPos_t:Optional[Tuple[float, float, float]]=None) -> None:
+        """
+        viewPos_t is where the camera is, which chooses a level of detail. The full mesh is drawn if it is None.
+        """
         gl.glBindVertexArray(self.vao_i);
 
         gl.glActiveTexture(gl.GL_TEXTURE0);
         gl.glBindTexture(gl.GL_TEXTURE_2D, self.diffuseMap_i);
 
-        gl.glUniformMatrix4fv(uniLoc.modelMatrix, 1, gl.GL_FALSE, self.getModelMatrix(parent));
+        modelMat = self.getModelMatrix(parent)
+        gl.glUniformMatrix4fv(uniLoc.modelMatrix, 1, gl.GL_FALSE, modelMat);
 
         gl.glUniform1f(uniLoc.textureVerNum_f, self.textureVerNum_f);
         gl.glUniform1f(uniLoc.textureHorNum_f, self.textureHorNum_f);
@@ -189,16 +688,84 @@ class Renderer(ActorGeneral):
         gl.glUniform1f(uniLoc.shininess, self.shininess_f);
         gl.glUniform1f(uniLoc.specularStrength, self.specularStrength_f);
 
-        gl.glDrawArrays(gl.GL_TRIANGLES, 0, self.vertexSize_i);
+        if self.lodIndexRanges_l and viewPos_t is not None:
+            lod_i = self.selectLod(modelMat, viewPos_t)
+            if lod_i:
+                offset_i, count_i = self.lodIndexRanges_l[lod_i - 1]
+                gl.glDrawElements( gl.GL_TRIANGLES, count_i, gl.GL_UNSIGNED_INT, ctypes.c_void_p(offset_i) );
+                return
+
+        self.__draw()
 
     def renderShadow(self, parent:Actor, uniLocShadow:UniformLocsShadow) -> None:
         gl.glBindVertexArray(self.vao_i);
 
         gl.glUniformMatrix4fv(uniLocShadow.modelMat, 1, gl.GL_FALSE, self.getModelMatrix(parent));
 
-        gl.glDrawArrays(gl.GL_TRIANGLES, 0, self.vertexSize_i);
+        self.__draw()
+
+    def terminate(self) -> Tuple[int, int, int, int, int, Optional[int]]:
+        del self.staticLights_l
 
-    def terminate(self) -> Tuple[int, int, int, int, int]:
+        return (
+            self.vao_i, self.vertexArrayBuffer_i, self.textureArrayBuffer_i, self.normalArrayBuffe_i, self.diffuseMap_i,
+            self.indexArrayBuffer_i
+        )
+
+    def selectLod(self, modelMat:np.ndarray, viewPos_t:Tuple[float, float, float]) -> int:
+        """
+        Returns 0 for the full mesh, or 1 + index of lodIndexRanges_l.
+        Renderers are shared by objects of a template, so it is chosen on every draw with the matrix of the object.
+        """
+        # Plain floats, which are a few times faster than NumPy for one vector.
+        row0_l, row1_l, row2_l, row3_l = modelMat.tolist()
+        xLocal_f, yLocal_f, zLocal_f = self.lodCenter_t
+        xDiff_f, yDiff_f, zDiff_f = (
+            xLocal_f * row0_l[i] + yLocal_f * row1_l[i] + zLocal_f * row2_l[i] + row3_l[i] - viewPos_t[i] for i in range(3)
+        )
+        scale_f = math.sqrt( max( x[0] * x[0] + x[1] * x[1] + x[2] * x[2] for x in (row0_l, row1_l, row2_l) ) )
+        radius_f = self.lodRadius_f * scale_f
+        distance_f = math.sqrt(xDiff_f * xDiff_f + yDiff_f * yDiff_f + zDiff_f * zDiff_f) - radius_f
+
+        lod_i = 0
+        for lodDistance_f in self.LOD_DISTANCES_t[:len(self.lodIndexRanges_l)]:
+            if distance_f <= lodDistance_f * radius_f:
+                break
+            lod_i += 1
+        return lod_i
+
+    def __draw(self) -> None:
+        if self.indexCount_i is None:
+            gl.glDrawArrays(gl.GL_TRIANGLES, 0, self.vertexSize_i);
+        else:
+            gl.glDrawElements(gl.GL_TRIANGLES, self.indexCount_i, gl.GL_UNSIGNED_INT, None);
+
+
+class BoxRenderer(Renderer):
+    """
+    Renderer of renderer::aab, which draws the unit cube shared by every box, scaled and moved to its box.
+    Buffers belong to ObjectManager, so terminate() returns None for them.
+    """
+    def __init__( self, name_s:str, initPos:Tuple[float, float, float], static_b:bool,
+                  boxMin_t:Tuple[float, float, float], boxMax_t:Tuple[float, float, float] ):
+        # Set before super().__init__(), which builds the local matrix of static actors.
+        self.boxMat = mm.getScaleMat4( *(xMax - xMin for xMin, xMax in zip(boxMin_t, boxMax_t)) ).dot( mm.getTranslateMat4(*boxMin_t) )
+        self.boxMat.flags.writeable = False
+
+        self.__rendererLocalMat = None
+        self.__localMat = None
+
+        super().__init__( name_s, initPos, static_b )
+
+    def getLocalMatrix(self) -> np.ndarray:
+        rendererLocalMat = super().getLocalMatrix()
+        if self.__rendererLocalMat is not rendererLocalMat:  # Replaced with new array whenever transform changes.
+            self.__localMat = self.boxMat.dot(rendererLocalMat)
+            self.__localMat.flags.writeable = False
+            self.__rendererLocalMat = rendererLocalMat
+        return self.__localMat
+
+    def terminate(self) -> Tuple[None, None, None, None, int, None]:
         del self.staticLights_l
 
-        return self.vao_i, self.vertexArrayBuffer_i, self.textureArrayBuffer_i, self.normalArrayBuffe_i, self.diffuseMap_i
+        return None, None, None, None, self.diffuseMap_i, None
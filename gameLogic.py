@@ -1,90 +1,138 @@
 from typing import List
 
+import numpy as np
+
 import collide as co
-from resource_manager import ResourceManager
 from player import Player
+from physics import FixedStepClock, PhysicsWorld
 
 
 class LogicalDude:
-    def __init__(self, resourceMan:ResourceManager, player:Player, commandQueue_l:List[str], globalState):
+    def __init__(self, resourceMan:"ResourceManager", player:Player, commandQueue_l:List[str], globalState):
         self.resourceMan = resourceMan
         self.player = player
         self.commandQueue_l = commandQueue_l
         self.globalState = globalState
 
-    def update(self) -> None:
-        self.player.applyPhysics(self.globalState.freezeLogic_b)
+        self.clock = FixedStepClock()
+        self.physicsWorld = PhysicsWorld()
+
+        # Accumulated since start, to compare replays of the same input record.
+        self.aabbColCheckCount_i = 0
+        self.aabbDistCheckCount_i = 0
+
+    def update(self, frameDelta_f:float) -> None:
+        for _ in range( self.clock.advance(frameDelta_f) ):
+            self.step()
+
+    def step(self) -> None:
+        self.player.applyPhysics(self.globalState.freezeLogic_b, self.clock.stepDelta_f)
+
+        if not self.globalState.freezeLogic_b:
+            self.physicsWorld.syncBodies( list(self.resourceMan.levelsGen()) )
+            self.physicsWorld.step(self.clock.stepDelta_f)
+        else:
+            self.physicsWorld.skipStep()
 
         self.__applyCollision()
 
+    def interact(self) -> None:
+        """
+        Called when the player presses the use key.
+        If the player aims at a key press trigger within reach, only that one is activated.
+        Otherwise every key press trigger of nearby objects is activated.
+        """
+        aimPos_t, aimVec_t = self.player.getAimSegment()
+
+        nearestHit_t = None
+        for level in self.resourceMan.levelsGen():
+            hit_t = level.raycast(aimPos_t, aimVec_t, self.player.reachDist_f, pressOnly_b=True)
+            if hit_t is not None and ( nearestHit_t is None or hit_t[0] < nearestHit_t[0] ):
+                nearestHit_t = hit_t
+
+        if nearestHit_t is not None:
+            self.commandQueue_l += nearestHit_t[3].getTriggerCommands()[:]
+            return
+
+        reachBox = self.player.biggerBoundingBoxAabb
+        for level in self.resourceMan.levelsGen():
+            if not co.checkAabbAabb(reachBox, self.player, level.boundingBox, level):
+                continue
+
+            level.updateColliderArrays()
+            if not level.colliderRefs_l:
+                continue
+
+            reachMin_t = reachBox.getWorldMinXYZ(self.player)
+            reachMax_t = reachBox.getWorldMaxXYZ(self.player)
+            activeRows_arr = level.getActiveObjectMask(reachMin_t, reachMax_t)[level.colliderObjIndex_arr]
+            for row_i in np.flatnonzero(activeRows_arr & level.colliderPress_arr):
+                self.commandQueue_l += level.colliderRefs_l[row_i][1].getTriggerCommands()[:]
+
     def __applyCollision(self) -> None:
         aabbColCheckCount_i = 0
         aabbDistCheckCount_i = 0
 
-        self.player.nearbyTriggers = []
+        playerBox = self.player.boundingBoxAabb
+        reachBox = self.player.biggerBoundingBoxAabb
 
         for level in self.resourceMan.levelsGen():
             aabbColCheckCount_i += 1
-            if not co.checkCollision(self.player.biggerBoundingBoxAabb, self.player, level.boundingBox, level):
+            if not co.checkAabbAabb(reachBox, self.player, level.boundingBox, level):
                 continue
 
-            colGroupQuerys_set = set()
-            for aabb in level.colGroups_l:
-                aabbColCheckCount_i += 1
-                if co.checkCollision(self.player.biggerBoundingBoxAabb, self.player, aabb, level):
-                    colGroupQuerys_set.add(aabb.getName())
-
-            # print(colGroupQuerys_set)
-
-            for obj in level.objects_l:
-                # Skip if col group is not activated
-                skip_b = False
-                for colGroupName_s in obj.colGroupTargets_l:
-                    if colGroupName_s not in colGroupQuerys_set:
-                        skip_b = True
-                        break
-                if skip_b:
-                    continue
-
-                # check bounding box
-                boundingChecksOut_b = False
+            level.updateColliderArrays()
+            if not level.colliderRefs_l and not level.meshObjects_l:
+                continue
+
+            reachMin_t = reachBox.getWorldMinXYZ(self.player)
+            reachMax_t = reachBox.getWorldMaxXYZ(self.player)
+
+            # Colliders of objects whose col groups and bounding box are activated
+            activeObjects_arr = level.getActiveObjectMask(reachMin_t, reachMax_t)
+            activeRows_arr = activeObjects_arr[level.colliderObjIndex_arr]
+            candidateRows_arr = activeRows_arr & level.queryColliderRows(reachMin_t, reachMax_t)
+            aabbColCheckCount_i += len(level.objects_l)
+
+            for row_i in np.flatnonzero(activeRows_arr & level.colliderTrigger_arr & ~candidateRows_arr):
+                level.colliderRefs_l[row_i][1].lastState_b = False
+
+            for row_i in np.flatnonzero(candidateRows_arr):
+                obj, collider = level.colliderRefs_l[row_i]
+                _, blocking_b, trigger_b = collider.getTypes()
+
                 aabbColCheckCount_i += 1
-                if obj.boundingBox is None:
-                    boundingChecksOut_b = True
+                if co.checkAabbAabb(playerBox, self.player, collider, obj):
+                    if blocking_b:
+                        aabbDistCheckCount_i += 1
+                        a = co.getDistanceToPushBackAabbAabb(playerBox, self.player, collider, obj)
+                        self.player.setPosX(self.player.getPosX() + a[0])
+                        self.player.setPosY(self.player.getPosY() + a[1])
+                        self.player.setPosZ(self.player.getPosZ() + a[2])
+
+                        if not obj.getStatic():
+                            obj.setPosX(obj.getPosX() + a[3])
+                            obj.setPosY(obj.getPosY() + a[4])
+                            obj.setPosZ(obj.getPosZ() + a[5])
+
+                    if trigger_b:
+                        if collider.activateOption_i == 2:  # toggle
+                            self.commandQueue_l += collider.getTriggerCommands()[:]
+                        elif collider.activateOption_i == 1:
+                            if not collider.lastState_b:  # once
+                                self.commandQueue_l += collider.getTriggerCommands()[:]
+                                collider.lastState_b = True
                 else:
-                    aabbColCheckCount_i += 1
-                    if co.checkCollision(self.player.biggerBoundingBoxAabb, self.player, obj.boundingBox, obj):
-                        boundingChecksOut_b = True
-
-                if boundingChecksOut_b:
-                    for collider in obj.colliders_l:
-                        bounding_b, blocking_b, trigger_b = collider.getTypes()
-                        if trigger_b and collider.activateOption_i == 3:  # key press
-                            self.player.nearbyTriggers += collider.getTriggerCommands()[:]
-
-                        aabbColCheckCount_i += 1
-                        if co.checkCollision(self.player.boundingBoxAabb, self.player, collider, obj):
-                            if blocking_b:
-                                aabbDistCheckCount_i += 1
-                                a = co.getDistaceToPushBack(self.player.boundingBoxAabb, self.player, collider, obj)
-                                self.player.setPosX(self.player.getPosX() + a[0])
-                                self.player.setPosY(self.player.getPosY() + a[1])
-                                self.player.setPosZ(self.player.getPosZ() + a[2])
-
-                                if not obj.getStatic():
-                                    obj.setPosX(obj.getPosX() + a[3])
-                                    obj.setPosY(obj.getPosY() + a[4])
-                                    obj.setPosZ(obj.getPosZ() + a[5])
-
-                            if trigger_b:
-                                if collider.activateOption_i == 2:  # toggle
-                                    self.commandQueue_l += collider.getTriggerCommands()[:]
-                                elif collider.activateOption_i == 1:
-                                    if not collider.lastState_b:  # once
-                                        self.commandQueue_l += collider.getTriggerCommands()[:]
-                                        collider.lastState_b = True
-                        else:
-                            collider.lastState_b = False
-
-        #print("Collision check count:", aabbColCheckCount_i)
-        #print("Collision dist count:", aabbDistCheckCount_i)
+                    collider.lastState_b = False
+
+            # Mesh colliders are static and only push the player, after boxes have.
+            if level.meshObjects_l:
+                xPush_f, yPush_f, zPush_f = level.getMeshPushOut(
+                    playerBox.getWorldMinXYZ(self.player), playerBox.getWorldMaxXYZ(self.player), activeObjects_arr
+                )
+                self.player.setPosX(self.player.getPosX() + xPush_f)
+                self.player.setPosY(self.player.getPosY() + yPush_f)
+                self.player.setPosZ(self.player.getPosZ() + zPush_f)
+
+        self.aabbColCheckCount_i += aabbColCheckCount_i
+        self.aabbDistCheckCount_i += aabbDistCheckCount_i
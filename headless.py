@@ -0,0 +1,423 @@
+"""
+Runs game logic without a window, GL context or pygame display.
+
+Levels are compiled with SmllCompiler, or loaded from level cache unless --no-cache is given,
+and objects are made with colliders only, no renderers or textures.
+LogicalDude, the player's physics and Commander run for given number of ticks, driven by an input script,
+and time spent on each tick is reported.
+
+사용법:
+    python headless.py --levels c01_01 --ticks 1200 --script route.txt --json result.json
+    python headless.py --levels c01_01 --replay session.erin --json result.json
+
+Input script has one event per line, "(tick) (action) [args ...]", and lines starting with '#' are ignored.
+    move (x: float) (z: float)      Same as WASD, relative to where the player looks. Lasts until the next move.
+    look (hor: float) (ver: float)  Turns the player by given degrees.
+    jump
+    interact                        Same as pressing E.
+    cmd (console command ...)       Puts a console command to the command queue.
+
+Input record made by main.py --record can be replayed with --replay, where each frame of the record becomes a tick.
+Ticks of a script run can be recorded with --record as well.
+"""
+
+import os
+import json
+import argparse
+from time import perf_counter
+from typing import List, Optional, Generator, Tuple
+
+import numpy as np
+
+import blueprints as bp
+from level_cache import LevelCache
+from data_struct import Level, Object
+from object_manager import ObjectTemplate
+from mesh_cache import MeshCache
+import obj_parse as op
+import collide as co
+from curstate import GlobalStates
+from player import Player
+from gameLogic import LogicalDude
+from commander import Commander
+import input_record as ir
+import const
+
+
+class HeadlessConsole:
+    def __init__(self, print_b:bool=False):
+        self.print_b = bool(print_b)
+        self.logs_l = []
+
+    def appendLogs(self, text_s:str) -> None:
+        self.logs_l.append(text_s)
+        if self.print_b:
+            print(text_s)
+
+
+class HeadlessCommander(Commander):
+    """
+    Commands which only change rendering, like the ones level triggers call on entering, are skipped with a log line.
+    """
+    def ui_set_blinder(self, _:list):
+        self.__skip("ui_set_blinder")
+
+    def gr_set_ambient(self, _:list):
+        self.__skip("gr_set_ambient")
+
+    def gr_get_ambient(self, _:list):
+        self.__skip("gr_get_ambient")
+
+    def conf_flash_shadow(self, _:list):
+        self.__skip("conf_flash_shadow")
+
+    def __skip(self, command_s:str) -> None:
+        self.mainLoop.console.appendLogs( "Skipped without rendering: '{}'".format(command_s) )
+
+
+class HeadlessResourceManager:
+    """
+    Same interface as ResourceManager for game logic and Commander, but levels are compiled right away in this process
+    and objects get no renderers.
+    """
+    def __init__(self, console:HeadlessConsole, levelCache:LevelCache=None):
+        self.console = console
+        self.levelCache = levelCache if levelCache is not None else LevelCache(enabled_b=False)
+        self.meshCache = MeshCache()
+
+        self._levels_l = []
+        self._levelsByName_d = {}  # level name -> Level in _levels_l
+
+    def levelsGen(self) -> Generator[Level, None, None]:
+        for level in self._levels_l:
+            yield level
+
+    def update(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        for level in self._levels_l:
+            level.terminate()
+        self._levels_l = []
+        self._levelsByName_d = {}
+
+    def findLevelByName(self, levelName_s:str) -> Optional[Level]:
+        return self._levelsByName_d.get(levelName_s)
+
+    def findObjectInLevelByName(self, levelName_s:str, objectName_s:str) -> Optional[Object]:
+        level = self.findLevelByName(levelName_s)
+        if level is None:
+            return None
+        else:
+            return level.findObjectByName(objectName_s)
+
+    def requestLevelLoad(self, levelName_s:str, waitTime_f:float=0.0) -> None:
+        if self.findLevelByName(levelName_s) is not None:
+            self.console.appendLogs( "Already loaded level: '{}'".format(levelName_s) )
+            return
+
+        smllFileDir_s = const.MAP_DIR_s + levelName_s + ".smll"
+        if not os.path.isfile(smllFileDir_s):
+            raise FileNotFoundError(levelName_s)
+
+        level, _ = self.levelCache.compile(smllFileDir_s)
+        self.__fillLevelWithObjects(level, self.meshCache)
+        self._levels_l.append(level)
+        self._levelsByName_d[level.getName()] = level
+        self.console.appendLogs( "Level loaded: '{}'".format(level.getName()) )
+
+    def requestLevelReload(self, levelName_s:str) -> None:
+        """
+        Objects have no GPU resources here, so the level is just loaded again.
+        """
+        if self.findLevelByName(levelName_s) is None:
+            raise FileNotFoundError(levelName_s)
+        self.deleteLevel(levelName_s)
+        self.requestLevelLoad(levelName_s)
+
+    def deleteLevel(self, levelName_s:str) -> None:
+        level = self._levelsByName_d.pop(levelName_s, None)
+        if level is not None:
+            level.terminate()
+            self._levels_l.remove(level)
+
+    def deleteAllLevels(self) -> None:
+        self.terminate()
+
+    def deleteAnObject(self, levelName_s:str, objectName_s:str) -> bool:
+        level = self.findLevelByName(levelName_s)
+        if level is None:
+            return False
+        elif level.deleteAnObject(objectName_s) is None:
+            return False
+        else:
+            self.console.appendLogs("An onject '{}' in level '{}' has been deleted.".format(objectName_s, levelName_s))
+            return True
+
+    def renameAnObject(self, levelName_s:str, objectName_s:str, newName_s:str) -> bool:
+        level = self.findLevelByName(levelName_s)
+        if level is None:
+            return False
+        elif not level.renameObject(objectName_s, newName_s):
+            return False
+        else:
+            self.console.appendLogs(
+                "An object '{}' in level '{}' has been renamed to '{}'.".format(objectName_s, levelName_s, newName_s)
+            )
+            return True
+
+    @staticmethod
+    def __fillLevelWithObjects(level:Level, meshCache:MeshCache) -> None:
+        templates_d = {}
+        for objBprint in level.objectBlueprints_l:
+            if isinstance(objBprint, bp.ObjectDefineBlueprint):
+                templates_d[objBprint.name_s] = ObjectTemplate(objBprint.name_s, [], objBprint.colliders_l, objBprint.boundingBox)
+            elif isinstance(objBprint, bp.ObjectObjStaticBlueprint):
+                if objBprint.objFileName_s not in templates_d:
+                    templates_d[objBprint.objFileName_s] = ObjectTemplate(objBprint.objFileName_s, [], [], None)
+                template = templates_d[objBprint.objFileName_s]
+                if objBprint.meshCollision_b and template.collisionMesh is None:
+                    template.collisionMesh = HeadlessResourceManager.__loadCollisionMesh(objBprint.objFileName_s, meshCache)
+
+        for objBprint in level.objectBlueprints_l:
+            meshCollision_b = False
+            if isinstance(objBprint, bp.ObjectDefineBlueprint):
+                template = templates_d[objBprint.name_s]
+                colliders_l = []
+            elif isinstance(objBprint, bp.ObjectUseBlueprint):
+                template = templates_d[objBprint.templateName_s]
+                colliders_l = []
+            elif isinstance(objBprint, bp.ObjectObjStaticBlueprint):
+                template = templates_d[objBprint.objFileName_s]
+                colliders_l = objBprint.colliders_l
+                meshCollision_b = objBprint.meshCollision_b
+            else:
+                raise ValueError( "Unknown blueprint type: {}".format(type(objBprint)) )
+
+            level.addObject( template.makeObject(
+                objBprint.name_s, level, objBprint.initPos_t, objBprint.static_b, colliders_l, objBprint.colGroupTargets_l,
+                meshCollision_b
+            ) )
+
+        level.objectBlueprints_l = []
+
+
+    @staticmethod
+    def __loadCollisionMesh(objFileName_s:str, meshCache:MeshCache) -> co.TriangleBvh:
+        """
+        There is no asset pool here, so the tree is read from mesh cache in this process, and built only if it is not there.
+        A model that fails gets an empty tree.
+        """
+        try:
+            dirs_t = op.findObjMtlDir(objFileName_s)
+            if dirs_t is None:
+                raise FileNotFoundError("needs both .obj and .mtl")
+            return meshCache.loadCollisionMesh(*dirs_t)
+        except (OSError, ValueError, IndexError, KeyError) as e:
+            print( "Failed to load a collision mesh: '{}', {}: {}".format(objFileName_s, type(e).__name__, e) )
+            return co.TriangleBvh.build( np.zeros((0, 3, 3), np.float32) )
+
+
+class InputScript:
+    def __init__(self, events_l:List[Tuple[int, str, List[str]]]=None):
+        self.events_l = sorted(events_l or [], key=lambda xx:xx[0])
+        self.__nextEvent_i = 0
+
+    @classmethod
+    def fromFile(cls, fileDir_s:str) -> "InputScript":
+        events_l = []
+        with open(fileDir_s, encoding="utf8") as file:
+            for lineNo_i, line_s in enumerate(file, 1):
+                line_s = line_s.strip()
+                if not line_s or line_s.startswith('#'):
+                    continue
+
+                words_l = line_s.split()
+                if len(words_l) < 2:
+                    raise ValueError( "Invalid event at line {}: '{}'".format(lineNo_i, line_s) )
+                try:
+                    tick_i = int(words_l[0])
+                except ValueError:
+                    raise ValueError( "Invalid tick at line {}: '{}'".format(lineNo_i, words_l[0]) )
+                events_l.append( (tick_i, words_l[1], words_l[2:]) )
+
+        return cls(events_l)
+
+    def popEvents(self, tick_i:int) -> List[Tuple[str, List[str]]]:
+        """
+        Returns events whose tick is tick_i or earlier, that haven't been returned yet.
+        """
+        popped_l = []
+        while self.__nextEvent_i < len(self.events_l) and self.events_l[self.__nextEvent_i][0] <= tick_i:
+            _, action_s, args_l = self.events_l[self.__nextEvent_i]
+            popped_l.append( (action_s, args_l) )
+            self.__nextEvent_i += 1
+        return popped_l
+
+
+class HeadlessRunner:
+    def __init__(self, levelNames_l:List[str], inputScript:InputScript=None, printLogs_b:bool=False,
+                 replayer:ir.InputReplayer=None, recorder:ir.InputRecorder=None, levelCache:LevelCache=None):
+        self.globalStates = GlobalStates()
+        self.globalStates.freezeLogic_b = False
+        self.globalStates.titleScreen_b = False
+
+        self.commandQueue_l = []
+        self.console = HeadlessConsole(printLogs_b)
+
+        self.player = Player(False)
+        self.resourceManager = HeadlessResourceManager(self.console, levelCache)
+        self.logicalDude = LogicalDude(self.resourceManager, self.player, self.commandQueue_l, self.globalStates)
+        self.commander = HeadlessCommander(self)
+
+        self.inputScript = inputScript if inputScript is not None else InputScript()
+        self.replayer = replayer
+        self.recorder = recorder
+        self.__moveInput_t = (0.0, 0.0)
+        self.__frameInput = None
+
+        for levelName_s in levelNames_l:
+            self.resourceManager.requestLevelLoad(levelName_s)
+
+        self.tickTimes_l = []
+
+    def run(self, ticks_i:int=None) -> np.ndarray:
+        """
+        Runs given number of ticks and returns seconds spent on each of them.
+        If ticks_i is None, runs until the replay finishes.
+        """
+        if ticks_i is None and self.replayer is None:
+            raise ValueError("Number of ticks is required without replay.")
+
+        tickTimes_l = []
+        while ticks_i is None or len(tickTimes_l) < ticks_i:
+            if self.replayer is not None and self.replayer.isFinished():
+                break
+            tickTimes_l.append( self.tick() )
+        return np.array(tickTimes_l, np.float64)
+
+    def tick(self) -> float:
+        if self.replayer is not None:
+            frameInput = self.replayer.nextFrame()
+            if frameInput is None:
+                raise ValueError("Replay has finished.")
+        else:
+            frameInput = self.__makeFrameInputFromScript( len(self.tickTimes_l) )
+
+        if self.recorder is not None:
+            self.recorder.record(frameInput)
+
+        startTime_f = perf_counter()
+
+        self.commandQueue_l.extend(frameInput.commands_l)
+        ir.applyFrameInput(frameInput, self.player, self.logicalDude)
+        self.logicalDude.update(frameInput.frameDelta_f)
+        self.commander.update()
+
+        elapsed_f = perf_counter() - startTime_f
+        self.tickTimes_l.append(elapsed_f)
+        return elapsed_f
+
+    def applyInput(self, action_s:str, args_l:List[str]) -> None:
+        """
+        Puts an event of input script into input of current tick.
+        """
+        frameInput = self.__frameInput
+        if action_s == "move":
+            self.__moveInput_t = ( float(args_l[0]), float(args_l[1]) )
+            frameInput.moveX_f, frameInput.moveZ_f = self.__moveInput_t
+        elif action_s == "look":
+            frameInput.lookHor_f += float(args_l[0])
+            frameInput.lookVer_f += float(args_l[1])
+        elif action_s == "jump":
+            frameInput.jump_b = True
+        elif action_s == "interact":
+            frameInput.interact_b = True
+        elif action_s == "cmd":
+            frameInput.commands_l.append( " ".join(args_l) )
+        else:
+            raise ValueError( "Unknown input action: '{}'".format(action_s) )
+
+    def __makeFrameInputFromScript(self, tick_i:int) -> ir.FrameInput:
+        self.__frameInput = ir.FrameInput(self.logicalDude.clock.stepDelta_f)
+        self.__frameInput.gameplay_b = True
+        self.__frameInput.moveX_f, self.__frameInput.moveZ_f = self.__moveInput_t
+
+        for action_s, args_l in self.inputScript.popEvents(tick_i):
+            self.applyInput(action_s, args_l)
+
+        frameInput = self.__frameInput
+        self.__frameInput = None
+        return frameInput
+
+    def terminate(self) -> None:
+        if self.recorder is not None:
+            self.recorder.close()
+        self.resourceManager.terminate()
+
+    def getReport(self) -> dict:
+        tickTimes_arr = np.array(self.tickTimes_l, np.float64) * 1000.0
+        if not tickTimes_arr.size:
+            tickTimes_arr = np.zeros(1, np.float64)
+
+        return {
+            "ticks": len(self.tickTimes_l),
+            "steps": self.logicalDude.clock.tickCount_i,
+            "aabb_col_checks": self.logicalDude.aabbColCheckCount_i,
+            "aabb_dist_checks": self.logicalDude.aabbDistCheckCount_i,
+            "levels": [ level.getName() for level in self.resourceManager.levelsGen() ],
+            "total_ms": float(tickTimes_arr.sum()),
+            "mean_ms": float(tickTimes_arr.mean()),
+            "median_ms": float(np.median(tickTimes_arr)),
+            "p95_ms": float(np.percentile(tickTimes_arr, 95)),
+            "max_ms": float(tickTimes_arr.max()),
+            "player_pos": list(self.player.getPosXYZ()),
+            "tick_ms": tickTimes_arr.tolist() if self.tickTimes_l else [],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs game logic without window and reports time spent on each tick.")
+    parser.add_argument("--levels", nargs='+', default=["c01_01"], help="level names without .smll")
+    parser.add_argument("--ticks", type=int, default=None,
+                        help="ticks to run, 120 ticks per second of game time. 1200 by default, or whole record with --replay")
+    parser.add_argument("--script", default=None, help="input script file")
+    parser.add_argument("--replay", default=None, help="input record file, used instead of input script")
+    parser.add_argument("--record", default=None, help="records input of every tick to this file")
+    parser.add_argument("--json", default=None, help="writes the report including every tick time to this file")
+    parser.add_argument("--logs", action="store_true", help="prints console logs")
+    parser.add_argument("--no-cache", action="store_true", help="always compiles levels instead of using level cache")
+    args = parser.parse_args()
+
+    if args.script is not None and args.replay is not None:
+        parser.error("--script and --replay can't be used together.")
+
+    inputScript = None if args.script is None else InputScript.fromFile(args.script)
+    replayer = None if args.replay is None else ir.InputReplayer(args.replay)
+    ticks_i = 1200 if args.ticks is None and replayer is None else args.ticks
+    recorder = None if args.record is None else ir.InputRecorder(args.record)
+
+    levelCache = LevelCache(enabled_b=not args.no_cache)
+    runner = HeadlessRunner(args.levels, inputScript, args.logs, replayer, recorder, levelCache)
+    try:
+        runner.run(ticks_i)
+        report_d = runner.getReport()
+    finally:
+        runner.terminate()
+
+    print( "ticks: {}, levels: {}".format(report_d["ticks"], ", ".join(report_d["levels"])) )
+    print( "total: {:.2f} ms, mean: {:.3f} ms, median: {:.3f} ms, p95: {:.3f} ms, max: {:.3f} ms".format(
+        report_d["total_ms"], report_d["mean_ms"], report_d["median_ms"], report_d["p95_ms"], report_d["max_ms"]
+    ) )
+    print( "player pos: {:.3f}, {:.3f}, {:.3f}".format(*report_d["player_pos"]) )
+    print( "steps: {}, aabb col checks: {}, aabb dist checks: {}".format(
+        report_d["steps"], report_d["aabb_col_checks"], report_d["aabb_dist_checks"]
+    ) )
+
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf8") as file:
+            json.dump(report_d, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
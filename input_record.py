@@ -0,0 +1,210 @@
+"""
+Records input of every frame to a binary file and plays it back.
+
+File starts with a header, and then one record per frame follows.
+    header  : magic b"ERIN", version (uint16), reserved (uint16)
+    a frame : FRAME_STRUCT, and then for each console command, its length (uint16) and utf-8 bytes.
+
+Frame delta and look degrees are stored as double, so a replay advances the fixed step clock exactly like the recorded session.
+"""
+
+import struct
+from typing import List, Optional
+
+import mmath as mm
+
+
+MAGIC_b = b"ERIN"
+VERSION_i = 1
+
+HEADER_STRUCT = struct.Struct("<4sHH")
+# frame delta, move x, move z, look hor, look ver, joystick move x, joystick move z, joystick look hor, joystick look ver,
+# flags, command count
+FRAME_STRUCT = struct.Struct("<dffddffddBH")
+COMMAND_LEN_STRUCT = struct.Struct("<H")
+
+FLAG_GAMEPLAY_i = 1 << 0  # Gameplay input is applied only when menu is closed and logic is not frozen.
+FLAG_JUMP_i = 1 << 1
+FLAG_INTERACT_i = 1 << 2
+FLAG_FLASHLIGHT_i = 1 << 3
+
+
+class InvalidInputRecord(Exception):
+    pass
+
+
+class FrameInput:
+    def __init__(self, frameDelta_f:float=0.0):
+        self.frameDelta_f = float(frameDelta_f)
+
+        self.gameplay_b = False
+
+        # WASD, before being rotated by where the player looks.
+        self.moveX_f = 0.0
+        self.moveZ_f = 0.0
+
+        # Degrees from mouse and arrow keys.
+        self.lookHor_f = 0.0
+        self.lookVer_f = 0.0
+
+        self.joyMoveX_f = 0.0
+        self.joyMoveZ_f = 0.0
+        self.joyLookHor_f = 0.0
+        self.joyLookVer_f = 0.0
+
+        self.jump_b = False
+        self.interact_b = False
+        self.flashLight_b = False  # Toggle
+
+        self.commands_l = []  # Console commands from the user, not from triggers.
+
+    def __repr__(self) -> str:
+        return "< {}.FrameInput object at 0x{:0>16X}, delta: {}, move: {}, look: {}, commands: {} >".format(
+            __name__, id(self), self.frameDelta_f, (self.moveX_f, self.moveZ_f), (self.lookHor_f, self.lookVer_f), self.commands_l
+        )
+
+    def pack(self) -> bytes:
+        flags_i = 0
+        if self.gameplay_b:
+            flags_i |= FLAG_GAMEPLAY_i
+        if self.jump_b:
+            flags_i |= FLAG_JUMP_i
+        if self.interact_b:
+            flags_i |= FLAG_INTERACT_i
+        if self.flashLight_b:
+            flags_i |= FLAG_FLASHLIGHT_i
+
+        data_l = [ FRAME_STRUCT.pack(
+            self.frameDelta_f, self.moveX_f, self.moveZ_f, self.lookHor_f, self.lookVer_f,
+            self.joyMoveX_f, self.joyMoveZ_f, self.joyLookHor_f, self.joyLookVer_f, flags_i, len(self.commands_l)
+        ) ]
+        for command_s in self.commands_l:
+            command_b = command_s.encode("utf8")
+            data_l.append( COMMAND_LEN_STRUCT.pack(len(command_b)) )
+            data_l.append(command_b)
+
+        return b"".join(data_l)
+
+
+def applyFrameInput(frameInput:FrameInput, player:"Player", logicalDude:"LogicalDude") -> None:
+    """
+    Gives input of a frame to the player. Both live game and replays go through here.
+    """
+    if frameInput.flashLight_b:
+        player.flashLightOn_b = not player.flashLightOn_b
+    if frameInput.interact_b:
+        logicalDude.interact()
+
+    if not frameInput.gameplay_b:
+        return
+
+    directionVec4 = mm.Vec4(frameInput.moveX_f, 0, frameInput.moveZ_f).normalize().transform(
+        mm.getRotateYMat4(-player.getAngleY().getDegree())
+    )
+    player.giveHorizontalMomentum(directionVec4.getX(), directionVec4.getZ())
+
+    if frameInput.lookHor_f:
+        player.getAngleY().addDegree(frameInput.lookHor_f)
+    if frameInput.lookVer_f:
+        player.getAngleX().addDegree(frameInput.lookVer_f)
+    if frameInput.jump_b:
+        player.startJumping()
+
+    if frameInput.joyMoveX_f or frameInput.joyMoveZ_f:
+        player.moveAround( mm.Vec4(frameInput.joyMoveX_f, 0, frameInput.joyMoveZ_f), frameInput.frameDelta_f*3 )
+    if frameInput.joyLookHor_f:
+        player.getAngleY().addDegree(frameInput.joyLookHor_f)
+    if frameInput.joyLookVer_f:
+        player.getAngleX().addDegree(frameInput.joyLookVer_f)
+
+    player.validateValuesForCamera()
+
+
+class InputRecorder:
+    def __init__(self, fileDir_s:str):
+        self.fileDir_s = fileDir_s
+        self.frameCount_i = 0
+
+        self.__file = open(fileDir_s, "wb")
+        self.__file.write( HEADER_STRUCT.pack(MAGIC_b, VERSION_i, 0) )
+
+    def record(self, frameInput:FrameInput) -> None:
+        self.__file.write( frameInput.pack() )
+        self.frameCount_i += 1
+
+    def close(self) -> None:
+        if not self.__file.closed:
+            self.__file.close()
+
+
+class InputReplayer:
+    def __init__(self, fileDir_s:str):
+        self.fileDir_s = fileDir_s
+
+        with open(fileDir_s, "rb") as file:
+            self.__data_b = file.read()
+
+        if len(self.__data_b) < HEADER_STRUCT.size:
+            raise InvalidInputRecord(fileDir_s)
+        magic_b, version_i, _ = HEADER_STRUCT.unpack_from(self.__data_b, 0)
+        if magic_b != MAGIC_b:
+            raise InvalidInputRecord( "Not an input record: '{}'".format(fileDir_s) )
+        if version_i != VERSION_i:
+            raise InvalidInputRecord( "Unsupported version {}: '{}'".format(version_i, fileDir_s) )
+
+        self.__offset_i = HEADER_STRUCT.size
+        self.frameCount_i = 0
+
+    def isFinished(self) -> bool:
+        return self.__offset_i >= len(self.__data_b)
+
+    def nextFrame(self) -> Optional[FrameInput]:
+        """
+        Returns None when there is no frame left.
+        """
+        if self.isFinished():
+            return None
+
+        data_b = self.__data_b
+        try:
+            ( frameDelta_f, moveX_f, moveZ_f, lookHor_f, lookVer_f, joyMoveX_f, joyMoveZ_f, joyLookHor_f, joyLookVer_f,
+              flags_i, commandCount_i ) = FRAME_STRUCT.unpack_from(data_b, self.__offset_i)
+            offset_i = self.__offset_i + FRAME_STRUCT.size
+
+            commands_l = []
+            for _ in range(commandCount_i):
+                length_i, = COMMAND_LEN_STRUCT.unpack_from(data_b, offset_i)
+                offset_i += COMMAND_LEN_STRUCT.size
+                if offset_i + length_i > len(data_b):
+                    raise struct.error("command is cut off")
+                commands_l.append( data_b[offset_i:offset_i + length_i].decode("utf8") )
+                offset_i += length_i
+        except struct.error:
+            raise InvalidInputRecord( "Broken frame {} in '{}'".format(self.frameCount_i, self.fileDir_s) )
+
+        frameInput = FrameInput(frameDelta_f)
+        frameInput.gameplay_b = bool(flags_i & FLAG_GAMEPLAY_i)
+        frameInput.moveX_f = moveX_f
+        frameInput.moveZ_f = moveZ_f
+        frameInput.lookHor_f = lookHor_f
+        frameInput.lookVer_f = lookVer_f
+        frameInput.joyMoveX_f = joyMoveX_f
+        frameInput.joyMoveZ_f = joyMoveZ_f
+        frameInput.joyLookHor_f = joyLookHor_f
+        frameInput.joyLookVer_f = joyLookVer_f
+        frameInput.jump_b = bool(flags_i & FLAG_JUMP_i)
+        frameInput.interact_b = bool(flags_i & FLAG_INTERACT_i)
+        frameInput.flashLight_b = bool(flags_i & FLAG_FLASHLIGHT_i)
+        frameInput.commands_l = commands_l
+
+        self.__offset_i = offset_i
+        self.frameCount_i += 1
+        return frameInput
+
+    def readAll(self) -> List[FrameInput]:
+        frames_l = []
+        while True:
+            frameInput = self.nextFrame()
+            if frameInput is None:
+                return frames_l
+            frames_l.append(frameInput)
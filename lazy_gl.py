@@ -0,0 +1,26 @@
+"""
+OpenGL.GL that is imported on first use.
+
+Modules which headless.py and worker processes import along with GL code use this instead of 'import OpenGL.GL as gl',
+so that they can be imported on machines without libGL, as long as nothing of GL is called.
+"""
+
+import importlib
+
+
+class _LazyModule:
+    def __init__(self, moduleName_s:str):
+        self.__moduleName_s = moduleName_s
+        self.__module = None
+
+    def __getattr__(self, name_s:str):
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__moduleName_s)
+
+        # Kept on this object, so the next lookup is as fast as one on the module.
+        value = getattr(self.__module, name_s)
+        setattr(self, name_s, value)
+        return value
+
+
+gl = _LazyModule("OpenGL.GL")
@@ -0,0 +1,158 @@
+"""
+Keeps compiled levels on disk, so a level is compiled only when its .smll file or the compiler changes.
+
+A cache file holds a header and a pickled Level, which has blueprints, colliders, point lights, vertex arrays and
+static collider grid in it.
+    header : magic b"SMLC", and then key in 40 hex digits
+
+The key is sha1 of the .smll file and compiler version. Compiler version is sha1 of source of modules whose code
+decides what a compiled level looks like, plus versions of Python and NumPy which decide how it is pickled.
+So any change to them makes existing cache files stale, and they are overwritten by the next compile.
+"""
+
+import os
+import sys
+import pickle
+import hashlib
+from time import perf_counter
+from typing import Optional, Tuple
+
+import numpy as np
+
+import actor
+import mmath
+import light
+import collide
+import blueprints
+import data_struct
+import level_loader
+from data_struct import Level
+from level_loader import SmllCompiler, pausedGc
+import const
+
+
+MAGIC_b = b"SMLC"
+KEY_LEN_i = 40
+
+_COMPILER_MODULES_t = (level_loader, blueprints, data_struct, collide, light, actor, mmath)
+_compilerVersion_s = None
+
+
+def getCompilerVersion() -> str:
+    global _compilerVersion_s
+
+    if _compilerVersion_s is None:
+        hasher = hashlib.sha1()
+        for module in _COMPILER_MODULES_t:
+            with open(module.__file__, "rb") as file:
+                hasher.update( file.read() )
+        hasher.update( "python {}.{}, numpy {}".format(*sys.version_info[:2], np.__version__).encode("utf8") )
+        _compilerVersion_s = hasher.hexdigest()
+
+    return _compilerVersion_s
+
+
+def makeKey(source_b:bytes) -> str:
+    hasher = hashlib.sha1(source_b)
+    hasher.update( getCompilerVersion().encode("utf8") )
+    return hasher.hexdigest()
+
+
+class LevelCache:
+    def __init__(self, cacheDir_s:str=const.LEVEL_CACHE_DIR_s, enabled_b:bool=True):
+        self.cacheDir_s = cacheDir_s
+        self.enabled_b = bool(enabled_b)
+
+        self.hitCount_i = 0
+        self.missCount_i = 0
+
+    def compile(self, smllFileDir_s:str, onBlockParsed=None) -> Tuple[Level, bool]:
+        """
+        Returns the level and whether it came from cache.
+        onBlockParsed is given to SmllCompiler, so it is never called when the level came from cache.
+        """
+        level, key_s = self.lookUp(smllFileDir_s)
+        if level is not None:
+            return level, True
+
+        level = SmllCompiler(smllFileDir_s, onBlockParsed=onBlockParsed).compile()
+        self.store(smllFileDir_s, key_s, level)
+        return level, False
+
+    def lookUp(self, smllFileDir_s:str) -> Tuple[Optional[Level], Optional[str]]:
+        """
+        Returns the cached level or None, and the key to store the level with after compiling it.
+        The key is None if cache is disabled.
+        """
+        if not self.enabled_b:
+            return None, None
+
+        with open(smllFileDir_s, "rb") as file:
+            key_s = makeKey( file.read() )
+
+        level = self.__load(self.getCacheFileDir(smllFileDir_s), key_s)
+        if level is None:
+            self.missCount_i += 1
+        else:
+            self.hitCount_i += 1
+        return level, key_s
+
+    def store(self, smllFileDir_s:str, key_s:Optional[str], level:Level) -> None:
+        if key_s is not None:
+            self.__save(self.getCacheFileDir(smllFileDir_s), key_s, level)
+
+    def getCacheFileDir(self, smllFileDir_s:str) -> str:
+        levelName_s = os.path.splitext( os.path.basename(smllFileDir_s) )[0]
+        return os.path.join(self.cacheDir_s, levelName_s + ".smllc")
+
+    @staticmethod
+    def __load(cacheFileDir_s:str, key_s:str) -> Optional[Level]:
+        try:
+            with open(cacheFileDir_s, "rb") as file:
+                header_b = file.read( len(MAGIC_b) + KEY_LEN_i )
+                if header_b != MAGIC_b + key_s.encode("ascii"):
+                    return None
+                with pausedGc():
+                    level = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # Broken file, it will be overwritten.
+            print( "Failed to read level cache '{}': {}".format(cacheFileDir_s, e) )
+            return None
+
+        if not isinstance(level, Level):
+            return None
+        return level
+
+    def __save(self, cacheFileDir_s:str, key_s:str, level:Level) -> None:
+        # Written to a temporary file first, so other processes never read a half written file.
+        tempFileDir_s = "{}.{}.tmp".format(cacheFileDir_s, os.getpid())
+        try:
+            os.makedirs(self.cacheDir_s, exist_ok=True)
+            with open(tempFileDir_s, "wb") as file:
+                file.write( MAGIC_b + key_s.encode("ascii") )
+                pickle.dump(level, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(tempFileDir_s, cacheFileDir_s)
+        except OSError as e:
+            print( "Failed to write level cache '{}': {}".format(cacheFileDir_s, e) )
+            try:
+                os.remove(tempFileDir_s)
+            except OSError:
+                pass
+
+
+def main():
+    """
+    Compiles given levels twice and prints how long it took with and without cache.
+    """
+    levelCache = LevelCache()
+    for levelName_s in sys.argv[1:] or ["entry"]:
+        smllFileDir_s = const.MAP_DIR_s + levelName_s + ".smll"
+        for _ in range(2):
+            st = perf_counter()
+            level, hit_b = levelCache.compile(smllFileDir_s)
+            print( "'{}' {} ({:.4f} sec)".format(level.getName(), "from cache" if hit_b else "compiled", perf_counter() - st) )
+
+
+if __name__ == '__main__':
+    main()
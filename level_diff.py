@@ -0,0 +1,166 @@
+"""
+Compares object blueprints of a recompiled level with objects of the live level, for hot reload.
+
+Blueprints are reduced to keys made of plain values, so they can be compared with == and hashed.
+    template key : what is uploaded to GPU for an object::define, which are renderers, colliders and bounding box.
+    instance key : what makes an instance other than its template and position, which are template name, instance name,
+                   static, col group targets and colliders given to the instance.
+
+Objects whose instance key and position did not change are kept as they are. Non static objects whose only position
+changed are moved. Everything else is deleted and instanced again, which reuses the template when it did not change.
+"""
+
+import hashlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import blueprints as bp
+import collide as co
+from data_struct import Level
+
+
+def _makeArrayKey(arr:Optional[np.ndarray]) -> Optional[tuple]:
+    if arr is None:
+        return None
+    return arr.dtype.str, arr.shape, hashlib.sha1( np.ascontiguousarray(arr).tobytes() ).hexdigest()
+
+
+def makeColliderKey(collider:co.Aabb) -> tuple:
+    return (
+        collider.getName(), collider.getStatic(), collider.getWorldMinXYZ(None), collider.getWorldMaxXYZ(None),
+        collider.getWeight(), collider.getTypes(), tuple(collider.getTriggerCommands()), collider.activateOption_i
+    )
+
+
+def makeRendererKey(renBprint:bp.RendererBlueprint) -> tuple:
+    return (
+        renBprint.name_s, renBprint.initPos_t, renBprint.static_b,
+        _makeArrayKey(renBprint.vertexNdarray), _makeArrayKey(renBprint.texCoordNdarray), _makeArrayKey(renBprint.normalNdarray),
+        _makeArrayKey(renBprint.indexNdarray), tuple( _makeArrayKey(x) for x in renBprint.lodIndexNdarrays_l ),
+        renBprint.boxMin_t, renBprint.boxMax_t,
+        renBprint.textureDir_s, renBprint.textureVerNum_f, renBprint.textureHorNum_f,
+        renBprint.specularStrength_f, renBprint.shininess_f
+    )
+
+
+def makeTemplateKey(objBprint:bp.ObjectDefineBlueprint) -> tuple:
+    boundingBox = objBprint.boundingBox
+    return (
+        tuple( makeRendererKey(x) for x in objBprint.rendererBlueprints_l ),
+        tuple( makeColliderKey(x) for x in objBprint.colliders_l ),
+        None if boundingBox is None else makeColliderKey(boundingBox)
+    )
+
+
+def getTemplateName(objBprint) -> str:
+    if isinstance(objBprint, bp.ObjectDefineBlueprint):
+        return objBprint.name_s
+    elif isinstance(objBprint, bp.ObjectUseBlueprint):
+        return objBprint.templateName_s
+    elif isinstance(objBprint, bp.ObjectObjStaticBlueprint):
+        return objBprint.objFileName_s
+    else:
+        raise ValueError( "Unknown blueprint type: {}".format(type(objBprint)) )
+
+
+def makeInstanceKey(objBprint) -> tuple:
+    if isinstance(objBprint, bp.ObjectObjStaticBlueprint):
+        colliders_t = tuple( makeColliderKey(x) for x in objBprint.colliders_l )
+        meshCollision_b = objBprint.meshCollision_b
+    else:
+        colliders_t = ()
+        meshCollision_b = False
+    return (
+        getTemplateName(objBprint), objBprint.name_s, bool(objBprint.static_b),
+        tuple(objBprint.colGroupTargets_l or ()), colliders_t, meshCollision_b
+    )
+
+
+def getSourceKey(objBprint) -> Tuple[tuple, tuple]:
+    """
+    Value for Object.sourceKey_t of an object made from the blueprint.
+    """
+    return makeInstanceKey(objBprint), objBprint.initPos_t
+
+
+class LevelDiff:
+    """
+    What to do to the live level to make it same as the recompiled one.
+    Objects are matched by keys recorded in Object.sourceKey_t when they were instanced.
+    """
+    def __init__(self, level:Level, newLevel:Level):
+        self.newTemplates_l = []      # ObjectDefineBlueprint, which are not defined in the live level.
+        self.changedTemplates_l = []  # ObjectDefineBlueprint, which are defined in the live level with different content.
+        self.newTemplateKeys_d = {}   # define name -> template key, for every define in the new level.
+
+        self.keptCount_i = 0
+        self.moves_l = []    # (Object, new initpos, new Object.sourceKey_t)
+        self.creates_l = []  # object blueprints to instance
+        self.deletes_l = []  # Object
+
+        self.levelPosChanged_b = level.getPosXYZ() != newLevel.getPosXYZ()
+
+        self.__diffTemplates(level, newLevel)
+        self.__diffInstances(level, newLevel)
+
+    def __str__(self) -> str:
+        return "new templates: {}, changed templates: {}, kept: {}, moved: {}, created: {}, deleted: {}".format(
+            len(self.newTemplates_l), len(self.changedTemplates_l), self.keptCount_i,
+            len(self.moves_l), len(self.creates_l), len(self.deletes_l)
+        )
+
+    def isEmpty(self) -> bool:
+        return not ( self.newTemplates_l or self.changedTemplates_l or self.moves_l or self.creates_l or self.deletes_l )
+
+    def getChangedTemplateNames(self) -> List[str]:
+        return [ x.name_s for x in self.changedTemplates_l ]
+
+    def __diffTemplates(self, level:Level, newLevel:Level) -> None:
+        for objBprint in newLevel.objectBlueprints_l:
+            if not isinstance(objBprint, bp.ObjectDefineBlueprint):
+                continue
+
+            templateKey_t = makeTemplateKey(objBprint)
+            self.newTemplateKeys_d[objBprint.name_s] = templateKey_t
+
+            oldTemplateKey_t = level.templateKeys_d.get(objBprint.name_s)
+            if oldTemplateKey_t is None:
+                self.newTemplates_l.append(objBprint)
+            elif oldTemplateKey_t != templateKey_t:
+                self.changedTemplates_l.append(objBprint)
+
+    def __diffInstances(self, level:Level, newLevel:Level) -> None:
+        changedTemplateNames_s = set( self.getChangedTemplateNames() )
+
+        # Instances of changed templates are all made again.
+        liveObjects_d = {}  # (instance key, initpos) -> [Object]
+        for anObject in level.objects_l:
+            if anObject.sourceKey_t is None or anObject.objTempName_s in changedTemplateNames_s:
+                self.deletes_l.append(anObject)
+            else:
+                liveObjects_d.setdefault(anObject.sourceKey_t, []).append(anObject)
+
+        unmatched_l = []
+        for objBprint in newLevel.objectBlueprints_l:
+            sourceKey_t = getSourceKey(objBprint)
+            candidates_l = liveObjects_d.get(sourceKey_t)
+            if candidates_l:
+                candidates_l.pop()
+                self.keptCount_i += 1
+            else:
+                unmatched_l.append( (sourceKey_t, objBprint) )
+
+        movables_d = {}  # instance key -> [Object], which are left after exact matches.
+        for (instanceKey_t, _), candidates_l in liveObjects_d.items():
+            movables_d.setdefault(instanceKey_t, []).extend(candidates_l)
+
+        for sourceKey_t, objBprint in unmatched_l:
+            candidates_l = movables_d.get(sourceKey_t[0])
+            if candidates_l and not objBprint.static_b:
+                self.moves_l.append( (candidates_l.pop(), objBprint.initPos_t, sourceKey_t) )
+            else:
+                self.creates_l.append(objBprint)
+
+        for candidates_l in movables_d.values():
+            self.deletes_l.extend(candidates_l)
@@ -1,9 +1,13 @@
+import re
+import gc
 import time
 import os
-from typing import Optional, List
-from multiprocessing import Process, Queue
+import pickle
+from contextlib import contextmanager
+from typing import Callable, Optional, List, Tuple
+from itertools import accumulate
+from multiprocessing import Pool
 from threading import Thread
-from queue import Empty
 
 import numpy as np
 
@@ -13,6 +17,7 @@ import data_struct as ds
 import blueprints as bp
 import collide as co
 import light as li
+from asset_pool import JobPool, TaskError
 
 
 class CompileErrorSmll(Exception):
@@ -58,61 +63,457 @@ class CompileErrorSmll(Exception):
             raise "Error code '{}' is not valid.".format(self.errorCode_i)
 
 
-class LevelLoader(Process):
-    def __init__(self, toMainQueue:Queue, toProcQueue:Queue):
-        super().__init__()
+TOKEN_SEMICOLON_i = 0  # text is a function call without ';', like "initpos(0,0,0)"
+TOKEN_LBRACE_i = 1     # text is a keyword of a block, like "object::define"
+TOKEN_RBRACE_i = 2     # text is whatever is left before '}', which should be empty
+TOKEN_END_i = 3        # text is whatever is left at the end of file
 
-        self.toMainQueue = toMainQueue
-        self.toProcQueue = toProcQueue
+_PUNCTUATION_KINDS_d = { ";":TOKEN_SEMICOLON_i, "{":TOKEN_LBRACE_i, "}":TOKEN_RBRACE_i }
+_PUNCTUATION_RE = re.compile(r'([{};])')
+# Groups: 1 string, 2 line comment, 3 comment block, 4 unclosed comment block, 5 comment block closing
+# Every alternative starts with a literal out of groups, which lets regex engine skip to candidates fast.
+_STRING_COMMENT_RE = re.compile(r'"([^"\n]*)"?|/(/)[^\n]*|/(\*.*?\*)/|/(\*)|\*(/)', re.DOTALL)
 
-        self.run_b = True
 
-    def run(self) -> None:
-        while self.run_b:
-            try:
-                smllFileDir_s = self.toProcQueue.get_nowait()
-            except Empty:
-                pass
-            else:
-                if not os.path.isfile(smllFileDir_s):
-                    self.toMainQueue.put( (-1, smllFileDir_s) )
-                    continue
+class SmllTokenStream:
+    """
+    Lexer of smll. Whole text is turned into tokens at once, with a few passes of str methods and regex over the text
+    instead of looking at each character in Python.
+
+    Whitespaces out of quotes and comments are dropped, quotes are removed and everything is lowered,
+    so text of a token is what used to be left between punctuations.
+    A token is (kind, text, line index of the punctuation).
+    """
+    def __init__(self, text_s:str):
+        text_s = _STRING_COMMENT_RE.sub( self.__replaceStringOrComment, text_s.lower() )
+
+        # Chunks with whitespaces and punctuations come in turn, like [ chunk, ';', chunk, '{', ..., chunk ].
+        rawChunks_l = _PUNCTUATION_RE.split(text_s)
+        clearText_s = text_s.replace(" ", "").replace("\t", "").replace("\n", "").replace("\0", " ").replace("\1", "\t")
+        clearChunks_l = _PUNCTUATION_RE.split(clearText_s)
+        if len(clearChunks_l) != len(rawChunks_l):
+            raise CompileErrorSmll(0, "level", None, 6, "Chunks mismatch after removing whitespaces.")
+
+        self.__rawTexts_l = rawChunks_l[0::2]  # token index -> raw text before its punctuation
+        lineIndices_l = list( accumulate( chunk_s.count("\n") for chunk_s in self.__rawTexts_l ) )
+        kinds_l = [ _PUNCTUATION_KINDS_d[punc_s] for punc_s in clearChunks_l[1::2] ]
+        kinds_l.append(TOKEN_END_i)
+        self.__tokens_l = list( zip(kinds_l, clearChunks_l[0::2], lineIndices_l) )
+
+        self.__index_i = 0
+
+    @classmethod
+    def fromParts(cls, tokens_l:list, rawTexts_l:list) -> "SmllTokenStream":
+        """
+        Makes a stream of tokens taken out of another stream. Both lists must end with the end token.
+        """
+        tokens = cls.__new__(cls)
+        tokens.__tokens_l = tokens_l
+        tokens.__rawTexts_l = rawTexts_l
+        tokens.__index_i = 0
+        return tokens
+
+    @staticmethod
+    def __replaceStringOrComment(match) -> str:
+        """
+        Whitespaces in strings are replaced with \\0 and \\1 so they survive, comments become as many line breaks.
+        """
+        group_i = match.lastindex
+        if group_i == 1:
+            return match.group(1).replace(" ", "\0").replace("\t", "\1")
+        elif group_i == 2:
+            return ""
+        elif group_i == 3:
+            return "\n" * match.group(3).count("\n")
+        elif group_i == 4:
+            lineNo_i = match.string.count("\n", 0, match.start()) + 1
+            raise CompileErrorSmll(lineNo_i, "level", None, 0, "Comment block does not close")
+        else:
+            lineNo_i = match.string.count("\n", 0, match.start()) + 1
+            raise CompileErrorSmll(lineNo_i, "level", None, 0, "Comment block closes without ever opened")
 
-                smllCompiler = SmllCompiler(smllFileDir_s)
-                st = time.time()
-                level = smllCompiler.compile()
-                print("Compilation complete: '{}' ({:.4f} sec)".format(level.getName(), time.time() - st) )
+    def next(self) -> tuple:
+        token_t = self.__tokens_l[self.__index_i]
+        if token_t[0] != TOKEN_END_i:
+            self.__index_i += 1
+        return token_t
 
-                self.toMainQueue.put(level)
+    def getBlockStartLineIndex(self, lBraceLineIndex_i:int) -> int:
+        """
+        Line index that is added to line numbers of a block, call it right after taking '{'.
+        It is the line of '{' if anything follows it in the same line, or the next line otherwise.
+        """
+        rawChunk_s = self.__rawTexts_l[self.__index_i]
+        newLine_i = rawChunk_s.find("\n")
+        if newLine_i == -1 or rawChunk_s[:newLine_i].strip(" \t"):
+            return lBraceLineIndex_i
+        else:
+            return lBraceLineIndex_i + 1
 
-    def terminate(self):
-        self.run_b = False
+    def splitTopLevel(self) -> Optional[ Tuple[List[tuple], List[Tuple[int, int]]] ]:
+        """
+        Returns tokens of top level functions, and (first token index, last token index + 1) of each top level block.
+        Returns None if braces do not match or anything is left at the end, whose errors only the parser can tell.
+        """
+        functions_l = []
+        blockRanges_l = []
+        depth_i = 0
+        blockStart_i = 0
+        for x, token_t in enumerate(self.__tokens_l):
+            kind_i = token_t[0]
+            if kind_i == TOKEN_LBRACE_i:
+                if depth_i == 0:
+                    blockStart_i = x
+                depth_i += 1
+            elif kind_i == TOKEN_RBRACE_i:
+                depth_i -= 1
+                if depth_i == 0:
+                    blockRanges_l.append( (blockStart_i, x + 1) )
+                elif depth_i < 0:
+                    return None
+            elif kind_i == TOKEN_SEMICOLON_i:
+                if depth_i == 0:
+                    functions_l.append(token_t)
+            elif depth_i != 0 or token_t[1]:
+                return None
+
+        return functions_l, blockRanges_l
+
+    def sliceBlocks(self, blockRanges_l:List[Tuple[int, int]]) -> Tuple[list, list]:
+        """
+        Returns tokens and raw texts of given blocks with the end token, for fromParts().
+        """
+        tokens_l = []
+        rawTexts_l = []
+        for begin_i, end_i in blockRanges_l:
+            tokens_l += self.__tokens_l[begin_i:end_i]
+            rawTexts_l += self.__rawTexts_l[begin_i:end_i]
+        tokens_l.append( (TOKEN_END_i, "", self.__tokens_l[-1][2]) )
+        rawTexts_l.append("")
+        return tokens_l, rawTexts_l
+
+
+# Kinds of messages LevelLoader sends while a level is being compiled, as (kind, level name, payload).
+# Errors are sent as (-1, file dir) when the file does not exist, and (-2, file dir, error text) when compiling failed.
+STREAM_HEAD_i = 1         # Level with name, initpos and bounding box only.
+STREAM_OBJECT_i = 2       # An object blueprint.
+STREAM_POINT_LIGHT_i = 3  # A PointLight.
+STREAM_COL_GROUP_i = 4    # An Aabb of a col group.
+STREAM_TAIL_i = 5         # Level with everything but object blueprints, which are all sent. Compilation is complete.
+
+
+class LevelStreamer:
+    """
+    Sends top level blocks of a level to the main process as soon as they are parsed, so that it can start making
+    object templates and requesting textures while the rest of the file is compiled.
+
+    Nothing is sent until both initpos and bounding::aabb are parsed, since the main process needs them to add the level.
+    If that never happens before the end, hasStarted() is False and the whole level should be sent as before.
+    """
+    def __init__(self, send:Callable[[tuple], None], levelName_s:str):
+        self.send = send
+        self.levelName_s = levelName_s
+
+        self.__started_b = False
+        self.__sentObjectCount_i = 0
+        self.__sentPointLightCount_i = 0
+        self.__sentColGroupCount_i = 0
+
+    def __call__(self, levelBprint:bp.LevelBlueprint) -> None:
+        if not self.__started_b:
+            if levelBprint.initPos_t is None or levelBprint.boundingBox is None:
+                return
+            head = ds.Level(self.levelName_s, levelBprint.initPos_t)
+            head.boundingBox = levelBprint.boundingBox
+            head.colGroups_l = []
+            self.__put(STREAM_HEAD_i, head)
+            self.__started_b = True
+
+        self.__sendNew(levelBprint.objectBlueprints_l, levelBprint.pointLights_l, levelBprint.colGroups_l)
+
+    def hasStarted(self) -> bool:
+        return self.__started_b
+
+    def finish(self, level:ds.Level) -> None:
+        """
+        Sends what is left, and then the level without object blueprints.
+        """
+        self.__sendNew(level.objectBlueprints_l, level.pointLights_l, level.colGroups_l)
+
+        tail = ds.Level(level.getName(), level.getPosXYZ())
+        tail.takeLayoutFrom(level)
+        self.__put(STREAM_TAIL_i, tail)
+
+    def __sendNew(self, objectBlueprints_l:list, pointLights_l:list, colGroups_l:list) -> None:
+        for objBprint in objectBlueprints_l[self.__sentObjectCount_i:]:
+            self.__put(STREAM_OBJECT_i, objBprint)
+        self.__sentObjectCount_i = len(objectBlueprints_l)
+
+        for pointLight in pointLights_l[self.__sentPointLightCount_i:]:
+            self.__put(STREAM_POINT_LIGHT_i, pointLight)
+        self.__sentPointLightCount_i = len(pointLights_l)
+
+        for colGroup in colGroups_l[self.__sentColGroupCount_i:]:
+            self.__put(STREAM_COL_GROUP_i, colGroup)
+        self.__sentColGroupCount_i = len(colGroups_l)
+
+    def __put(self, kind_i:int, payload) -> None:
+        self.send( (kind_i, self.levelName_s, payload) )
+
+
+class LevelLoader:
+    """
+    Job of AssetPool which loads a level from level cache, or compiles it with SmllCompileJob on workers of the pool.
+    Several levels are compiled at once, and top level blocks of a large level are split over workers.
+
+    Sends the Level, or its pieces through LevelStreamer if stream_b is True. Sends (-1, file dir) if the file does not
+    exist, and (-2, file dir, error text) if it failed to compile.
+    """
+    def __init__(self, smllFileDir_s:str, stream_b:bool, levelCache:"LevelCache"=None):
+        self.smllFileDir_s = smllFileDir_s
+        self.stream_b = bool(stream_b)
+        self.levelCache = levelCache
+
+        self.__send = None
+        self.__job = None
+        self.__streamer = None
+        self.__key_s = None
+        self.__startTime_f = None
+        self.__finished_b = False
+
+    def start(self, pool:JobPool, send) -> None:
+        self.__send = send
+        if not os.path.isfile(self.smllFileDir_s):
+            send( (-1, self.smllFileDir_s) )
+            return
+
+        # Reloads need the whole level at once for diffing, so they are not streamed.
+        if self.stream_b:
+            self.__streamer = LevelStreamer( send, getLevelNameOfFile(self.smllFileDir_s) )
+
+        self.__startTime_f = time.time()
         try:
-            super().terminate()
-        except AttributeError:
-            pass
+            if self.levelCache is not None:
+                level, self.__key_s = self.levelCache.lookUp(self.smllFileDir_s)
+                if level is not None:
+                    print( "Loaded from cache: '{}' ({:.4f} sec)".format(level.getName(), time.time() - self.__startTime_f) )
+                    send(level)
+                    return
+            self.__job = SmllCompileJob(self.smllFileDir_s, pool, pool.workerCount_i * 4, self.__streamer)
+        except CompileErrorSmll as e:  # Likely while editing a level for hot reload.
+            send( (-2, self.smllFileDir_s, str(e)) )
+
+    def poll(self) -> None:
+        # Chunks which finish after the level is done are of no use, such as ones left after another chunk failed.
+        if self.__finished_b:
+            return
 
-        print("Thread 'LevelLoader' terminated")
+        try:
+            level = self.__job.poll()
+        except (CompileErrorSmll, TaskError) as e:  # TaskError is anything else from compiling again, like a removed file.
+            self.__finished_b = True
+            self.__send( (-2, self.smllFileDir_s, str(e)) )
+            return
+        if level is None:
+            return
+
+        self.__finished_b = True
+
+        if self.levelCache is not None:
+            self.levelCache.store(self.smllFileDir_s, self.__key_s, level)
+        print( "Compilation complete: '{}' ({:.4f} sec)".format(level.getName(), time.time() - self.__startTime_f) )
+
+        if self.__streamer is not None and self.__streamer.hasStarted():
+            self.__streamer.finish(level)
+        else:
+            self.__send(level)
+
+
+def makeBoxNdArrays(min_t:Tuple[float, float, float], max_t:Tuple[float, float, float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns vertices, texture coords and normals of a box as 36 vertices of triangles.
+    """
+    left_f, down_f, far_f = min_t
+    right_f, up_f, near_f = max_t
+
+    vertex_arr = np.array( [
+        left_f,  up_f, far_f,
+        left_f,  up_f, near_f,
+        right_f, up_f, near_f,
+        left_f,  up_f, far_f,
+        right_f, up_f, near_f,
+        right_f, up_f, far_f,
+
+        left_f,  up_f,   near_f,
+        left_f,  down_f, near_f,
+        right_f, down_f, near_f,
+        left_f,  up_f,   near_f,
+        right_f, down_f, near_f,
+        right_f, up_f,   near_f,
+
+        right_f, up_f, near_f,
+        right_f, down_f, near_f,
+        right_f, down_f, far_f,
+        right_f, up_f, near_f,
+        right_f, down_f, far_f,
+        right_f, up_f, far_f,
+
+        right_f, up_f, far_f,
+        right_f, down_f, far_f,
+        left_f, down_f, far_f,
+        right_f, up_f, far_f,
+        left_f, down_f, far_f,
+        left_f, up_f, far_f,
+
+        left_f, up_f, far_f,
+        left_f, down_f, far_f,
+        left_f, down_f, near_f,
+        left_f, up_f, far_f,
+        left_f, down_f, near_f,
+        left_f, up_f, near_f,
+
+        right_f, down_f, far_f,
+        right_f, down_f, near_f,
+        left_f, down_f, near_f,
+        right_f, down_f, far_f,
+        left_f, down_f, near_f,
+        left_f, down_f, far_f
+    ], np.float32 )
+
+    texCoord_arr = np.array( [
+        0, 1,
+        0, 0,
+        1, 0,
+        0, 1,
+        1, 0,
+        1, 1,
+
+        0, 1,
+        0, 0,
+        1, 0,
+        0, 1,
+        1, 0,
+        1, 1,
+
+        0, 1,
+        0, 0,
+        1, 0,
+        0, 1,
+        1, 0,
+        1, 1,
+
+        0, 1,
+        0, 0,
+        1, 0,
+        0, 1,
+        1, 0,
+        1, 1,
+
+        0, 1,
+        0, 0,
+        1, 0,
+        0, 1,
+        1, 0,
+        1, 1,
+
+        0, 1,
+        0, 0,
+        1, 0,
+        0, 1,
+        1, 0,
+        1, 1,
+    ], np.float32 )
+
+    normal_arr = np.array( [
+        0, 1, 0,
+        0, 1, 0,
+        0, 1, 0,
+        0, 1, 0,
+        0, 1, 0,
+        0, 1, 0,
+
+        0, 0, 1,
+        0, 0, 1,
+        0, 0, 1,
+        0, 0, 1,
+        0, 0, 1,
+        0, 0, 1,
+
+        1, 0, 0,
+        1, 0, 0,
+        1, 0, 0,
+        1, 0, 0,
+        1, 0, 0,
+        1, 0, 0,
+
+        0, 0, -1,
+        0, 0, -1,
+        0, 0, -1,
+        0, 0, -1,
+        0, 0, -1,
+        0, 0, -1,
+
+        -1, 0, 0,
+        -1, 0, 0,
+        -1, 0, 0,
+        -1, 0, 0,
+        -1, 0, 0,
+        -1, 0, 0,
+
+        0, -1, 0,
+        0, -1, 0,
+        0, -1, 0,
+        0, -1, 0,
+        0, -1, 0,
+        0, -1, 0,
+    ], np.float32 )
+
+    return vertex_arr, texCoord_arr, normal_arr
+
+
+def makeUnitCubeNdArrays() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns vertices, texture coords, normals and indices of the box from (0, 0, 0) to (1, 1, 1),
+    which is 4 vertices and 6 indices for each face.
+    Drawing it scaled by size of a box and moved to its min pos is same as drawing makeBoxNdArrays() of the box.
+    """
+    vertex_arr, texCoord_arr, normal_arr = makeBoxNdArrays( (0.0, 0.0, 0.0), (1.0, 1.0, 1.0) )
+
+    # Each face is two triangles, (a, b, c) and (a, c, d).
+    corners_arr = ( np.arange(6)[:, None] * 6 + np.array([0, 1, 2, 5]) ).ravel()
+    index_arr = ( np.arange(6)[:, None] * 4 + np.array([0, 1, 2, 0, 2, 3]) ).ravel().astype(np.uint32)
+
+    return (
+        vertex_arr.reshape(-1, 3)[corners_arr].ravel(), texCoord_arr.reshape(-1, 2)[corners_arr].ravel(),
+        normal_arr.reshape(-1, 3)[corners_arr].ravel(), index_arr
+    )
+
+
+def getLevelNameOfFile(smllFileDir_s:str) -> str:
+    headCut_i = smllFileDir_s.rindex('/') + 1
+    tailCut_i = smllFileDir_s.index('.', headCut_i)
+    return smllFileDir_s[headCut_i:tailCut_i]
 
 
 class SmllCompiler:
-    def __init__(self, fileDir_s:str, print_b:bool=False):
+    def __init__(self, fileDir_s:str, print_b:bool=False, onBlockParsed=None):
+        """
+        onBlockParsed is called with the LevelBlueprint after each top level block or function is parsed.
+        """
         self.__fileDir_s = fileDir_s
 
         self.__print_b = bool(print_b)
+        self.__onBlockParsed = onBlockParsed
 
     def compile(self) -> ds.Level:
-        headCut_i = self.__fileDir_s.rindex('/') + 1
-        tailCut_i = self.__fileDir_s.index('.', headCut_i)
-        fileName_s = self.__fileDir_s[headCut_i:tailCut_i]
         with open(self.__fileDir_s) as file:
-            fileData_l = file.readlines()
+            text_s = file.read()
 
-        fileData_l = self.makeTextClear(fileData_l)
+        tokens = SmllTokenStream(text_s)
 
         levelBprint = bp.LevelBlueprint()
-        levelBprint.name_s = fileName_s
-        level = self.takeLevelBlock(fileData_l, levelBprint)
+        levelBprint.name_s = getLevelNameOfFile(self.__fileDir_s)
+        level = self.takeLevelBlock(tokens, levelBprint, self.__onBlockParsed)
         self.checkNameDuplicate(level)
 
         if self.__print_b:
@@ -139,181 +540,76 @@ class SmllCompiler:
         return level
 
     @staticmethod
-    def deleteWhiteSpaces(a:str) -> str:
-        newString_l = []
-        inString_b = False
-        for x_s in a:
-            if inString_b:
-                if x_s == '"':
-                    inString_b = False
-                else:
-                    newString_l.append(x_s)
-            else:
-                if x_s == '"':
-                    inString_b = True
-                else:
-                    for y_s in (' ', '\t', '\n'):
-                        if x_s == y_s:
-                            break
-                    else:
-                        newString_l.append(x_s)
-        return ''.join(newString_l)
+    def splitFunction(text_s:str, lineIndex_i:int, type_s:str, name_s:Optional[str]) -> Tuple[str, str]:
+        """
+        "initpos(0,0,0)" -> ("initpos", "0,0,0)")
+        """
+        splited_l = text_s.split('(')
+        if len(splited_l) != 2:
+            raise CompileErrorSmll(lineIndex_i + 1, type_s, name_s, 1, text_s)
+        return splited_l[0], splited_l[1]
     @classmethod
-    def makeTextClear(cls, fileData_l: list) -> List[str]:
-        commentBlock_b = False
-        commentBlockOpenedLineNo_i = -1
-
-        for x, x_s in enumerate(fileData_l):
-            x_s = cls.deleteWhiteSpaces(x_s)
-            x_s = x_s.lower()
-
-            #### Remove /* */ comment blocks ####
-
-            if x_s.count("/*"):
-                commentIndex_i = x_s.index("/*")
-                x_s = x_s[:commentIndex_i]
-                commentBlock_b = True
-                commentBlockOpenedLineNo_i = x + 1
-            if x_s.count("*/"):
-                if commentBlock_b:
-                    commentIndex_i = x_s.index("*/") + 2
-                    x_s = x_s[commentIndex_i:]
-                    commentBlock_b = False
-                else:
-                    raise CompileErrorSmll(x + 1, "level", None, 0, "Comment block closes without ever opened")
-            if commentBlock_b and not x_s.count("/*") and not x_s.count("*/"):
-                x_s = ""
-
-            #### Remove // commenet ####
-            if x_s.count("//"):
-                commentIndex_i = x_s.index("//")
-                x_s = x_s[:commentIndex_i]
-
-            fileData_l[x] = x_s
-
-        if commentBlock_b:
-            raise CompileErrorSmll(commentBlockOpenedLineNo_i, "level", None, 0, "Comment block does not close")
-
-        ####  ####
-
-        return fileData_l
+    def takeFunctionsBlock(cls, tokens:SmllTokenStream, bprint, applyFunction, type_s:str, startLineIndex_i:int) -> None:
+        """
+        Applies every function in a block that has no child block, until the '}' of the block.
+        """
+        while True:
+            kind_i, text_s, lineIndex_i = tokens.next()
+            if kind_i == TOKEN_SEMICOLON_i:
+                funcName_s, args_s = cls.splitFunction(text_s, lineIndex_i, type_s, bprint.name_s)
+                applyFunction(bprint, funcName_s, args_s, lineIndex_i)
+            elif kind_i == TOKEN_RBRACE_i:
+                if text_s:
+                    raise CompileErrorSmll(lineIndex_i + 1, type_s, bprint.name_s, 1, text_s + "}")
+                return
+            elif kind_i == TOKEN_LBRACE_i:
+                raise CompileErrorSmll(lineIndex_i + 1, type_s, bprint.name_s, 2, text_s)
+            else:
+                raise CompileErrorSmll(startLineIndex_i + 1, type_s, bprint.name_s, 0, "Block does not close")
 
     ######## Level ########
 
     @classmethod
-    def takeLevelBlock(cls, fileData_l:list, levelBprint:bp.LevelBlueprint) -> ds.Level:
-        accumKeyword_l = []
-        accumBlock_l = []
-        workingToken_i = 0
-        curBlockDepth_i = 0
-        blockStartLineIndex_i = -1
-
-        for x, x_s in enumerate(fileData_l):
-            accumLine_l = []
-            lineIndex_i = x
-
-            foundInThisLoop_b = False
-
-            if workingToken_i > 0 and blockStartLineIndex_i == -1:
-                blockStartLineIndex_i = lineIndex_i
-
-            for y_s in x_s:
-                if workingToken_i == 0:
-                    if y_s == "{":
-                        keyword_s = ''.join(accumKeyword_l)
-                        accumKeyword_l = []
-                        if keyword_s == "object::define":
-                            workingToken_i = 1
-                            curBlockDepth_i = 1
-                            foundInThisLoop_b = True
-                        elif keyword_s == "object::objstatic":
-                            workingToken_i = 6
-                            curBlockDepth_i = 1
-                            foundInThisLoop_b = True
-                        elif keyword_s == "object::use":
-                            workingToken_i = 3
-                            curBlockDepth_i = 1
-                            foundInThisLoop_b = True
-                        elif keyword_s == "light::pointlight":
-                            workingToken_i = 2
-                            curBlockDepth_i = 1
-                            foundInThisLoop_b = True
-                        elif keyword_s == "bounding::aabb":
-                            workingToken_i = 4
-                            curBlockDepth_i = 1
-                            foundInThisLoop_b = True
-                        elif keyword_s == "colgroup::aabb":
-                            workingToken_i = 5
-                            curBlockDepth_i = 1
-                            foundInThisLoop_b = True
-                        else:
-                            raise CompileErrorSmll(lineIndex_i + 1, "level", levelBprint.name_s, 2, keyword_s)
-
-                    elif y_s == ";":  # Found a function
-                        funcName_s, args_s = "".join(accumKeyword_l).split('(')
-                        accumKeyword_l = []
-                        cls.applyLevelFunction(levelBprint, funcName_s, args_s, lineIndex_i)
-                    else:
-                        accumKeyword_l.append(y_s)
-                elif workingToken_i > 0:
-                    if blockStartLineIndex_i == -1:
-                        blockStartLineIndex_i = lineIndex_i
-
-                    if y_s == "{":
-                        curBlockDepth_i += 1
-                        accumLine_l.append(y_s)
-                    elif y_s == "}":
-                        curBlockDepth_i -= 1
-                        if curBlockDepth_i == 0:
-                            if workingToken_i == 1:
-                                levelBprint.objectBlueprints_l.append( cls.takeObjectDefineBlock(accumBlock_l, blockStartLineIndex_i) )
-                                accumBlock_l = []
-                                workingToken_i = 0
-                                blockStartLineIndex_i = -1
-                            elif workingToken_i == 2:
-                                levelBprint.pointLights_l.append( cls.takePointLightBlock(accumBlock_l, blockStartLineIndex_i) )
-                                accumBlock_l = []
-                                workingToken_i = 0
-                                blockStartLineIndex_i = -1
-                            elif workingToken_i == 3:
-                                levelBprint.objectBlueprints_l.append( cls.takeObjectUseBlock(accumBlock_l, blockStartLineIndex_i) )
-                                accumBlock_l = []
-                                workingToken_i = 0
-                                blockStartLineIndex_i = -1
-                            elif workingToken_i == 4:
-                                if levelBprint.boundingBox is None:
-                                    levelBprint.boundingBox = cls.takeBoundingAabbBlock(accumBlock_l, blockStartLineIndex_i)
-                                    accumBlock_l = []
-                                    workingToken_i = 0
-                                    blockStartLineIndex_i = -1
-                                else:
-                                    raise FileExistsError
-                            elif workingToken_i == 6:  # object::objstatic
-                                levelBprint.objectBlueprints_l.append( cls.takeObjectObjStaticBlock(accumBlock_l, blockStartLineIndex_i) )
-                                accumBlock_l = []
-                                workingToken_i = 0
-                                blockStartLineIndex_i = -1
-                            elif workingToken_i == 5:
-                                levelBprint.colGroups_l.append( cls.takeBoundingAabbBlock(accumBlock_l, blockStartLineIndex_i) )
-                                accumBlock_l = []
-                                workingToken_i = 0
-                                blockStartLineIndex_i = -1
-                            else:
-                                raise ValueError
-                        else:
-                            accumLine_l.append(y_s)
+    def takeLevelBlock(cls, tokens:SmllTokenStream, levelBprint:bp.LevelBlueprint, onBlockParsed=None) -> ds.Level:
+        cls.takeLevelContents(tokens, levelBprint, onBlockParsed)
+        cls.checkLevel(levelBprint, 0)
+        return cls.makeLevel(levelBprint)
+    @classmethod
+    def takeLevelContents(cls, tokens:SmllTokenStream, levelBprint:bp.LevelBlueprint, onBlockParsed=None) -> None:
+        while True:
+            kind_i, text_s, lineIndex_i = tokens.next()
+
+            if kind_i == TOKEN_LBRACE_i:
+                blockStartLineIndex_i = tokens.getBlockStartLineIndex(lineIndex_i)
+                if text_s == "object::define":
+                    levelBprint.objectBlueprints_l.append( cls.takeObjectDefineBlock(tokens, blockStartLineIndex_i) )
+                elif text_s == "object::objstatic":
+                    levelBprint.objectBlueprints_l.append( cls.takeObjectObjStaticBlock(tokens, blockStartLineIndex_i) )
+                elif text_s == "object::use":
+                    levelBprint.objectBlueprints_l.append( cls.takeObjectUseBlock(tokens, blockStartLineIndex_i) )
+                elif text_s == "light::pointlight":
+                    levelBprint.pointLights_l.append( cls.takePointLightBlock(tokens, blockStartLineIndex_i) )
+                elif text_s == "bounding::aabb":
+                    if levelBprint.boundingBox is None:
+                        levelBprint.boundingBox = cls.takeBoundingAabbBlock(tokens, blockStartLineIndex_i)
                     else:
-                        accumLine_l.append(y_s)
-
-            if workingToken_i > 0:
-                if accumLine_l:
-                    accumBlock_l.append(accumLine_l)
+                        raise FileExistsError
+                elif text_s == "colgroup::aabb":
+                    levelBprint.colGroups_l.append( cls.takeBoundingAabbBlock(tokens, blockStartLineIndex_i) )
                 else:
-                    if not foundInThisLoop_b:
-                        accumBlock_l.append([])
+                    raise CompileErrorSmll(lineIndex_i + 1, "level", levelBprint.name_s, 2, text_s)
+            elif kind_i == TOKEN_SEMICOLON_i:  # Found a function
+                funcName_s, args_s = cls.splitFunction(text_s, lineIndex_i, "level", levelBprint.name_s)
+                cls.applyLevelFunction(levelBprint, funcName_s, args_s, lineIndex_i)
+            elif kind_i == TOKEN_RBRACE_i:
+                raise CompileErrorSmll(lineIndex_i + 1, "level", levelBprint.name_s, 1, text_s + "}")
+            else:
+                if text_s:
+                    raise CompileErrorSmll(lineIndex_i + 1, "level", levelBprint.name_s, 1, text_s)
+                break
 
-        cls.checkLevel(levelBprint, 0)
-        return cls.makeLevel(levelBprint)
+            if onBlockParsed is not None:
+                onBlockParsed(levelBprint)
     @staticmethod
     def applyLevelFunction(levelBprint:bp.LevelBlueprint, funcName_s:str, args_s:str, lineIndex_i:int) -> None:
         args_s = args_s[:-1]
@@ -329,6 +625,15 @@ class SmllCompiler:
                 levelBprint.initPos_t = tuple(map(lambda xx:float(xx), args_l))
             except ValueError:
                 raise CompileErrorSmll(lineNo_i, "level", levelBprint.name_s, 3, "initpos(float, float, float)", args_l)
+        elif funcName_s == "gridcellsize":
+            if not len(args_l) == 1:
+                raise CompileErrorSmll(lineNo_i, "level", levelBprint.name_s, 3, "gridcellsize(float)", args_l)
+            try:
+                levelBprint.gridCellSize_f = float(args_l[0])
+            except ValueError:
+                raise CompileErrorSmll(lineNo_i, "level", levelBprint.name_s, 3, "gridcellsize(float)", args_l)
+            if levelBprint.gridCellSize_f <= 0.0:
+                raise CompileErrorSmll(lineNo_i, "level", levelBprint.name_s, 3, "gridcellsize(float)", args_l)
         else:
             raise CompileErrorSmll(lineNo_i, "level", levelBprint.name_s, 4, funcName_s)
     @staticmethod
@@ -339,19 +644,63 @@ class SmllCompiler:
             raise CompileErrorSmll(startLineIndex_i + 1, "level", levelBprint.name_s, 5, "initpos")
         elif levelBprint.boundingBox is None:
             raise CompileErrorSmll(startLineIndex_i + 1, "level", levelBprint.name_s, 5, "bounding::aabb")
-    @staticmethod
-    def makeLevel(levelBprint:bp.LevelBlueprint) -> ds.Level:
+    @classmethod
+    def makeLevel(cls, levelBprint:bp.LevelBlueprint) -> ds.Level:
         level = ds.Level(levelBprint.name_s, levelBprint.initPos_t)
         level.objectBlueprints_l = levelBprint.objectBlueprints_l
         level.pointLights_l = levelBprint.pointLights_l
         level.boundingBox = levelBprint.boundingBox
         level.colGroups_l = levelBprint.colGroups_l
+        cls.bakeStaticColliderGrid(levelBprint, level)
         return level
+    @staticmethod
+    def bakeStaticColliderGrid(levelBprint:bp.LevelBlueprint, level:ds.Level) -> None:
+        """
+        Puts colliders of static objects into a uniform grid.
+        object::use blocks are included only when their template is defined in the same level.
+        Grid ids are indices of level.staticGridKeys_l, whose items are (object name, object initpos, index in object's colliders_l).
+        Names alone are not unique since unnamed objects all get 'unknown'.
+        """
+        templates_d = {}
+        for objBprint in levelBprint.objectBlueprints_l:
+            if isinstance(objBprint, bp.ObjectDefineBlueprint):
+                templates_d[objBprint.name_s] = objBprint
+
+        grid = co.UniformGrid(levelBprint.gridCellSize_f)
+        keys_l = []
+        xLevel_f, yLevel_f, zLevel_f = level.getWorldXYZ()
+
+        for objBprint in levelBprint.objectBlueprints_l:
+            if not objBprint.static_b:
+                continue
+
+            if isinstance(objBprint, bp.ObjectUseBlueprint):
+                try:
+                    colliders_l = templates_d[objBprint.templateName_s].colliders_l
+                except KeyError:
+                    continue
+            else:
+                colliders_l = objBprint.colliders_l
+
+            xObj_f = objBprint.initPos_t[0] + xLevel_f
+            yObj_f = objBprint.initPos_t[1] + yLevel_f
+            zObj_f = objBprint.initPos_t[2] + zLevel_f
+            for x, collider in enumerate(colliders_l):
+                xMin_f, yMin_f, zMin_f = collider.getWorldMinXYZ(None)
+                xMax_f, yMax_f, zMax_f = collider.getWorldMaxXYZ(None)
+                grid.insert(
+                    len(keys_l),
+                    (xMin_f + xObj_f, yMin_f + yObj_f, zMin_f + zObj_f), (xMax_f + xObj_f, yMax_f + yObj_f, zMax_f + zObj_f)
+                )
+                keys_l.append( (objBprint.name_s, tuple(objBprint.initPos_t), x) )
+
+        level.staticGrid = grid
+        level.staticGridKeys_l = keys_l
 
     ######## Objects ########
 
     @classmethod
-    def takeObjectDefineBlock(cls, objectData_l:list, startLineIndex_i:int) -> bp.ObjectDefineBlueprint:
+    def takeObjectDefineBlock(cls, tokens:SmllTokenStream, startLineIndex_i:int) -> bp.ObjectDefineBlueprint:
         tokenFunctions_d = {
             "renderer::aab": cls.takeRendererAabBlock,
             "renderer::quad": cls.takeRendererQuadBlock,
@@ -361,82 +710,35 @@ class SmllCompiler:
 
         objBprint = bp.ObjectDefineBlueprint()
 
-        accumKeyword_l = []
-        accumBlock_l = []
-        workingToken_i = 0
-        curBlockDepth_i = 0
-        workingTokenFunc = None
-        blockStartLineIndex_i = -1
-
-        for x, x_l in enumerate(objectData_l):
-            accumLine_l = []
-            lineIndex_i = x + startLineIndex_i
-
-            foundInThisLoop_b = False
-
-            if workingToken_i > 0 and blockStartLineIndex_i == -1:
-                blockStartLineIndex_i = lineIndex_i
-
-            for y_s in x_l:
-                if workingToken_i == 0:  # While block is not found
-                    if y_s == "{":  # Found a block
-                        keywordAndType_s = ''.join(accumKeyword_l)
-                        keyword_s, _ = keywordAndType_s.split("::")
-
-                        accumKeyword_l = []
-                        if keyword_s == "renderer":
-                            workingToken_i = 1  # renderer
-                            workingTokenFunc = tokenFunctions_d[keywordAndType_s]
-                            curBlockDepth_i = 1
-                            foundInThisLoop_b = True
-                        elif keyword_s == "collider":
-                            workingToken_i = 2  # collider
-                            workingTokenFunc = tokenFunctions_d[keywordAndType_s]
-                            curBlockDepth_i = 1
-                            foundInThisLoop_b = True
-                        else:
-                            raise CompileErrorSmll( lineIndex_i + 1, "object", objBprint.name_s, 2, keywordAndType_s )
-                    elif y_s == ";":  # Found a function
-                        funcName_s, args_s = "".join(accumKeyword_l).split('(')
-                        accumKeyword_l = []
-                        cls.applyObjectDefineFunction(objBprint, funcName_s, args_s, lineIndex_i)
-                    else:
-                        accumKeyword_l.append(y_s)
-                elif workingToken_i > 0:  # Process block
-                    if blockStartLineIndex_i == -1:
-                        blockStartLineIndex_i = lineIndex_i
-
-                    if y_s == "{":
-                        curBlockDepth_i += 1
-                        accumLine_l.append(y_s)
-                    elif y_s == "}":
-                        curBlockDepth_i -= 1
-                        if curBlockDepth_i == 0:
-                            if workingToken_i == 1:
-                                objBprint.rendererBlueprints_l.append( workingTokenFunc(accumBlock_l, blockStartLineIndex_i) )
-                            elif workingToken_i == 2:
-                                aCollider = workingTokenFunc(accumBlock_l, blockStartLineIndex_i)
-                                objBprint.colliders_l.append( aCollider )
-                                if aCollider.getTypes()[0]:
-                                    if objBprint.boundingBox is None:
-                                        objBprint.boundingBox = aCollider
-                                    else:
-                                        raise CompileErrorSmll(0, "object", objBprint.name_s, 0, "tow bounding box")
-
-                            accumBlock_l = []
-                            workingToken_i = 0
-                            blockStartLineIndex_i = -1
-                        else:
-                            accumLine_l.append(y_s)
-                    else:
-                        accumLine_l.append(y_s)
+        while True:
+            kind_i, text_s, lineIndex_i = tokens.next()
 
-            if workingToken_i > 0:
-                if accumLine_l:
-                    accumBlock_l.append(accumLine_l)
+            if kind_i == TOKEN_LBRACE_i:  # Found a block
+                try:
+                    tokenFunc = tokenFunctions_d[text_s]
+                except KeyError:
+                    raise CompileErrorSmll( lineIndex_i + 1, "object", objBprint.name_s, 2, text_s )
+
+                blockStartLineIndex_i = tokens.getBlockStartLineIndex(lineIndex_i)
+                if text_s.startswith("renderer::"):
+                    objBprint.rendererBlueprints_l.append( tokenFunc(tokens, blockStartLineIndex_i) )
                 else:
-                    if not foundInThisLoop_b:
-                        accumBlock_l.append([])
+                    aCollider = tokenFunc(tokens, blockStartLineIndex_i)
+                    objBprint.colliders_l.append( aCollider )
+                    if aCollider.getTypes()[0]:
+                        if objBprint.boundingBox is None:
+                            objBprint.boundingBox = aCollider
+                        else:
+                            raise CompileErrorSmll(0, "object", objBprint.name_s, 0, "tow bounding box")
+            elif kind_i == TOKEN_SEMICOLON_i:  # Found a function
+                funcName_s, args_s = cls.splitFunction(text_s, lineIndex_i, "object", objBprint.name_s)
+                cls.applyObjectDefineFunction(objBprint, funcName_s, args_s, lineIndex_i)
+            elif kind_i == TOKEN_RBRACE_i:
+                if text_s:
+                    raise CompileErrorSmll(lineIndex_i + 1, "object", objBprint.name_s, 1, text_s + "}")
+                break
+            else:
+                raise CompileErrorSmll(startLineIndex_i + 1, "object", objBprint.name_s, 0, "Block does not close")
 
         cls.checkObjectDefine(objBprint, startLineIndex_i)
 
@@ -481,39 +783,9 @@ class SmllCompiler:
             raise CompileErrorSmll(startLineIndex_t + 1, "object", None, 5, "initpos")
 
     @classmethod
-    def takeObjectUseBlock(cls, objectData_l: list, startLineIndex_i: int) -> bp.ObjectUseBlueprint:
+    def takeObjectUseBlock(cls, tokens:SmllTokenStream, startLineIndex_i:int) -> bp.ObjectUseBlueprint:
         objBprint = bp.ObjectUseBlueprint()
-
-        accumKeyword_l = []
-        accumBlock_l = []
-        workingToken_i = 0
-        blockStartLineIndex_i = -1
-
-        for x, x_l in enumerate(objectData_l):
-            accumLine_l = []
-            lineIndex_i = x + startLineIndex_i
-
-            foundInThisLoop_b = False
-
-            if workingToken_i > 0 and blockStartLineIndex_i == -1:
-                blockStartLineIndex_i = lineIndex_i
-
-            for y_s in x_l:
-                if workingToken_i == 0:  # While block is not found
-                    if y_s == ";":  # Found a function
-                        funcName_s, args_s = "".join(accumKeyword_l).split('(')
-                        accumKeyword_l = []
-                        cls.applyObjectUseFunction(objBprint, funcName_s, args_s, lineIndex_i)
-                    else:
-                        accumKeyword_l.append(y_s)
-
-            if workingToken_i > 0:
-                if accumLine_l:
-                    accumBlock_l.append(accumLine_l)
-                else:
-                    if not foundInThisLoop_b:
-                        accumBlock_l.append([])
-
+        cls.takeFunctionsBlock(tokens, objBprint, cls.applyObjectUseFunction, "object", startLineIndex_i)
         cls.checkObjectUse(objBprint, startLineIndex_i)
 
         return objBprint
@@ -563,82 +835,32 @@ class SmllCompiler:
             raise CompileErrorSmll(startLineIndex_t + 1, "object", None, 5, "tempname")
 
     @classmethod
-    def takeObjectObjStaticBlock(cls, objectData_l: list, startLineIndex_i: int) -> bp.ObjectObjStaticBlueprint:
-        tokenFunctions_d = {
-            'collider::aabb':cls.takeColliderAabbBlock,
-        }
-
+    def takeObjectObjStaticBlock(cls, tokens:SmllTokenStream, startLineIndex_i:int) -> bp.ObjectObjStaticBlueprint:
         objBprint = bp.ObjectObjStaticBlueprint()
 
-        accumKeyword_l = []
-        accumBlock_l = []
-        workingToken_i = 0
-        curBlockDepth_i = 0
-        workingTokenFunc = None
-        blockStartLineIndex_i = -1
-
-        for x, x_l in enumerate(objectData_l):
-            accumLine_l = []
-            lineIndex_i = x + startLineIndex_i
-
-            foundInThisLoop_b = False
-
-            if workingToken_i > 0 and blockStartLineIndex_i == -1:
-                blockStartLineIndex_i = lineIndex_i
-
-            for y_s in x_l:
-                if workingToken_i == 0:  # While block is not found
-                    if y_s == "{":  # Found a block
-                        keywordAndType_s = ''.join(accumKeyword_l)
-                        keyword_s, _ = keywordAndType_s.split("::")
-
-                        accumKeyword_l = []
-                        if keyword_s == "collider":
-                            workingToken_i = 2  # collider
-                            workingTokenFunc = tokenFunctions_d[keywordAndType_s]
-                            curBlockDepth_i = 1
-                            foundInThisLoop_b = True
-                        else:
-                            raise CompileErrorSmll(lineIndex_i + 1, "object", objBprint.name_s, 2, keywordAndType_s)
-                    elif y_s == ";":  # Found a function
-                        funcName_s, args_s = "".join(accumKeyword_l).split('(')
-                        accumKeyword_l = []
-                        cls.applyObjectObjStaticFunction(objBprint, funcName_s, args_s, lineIndex_i)
-                    else:
-                        accumKeyword_l.append(y_s)
-                elif workingToken_i > 0:  # Process block
-                    if blockStartLineIndex_i == -1:
-                        blockStartLineIndex_i = lineIndex_i
-
-                    if y_s == "{":
-                        curBlockDepth_i += 1
-                        accumLine_l.append(y_s)
-                    elif y_s == "}":
-                        curBlockDepth_i -= 1
-                        if curBlockDepth_i == 0:
-                            if workingToken_i == 2:
-                                aCollider = workingTokenFunc(accumBlock_l, blockStartLineIndex_i)
-                                objBprint.colliders_l.append(aCollider)
-                                if aCollider.getTypes()[0]:
-                                    if objBprint.boundingBox is None:
-                                        objBprint.boundingBox = aCollider
-                                    else:
-                                        raise CompileErrorSmll(0, "object", objBprint.name_s, 0, "two bounding box")
-
-                            accumBlock_l = []
-                            workingToken_i = 0
-                            blockStartLineIndex_i = -1
-                        else:
-                            accumLine_l.append(y_s)
-                    else:
-                        accumLine_l.append(y_s)
+        while True:
+            kind_i, text_s, lineIndex_i = tokens.next()
 
-            if workingToken_i > 0:
-                if accumLine_l:
-                    accumBlock_l.append(accumLine_l)
-                else:
-                    if not foundInThisLoop_b:
-                        accumBlock_l.append([])
+            if kind_i == TOKEN_LBRACE_i:  # Found a block
+                if text_s != "collider::aabb":
+                    raise CompileErrorSmll(lineIndex_i + 1, "object", objBprint.name_s, 2, text_s)
+
+                aCollider = cls.takeColliderAabbBlock( tokens, tokens.getBlockStartLineIndex(lineIndex_i) )
+                objBprint.colliders_l.append(aCollider)
+                if aCollider.getTypes()[0]:
+                    if objBprint.boundingBox is None:
+                        objBprint.boundingBox = aCollider
+                    else:
+                        raise CompileErrorSmll(0, "object", objBprint.name_s, 0, "two bounding box")
+            elif kind_i == TOKEN_SEMICOLON_i:  # Found a function
+                funcName_s, args_s = cls.splitFunction(text_s, lineIndex_i, "object", objBprint.name_s)
+                cls.applyObjectObjStaticFunction(objBprint, funcName_s, args_s, lineIndex_i)
+            elif kind_i == TOKEN_RBRACE_i:
+                if text_s:
+                    raise CompileErrorSmll(lineIndex_i + 1, "object", objBprint.name_s, 1, text_s + "}")
+                break
+            else:
+                raise CompileErrorSmll(startLineIndex_i + 1, "object", objBprint.name_s, 0, "Block does not close")
 
         cls.checkObjectObjStatic(objBprint, startLineIndex_i)
 
@@ -677,6 +899,13 @@ class SmllCompiler:
             objBprint.objFileName_s = args_l[0]
         elif funcName_s == "colgrouptargets":
             objBprint.colGroupTargets_l += args_l
+        elif funcName_s == "meshcollision":
+            if args_l[0] == "true":
+                objBprint.meshCollision_b = True
+            elif args_l[0] == "false":
+                objBprint.meshCollision_b = False
+            else:
+                raise CompileErrorSmll(lineNo_i, "object", objBprint.name_s, 3, "meshcollision(bool)", args_l)
         else:
             raise CompileErrorSmll(lineNo_i, "object", objBprint.name_s, 4, funcName_s)
     @staticmethod
@@ -693,42 +922,12 @@ class SmllCompiler:
     ######## Object level but not object ########
 
     @classmethod
-    def takeBoundingAabbBlock(cls, objectData_l: list, startLineIndex_i: int) -> co.Aabb:
+    def takeBoundingAabbBlock(cls, tokens:SmllTokenStream, startLineIndex_i:int) -> co.Aabb:
         colBprint = bp.ColliderAabbBlueprint()
-
-        accumKeyword_l = []
-        accumBlock_l = []
-        workingToken_i = 0
-        blockStartLineIndex_i = -1
-
-        for x, x_l in enumerate(objectData_l):
-            accumLine_l = []
-            lineIndex_i = x + startLineIndex_i
-
-            foundInThisLoop_b = False
-
-            if workingToken_i > 0 and blockStartLineIndex_i == -1:
-                blockStartLineIndex_i = lineIndex_i
-
-            for y_s in x_l:
-                if y_s == ";":  # Found a function
-                    funcName_s, args_s = "".join(accumKeyword_l).split('(')
-                    accumKeyword_l = []
-                    cls.applyBoundingAabbFunction(colBprint, funcName_s, args_s, lineIndex_i)
-                else:
-                    accumKeyword_l.append(y_s)
-
-            if workingToken_i > 0:
-                if accumLine_l:
-                    accumBlock_l.append(accumLine_l)
-                else:
-                    if not foundInThisLoop_b:
-                        accumBlock_l.append([])
-
+        cls.takeFunctionsBlock(tokens, colBprint, cls.applyBoundingAabbFunction, "bounding", startLineIndex_i)
         cls.checkBoundingAabb(colBprint, startLineIndex_i)
-        pointLight = cls.makeBoundingAabb(colBprint, startLineIndex_i)
 
-        return pointLight
+        return cls.makeBoundingAabb(colBprint, startLineIndex_i)
     @staticmethod
     def applyBoundingAabbFunction(colBprint:bp.ColliderAabbBlueprint, funcName_s: str, args_s: str, lineIndex_i: int) -> None:
         if not isinstance(colBprint, bp.ColliderAabbBlueprint):
@@ -817,42 +1016,12 @@ class SmllCompiler:
             raise CompileErrorSmll(startLineIndex_i + 1, "bounding", colBprint.name_s, 0, "shit")
 
     @classmethod
-    def takePointLightBlock(cls, objectData_l:list, startLineIndex_i:int) -> li.PointLight:
+    def takePointLightBlock(cls, tokens:SmllTokenStream, startLineIndex_i:int) -> li.PointLight:
         pointLightBprint = bp.PointLightBlueprint()
-
-        accumKeyword_l = []
-        accumBlock_l = []
-        workingToken_i = 0
-        blockStartLineIndex_i = -1
-
-        for x, x_l in enumerate(objectData_l):
-            accumLine_l = []
-            lineIndex_i = x + startLineIndex_i
-
-            foundInThisLoop_b = False
-
-            if workingToken_i > 0 and blockStartLineIndex_i == -1:
-                blockStartLineIndex_i = lineIndex_i
-
-            for y_s in x_l:
-                if y_s == ";":  # Found a function
-                    funcName_s, args_s = "".join(accumKeyword_l).split('(')
-                    accumKeyword_l = []
-                    cls.applyPointLightFunction(pointLightBprint, funcName_s, args_s, lineIndex_i)
-                else:
-                    accumKeyword_l.append(y_s)
-
-            if workingToken_i > 0:
-                if accumLine_l:
-                    accumBlock_l.append(accumLine_l)
-                else:
-                    if not foundInThisLoop_b:
-                        accumBlock_l.append([])
-
+        cls.takeFunctionsBlock(tokens, pointLightBprint, cls.applyPointLightFunction, "pointlight", startLineIndex_i)
         cls.checkPointLight(pointLightBprint, startLineIndex_i)
-        pointLight = cls.makePointLight(pointLightBprint, startLineIndex_i)
 
-        return pointLight
+        return cls.makePointLight(pointLightBprint, startLineIndex_i)
     @staticmethod
     def applyPointLightFunction(pointLightBprint:bp.PointLightBlueprint, funcName_s:str, args_s:str, lineIndex_i:int) -> None:
         if not isinstance(pointLightBprint, bp.PointLightBlueprint):
@@ -927,32 +1096,9 @@ class SmllCompiler:
     ######## Renderers ########
 
     @classmethod
-    def takeRendererAabBlock(cls, rendererData_l:list, startLineIndex_i:int) -> bp.RendererBlueprint:
+    def takeRendererAabBlock(cls, tokens:SmllTokenStream, startLineIndex_i:int) -> bp.RendererBlueprint:
         renBprint = bp.RendererBlueprint()
-
-        accumKeyword_l = []
-        accumBlock_l = []
-
-        for x, x_l in enumerate(rendererData_l):
-            accumLine_l = []
-            lineIndex_i = x + startLineIndex_i
-
-            for y_s in x_l:
-                if y_s == ";":  # Found a function
-                    try:
-                        funcName_s, args_s = "".join(accumKeyword_l).split('(')
-                    except ValueError:
-                        raise CompileErrorSmll( lineIndex_i + 1, "renderer", renBprint.name_s, 1, "".join(accumKeyword_l) )
-
-                    accumKeyword_l = []
-
-                    cls.apllyRendererAabFunction(renBprint, funcName_s, args_s, lineIndex_i)
-                else:
-                    accumKeyword_l.append(y_s)
-
-            if accumLine_l:
-                accumBlock_l.append(accumLine_l)
-
+        cls.takeFunctionsBlock(tokens, renBprint, cls.apllyRendererAabFunction, "renderer", startLineIndex_i)
         cls.makeRendererAabNdArray(renBprint, startLineIndex_i)
         cls.checkRendererAab(renBprint, startLineIndex_i)
 
@@ -1041,6 +1187,8 @@ class SmllCompiler:
         elif renBprint.specularStrength_f is None:
             raise CompileErrorSmll(startLineIndex_i + 1, "renderer", renBprint.name_s, 5, "specstrength")
 
+        elif renBprint.boxMin_t is not None:
+            return
         elif renBprint.vertexNdarray is None:
             raise CompileErrorSmll(startLineIndex_i + 1, "renderer", renBprint.name_s, 6, "VertexNdarray is not generated.")
         elif renBprint.texCoordNdarray is None:
@@ -1062,165 +1210,19 @@ class SmllCompiler:
         else:
             rbp.minpos_temp = None
 
-        rbp.vertexNdarray = np.array( [
-            left_f,  up_f, far_f,
-            left_f,  up_f, near_f,
-            right_f, up_f, near_f,
-            left_f,  up_f, far_f,
-            right_f, up_f, near_f,
-            right_f, up_f, far_f,
-
-            left_f,  up_f,   near_f,
-            left_f,  down_f, near_f,
-            right_f, down_f, near_f,
-            left_f,  up_f,   near_f,
-            right_f, down_f, near_f,
-            right_f, up_f,   near_f,
-
-            right_f, up_f, near_f,
-            right_f, down_f, near_f,
-            right_f, down_f, far_f,
-            right_f, up_f, near_f,
-            right_f, down_f, far_f,
-            right_f, up_f, far_f,
-
-            right_f, up_f, far_f,
-            right_f, down_f, far_f,
-            left_f, down_f, far_f,
-            right_f, up_f, far_f,
-            left_f, down_f, far_f,
-            left_f, up_f, far_f,
-
-            left_f, up_f, far_f,
-            left_f, down_f, far_f,
-            left_f, down_f, near_f,
-            left_f, up_f, far_f,
-            left_f, down_f, near_f,
-            left_f, up_f, near_f,
-
-            right_f, down_f, far_f,
-            right_f, down_f, near_f,
-            left_f, down_f, near_f,
-            right_f, down_f, far_f,
-            left_f, down_f, near_f,
-            left_f, down_f, far_f
-        ], np.float32 )
-
-        rbp.texCoordNdarray = np.array( [
-            0, 1,
-            0, 0,
-            1, 0,
-            0, 1,
-            1, 0,
-            1, 1,
-
-            0, 1,
-            0, 0,
-            1, 0,
-            0, 1,
-            1, 0,
-            1, 1,
-
-            0, 1,
-            0, 0,
-            1, 0,
-            0, 1,
-            1, 0,
-            1, 1,
-
-            0, 1,
-            0, 0,
-            1, 0,
-            0, 1,
-            1, 0,
-            1, 1,
-
-            0, 1,
-            0, 0,
-            1, 0,
-            0, 1,
-            1, 0,
-            1, 1,
-
-            0, 1,
-            0, 0,
-            1, 0,
-            0, 1,
-            1, 0,
-            1, 1,
-        ], np.float32 )
-
-        rbp.normalNdarray = np.array( [
-            0, 1, 0,
-            0, 1, 0,
-            0, 1, 0,
-            0, 1, 0,
-            0, 1, 0,
-            0, 1, 0,
-
-            0, 0, 1,
-            0, 0, 1,
-            0, 0, 1,
-            0, 0, 1,
-            0, 0, 1,
-            0, 0, 1,
-
-            1, 0, 0,
-            1, 0, 0,
-            1, 0, 0,
-            1, 0, 0,
-            1, 0, 0,
-            1, 0, 0,
-
-            0, 0, -1,
-            0, 0, -1,
-            0, 0, -1,
-            0, 0, -1,
-            0, 0, -1,
-            0, 0, -1,
-
-            -1, 0, 0,
-            -1, 0, 0,
-            -1, 0, 0,
-            -1, 0, 0,
-            -1, 0, 0,
-            -1, 0, 0,
-
-            0, -1, 0,
-            0, -1, 0,
-            0, -1, 0,
-            0, -1, 0,
-            0, -1, 0,
-            0, -1, 0,
-        ], np.float32 )
+        # Boxes are drawn with the shared unit cube, unless scaling it would flip or flatten normals.
+        if left_f < right_f and down_f < up_f and far_f < near_f:
+            rbp.boxMin_t = (left_f, down_f, far_f)
+            rbp.boxMax_t = (right_f, up_f, near_f)
+        else:
+            rbp.vertexNdarray, rbp.texCoordNdarray, rbp.normalNdarray = makeBoxNdArrays(
+                (left_f, down_f, far_f), (right_f, up_f, near_f)
+            )
 
     @classmethod
-    def takeRendererQuadBlock(cls, rendererData_l:list, startLineIndex_i:int) -> bp.RendererBlueprint:
+    def takeRendererQuadBlock(cls, tokens:SmllTokenStream, startLineIndex_i:int) -> bp.RendererBlueprint:
         renBprint = bp.RendererBlueprint()
-
-        accumKeyword_l = []
-        accumBlock_l = []
-
-        for x, x_l in enumerate(rendererData_l):
-            accumLine_l = []
-            lineIndex_i = x + startLineIndex_i
-
-            for y_s in x_l:
-                if y_s == ";":  # Found a function
-                    try:
-                        funcName_s, args_s = "".join(accumKeyword_l).split('(')
-                    except ValueError:
-                        raise CompileErrorSmll(lineIndex_i + 1, "renderer", renBprint.name_s, 1, "".join(accumKeyword_l))
-
-                    accumKeyword_l = []
-
-                    cls.apllyRendererQuadFunction(renBprint, funcName_s, args_s, lineIndex_i)
-                else:
-                    accumKeyword_l.append(y_s)
-
-            if accumLine_l:
-                accumBlock_l.append(accumLine_l)
-
+        cls.takeFunctionsBlock(tokens, renBprint, cls.apllyRendererQuadFunction, "renderer", startLineIndex_i)
         cls.makeRendererQuadNdArray(renBprint, startLineIndex_i)
         cls.checkRendererQuad(renBprint, startLineIndex_i)
 
@@ -1380,31 +1382,12 @@ class SmllCompiler:
     ######## Colliders ########
 
     @classmethod
-    def takeColliderAabbBlock(cls, rendererData_l:list, startLineIndex_i:int) -> co.Aabb:
+    def takeColliderAabbBlock(cls, tokens:SmllTokenStream, startLineIndex_i:int) -> co.Aabb:
         colBprint = bp.ColliderAabbBlueprint()
-
-        accumKeyword_l = []
-        accumBlock_l = []
-
-        for x, x_l in enumerate(rendererData_l):
-            accumLine_l = []
-            lineIndex_i = x + startLineIndex_i
-
-            for y_s in x_l:
-                if y_s == ";":  # Found a function
-                    funcName_s, args_s = "".join(accumKeyword_l).split('(')
-                    accumKeyword_l = []
-                    cls.apllyColliderAabbFunction(colBprint, funcName_s, args_s, lineIndex_i)
-                else:
-                    accumKeyword_l.append(y_s)
-
-            if accumLine_l:
-                accumBlock_l.append(accumLine_l)
-
+        cls.takeFunctionsBlock(tokens, colBprint, cls.apllyColliderAabbFunction, "collider", startLineIndex_i)
         cls.checkColliderAabb(colBprint, startLineIndex_i)
-        aabb = cls.makeColliderAabb(colBprint, startLineIndex_i)
 
-        return aabb
+        return cls.makeColliderAabb(colBprint, startLineIndex_i)
     @staticmethod
     def apllyColliderAabbFunction(colBprint:bp.ColliderAabbBlueprint, funcName_s:str, args_s:str, lineIndex_i:int) -> None:
         if not isinstance(colBprint, bp.ColliderAabbBlueprint):
@@ -1514,17 +1497,17 @@ class SmllCompiler:
 
     @staticmethod
     def checkNameDuplicate(level:ds.Level) -> None:
-        names_l = []
+        names_s = set()
         for anObject in level.objectBlueprints_l:
             if anObject.name_s == "unknown":
                 continue
-            elif anObject.name_s in names_l:
+            elif anObject.name_s in names_s:
                 raise CompileErrorSmll(0, "", level.getName(), 7, anObject.name_s)
             else:
-                names_l.append(anObject.name_s)
+                names_s.add(anObject.name_s)
 
         for anObject in level.objectBlueprints_l:
-            names_l = []
+            names_s = set()
             try:
                 renderBprints_l = anObject.rendererBlueprints_l
             except AttributeError:
@@ -1533,10 +1516,163 @@ class SmllCompiler:
                 for anRenderer in renderBprints_l:
                     if anRenderer.name_s == "unknown":
                         continue
-                    elif anRenderer.name_s in names_l:
+                    elif anRenderer.name_s in names_s:
                         raise CompileErrorSmll(0, "", level.getName(), 7, anRenderer.name_s)
                     else:
-                        names_l.append(anRenderer.name_s)
+                        names_s.add(anRenderer.name_s)
+
+
+@contextmanager
+def pausedGc():
+    """
+    Compiling and unpickling a level make lots of objects at once, which keeps triggering garbage collector for nothing.
+    """
+    gcEnabled_b = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gcEnabled_b:
+            gc.enable()
+
+
+def _parseBlocks(levelName_s:str, tokens_l:list, rawTexts_l:list) -> bytes:
+    """
+    Runs in a worker of the compile pool, and parses top level blocks cut out of a level.
+    Returns pickled LevelBlueprint, so that it is unpickled by SmllCompileJob with garbage collector paused.
+    """
+    with pausedGc():
+        levelBprint = bp.LevelBlueprint()
+        levelBprint.name_s = levelName_s
+        SmllCompiler.takeLevelContents( SmllTokenStream.fromParts(tokens_l, rawTexts_l), levelBprint )
+        return pickle.dumps(levelBprint, pickle.HIGHEST_PROTOCOL)
+
+
+def _compileLevel(smllFileDir_s:str) -> Tuple[ Optional[bytes], Optional[CompileErrorSmll] ]:
+    """
+    Runs in a worker of the compile pool when SmllCompileJob failed. Returns pickled Level, or the compile error,
+    which is returned instead of raised, so it gets to SmllCompileJob as it is.
+    """
+    with pausedGc():
+        try:
+            level = SmllCompiler(smllFileDir_s).compile()
+        except CompileErrorSmll as e:
+            return None, e
+        return pickle.dumps(level, pickle.HIGHEST_PROTOCOL), None
+
+
+class SmllCompileJob:
+    """
+    Compiles a level on a multiprocessing pool or a JobPool of AssetPool, without waiting for it.
+
+    Top level functions are applied here, and top level blocks are split into chunks in source order,
+    which are parsed by workers. Parsed chunks are merged in order, and then the level is checked and made the same way
+    as SmllCompiler.compile(), so checkNameDuplicate runs over the whole level after the merge.
+    A level with a few blocks is a single chunk, so several small levels still run on several workers.
+
+    If anything fails, the file is compiled again with SmllCompiler as a single task on the pool,
+    so errors are exactly what it reports, and poll() raises them. Errors other than CompileErrorSmll come as the
+    pool raises them, which is TaskError for JobPool.
+    """
+    MIN_BLOCKS_PER_CHUNK_i = 64
+
+    def __init__(self, smllFileDir_s:str, pool:Pool, chunkCount_i:int, onBlockParsed=None):
+        self.smllFileDir_s = smllFileDir_s
+        self.__pool = pool
+
+        self.__onBlockParsed = onBlockParsed
+        self.__levelBprint = bp.LevelBlueprint()
+        self.__levelBprint.name_s = getLevelNameOfFile(smllFileDir_s)
+
+        self.__results_l = []  # AsyncResult of each chunk, in source order.
+        self.__mergedCount_i = 0
+        self.__level = None
+        self.__compileAgainResult = None  # AsyncResult of _compileLevel, once anything failed.
+
+        try:
+            self.__submitChunks(pool, chunkCount_i)
+        except Exception:
+            self.__compileAgain()
+
+    def poll(self) -> Optional[ds.Level]:
+        """
+        Merges chunks parsed so far, and returns the level once every chunk is merged.
+        """
+        if self.__level is not None:
+            return self.__level
+        elif self.__compileAgainResult is not None:
+            return self.__takeCompiledAgain()
+
+        try:
+            while self.__mergedCount_i < len(self.__results_l) and self.__results_l[self.__mergedCount_i].ready():
+                with pausedGc():
+                    self.__merge( pickle.loads(self.__results_l[self.__mergedCount_i].get()) )
+                self.__mergedCount_i += 1
+                if self.__onBlockParsed is not None:
+                    self.__onBlockParsed(self.__levelBprint)
+
+            if self.__mergedCount_i < len(self.__results_l):
+                return None
+
+            with pausedGc():
+                SmllCompiler.checkLevel(self.__levelBprint, 0)
+                level = SmllCompiler.makeLevel(self.__levelBprint)
+                SmllCompiler.checkNameDuplicate(level)
+        except Exception:
+            self.__compileAgain()
+        else:
+            self.__level = level
+
+        return self.__level
+
+    def __submitChunks(self, pool:Pool, chunkCount_i:int) -> None:
+        levelBprint = self.__levelBprint
+        with open(self.smllFileDir_s) as file, pausedGc():
+            tokens = SmllTokenStream( file.read() )
+
+        split_t = tokens.splitTopLevel()
+        if split_t is None:
+            raise CompileErrorSmll(0, "level", levelBprint.name_s, 6, "Failed to split top level blocks.")
+        functions_l, blockRanges_l = split_t
+
+        for _, text_s, lineIndex_i in functions_l:
+            funcName_s, args_s = SmllCompiler.splitFunction(text_s, lineIndex_i, "level", levelBprint.name_s)
+            SmllCompiler.applyLevelFunction(levelBprint, funcName_s, args_s, lineIndex_i)
+        if self.__onBlockParsed is not None:
+            self.__onBlockParsed(levelBprint)
+
+        chunkCount_i = max( 1, min(chunkCount_i, len(blockRanges_l) // self.MIN_BLOCKS_PER_CHUNK_i) )
+        for x in range(chunkCount_i):
+            chunkRanges_l = blockRanges_l[ len(blockRanges_l)*x // chunkCount_i : len(blockRanges_l)*(x + 1) // chunkCount_i ]
+            tokens_l, rawTexts_l = tokens.sliceBlocks(chunkRanges_l)
+            self.__results_l.append( pool.apply_async(_parseBlocks, (levelBprint.name_s, tokens_l, rawTexts_l)) )
+
+    def __merge(self, chunkBprint:bp.LevelBlueprint) -> None:
+        levelBprint = self.__levelBprint
+        if chunkBprint.boundingBox is not None:
+            if levelBprint.boundingBox is None:
+                levelBprint.boundingBox = chunkBprint.boundingBox
+            else:
+                raise FileExistsError
+
+        # Lists are extended in place, since onBlockParsed may keep track of how many items of them it has seen.
+        levelBprint.objectBlueprints_l += chunkBprint.objectBlueprints_l
+        levelBprint.pointLights_l += chunkBprint.pointLights_l
+        levelBprint.colGroups_l += chunkBprint.colGroups_l
+
+    def __compileAgain(self) -> None:
+        self.__compileAgainResult = self.__pool.apply_async( _compileLevel, (self.smllFileDir_s,) )
+
+    def __takeCompiledAgain(self) -> Optional[ds.Level]:
+        if not self.__compileAgainResult.ready():
+            return None
+
+        levelData_b, error = self.__compileAgainResult.get()
+        if error is not None:
+            raise error
+        with pausedGc():
+            self.__level = pickle.loads(levelData_b)
+        return self.__level
 
 
 def main():
@@ -1,7 +1,7 @@
 from math import cos
 
 import numpy as np
-import OpenGL.GL as gl
+from lazy_gl import gl
 
 from actor import ActorGeneral
 import mmath
@@ -0,0 +1,484 @@
+"""
+Keeps parsed .obj models on disk in a binary format, so a model is parsed only when its .obj or .mtl file changes.
+Cached models are opened with np.memmap, so their arrays are read from the file only when they are uploaded to GPU.
+
+A cache file is laid out like below, in little endian.
+    header   : magic b"SMSH", key in 40 hex digits, submesh count (uint32) and size of the string table (uint32)
+    stamp    : sizes and st_mtime_ns of the .obj and .mtl files the key was made from (int64 each), and parser version
+               in 40 hex digits
+    submeshes: one entry for each renderer, in the order of the .obj file
+               lengths of name, material name and diffuse map name (uint16 each), vertex count and index count (uint32),
+               index counts of up to 3 simplified meshes, 0 for missing ones (uint32 each),
+               offsets of vertex, texture coord, normal and index arrays from the start of the file (uint64 each),
+               and then min and max of the vertices (float32 each)
+    strings  : names of every submesh in utf8, one after another
+    arrays   : float32 vertices (n, 3), texture coords (n, 2), normals (n, 3) and uint32 indices, each aligned to 16 bytes
+               Indices of simplified meshes follow indices of the full mesh.
+
+Collision trees of models, which are made only for object::objstatic with meshcollision(true), are kept in another file
+next to the model's cache file, with the same key.
+    header   : magic b"SBVH", key in 40 hex digits, node count (uint32) and triangle count (uint32)
+    arrays   : float32 node mins (n, 3) and maxs (n, 3), int32 node starts (n,) and counts (n,),
+               and float32 triangles (m, 3, 3) in the order of leaves, each aligned to 16 bytes
+
+The key is sha1 of the .obj and .mtl files and source of modules which decide what a parsed model and its collision tree look like.
+Hashing a big model takes a while, so the key in the cache file is used as it is while the stamp is the same as the files'.
+
+사용법:
+    python mesh_cache.py seoul_v2 hello_cube  -> 캐시 없이 읽은 시간과 캐시에서 읽은 시간을 비교합니다.
+"""
+
+import os
+import sys
+import struct
+import hashlib
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import obj_parse as op
+import mesh_simplify as ms
+import collide as co
+import const
+
+
+MAGIC_b = b"SMSH"
+BVH_MAGIC_b = b"SBVH"
+KEY_LEN_i = 40
+
+_HEADER_STRUCT = struct.Struct("<4s{}sII".format(KEY_LEN_i))
+_STAMP_STRUCT = struct.Struct("<4q{}s".format(KEY_LEN_i))
+MAX_LODS_i = 3
+_SUBMESH_STRUCT = struct.Struct("<3H2xII{}I4Q6f".format(MAX_LODS_i))
+_ALIGN_i = 16
+
+_parserVersion_s = None
+
+Meshes = Tuple[ Dict[str, op.OneRenderer], Dict[str, op.OneMaterial] ]
+
+
+def getParserVersion() -> str:
+    global _parserVersion_s
+
+    if _parserVersion_s is None:
+        hasher = hashlib.sha1()
+        for fileDir_s in (op.__file__, ms.__file__, co.__file__, __file__):
+            with open(fileDir_s, "rb") as file:
+                hasher.update( file.read() )
+        _parserVersion_s = hasher.hexdigest()
+
+    return _parserVersion_s
+
+
+def makeKey(objFileDir_s:str, mtlFileDir_s:str) -> str:
+    hasher = hashlib.sha1()
+    for fileDir_s in (objFileDir_s, mtlFileDir_s):
+        with open(fileDir_s, "rb") as file:
+            hasher.update( file.read() )
+    hasher.update( getParserVersion().encode("utf8") )
+    return hasher.hexdigest()
+
+
+def getFileStamp(objFileDir_s:str, mtlFileDir_s:str) -> Tuple[int, int, int, int]:
+    objStat = os.stat(objFileDir_s)
+    mtlStat = os.stat(mtlFileDir_s)
+    return objStat.st_size, objStat.st_mtime_ns, mtlStat.st_size, mtlStat.st_mtime_ns
+
+
+class SubmeshEntry:
+    """
+    One entry of the submesh table of a cache file.
+    """
+    def __init__(self, name_s:str, mtl_s:str, map_Kd_s:str, vertexCount_i:int, indexCount_i:int, lodIndexCounts_t:Tuple[int, ...],
+                 offsets_t:Tuple[int, ...], boundsMin_t:Tuple[float, float, float], boundsMax_t:Tuple[float, float, float]):
+        self.name_s = name_s
+        self.mtl_s = mtl_s
+        self.map_Kd_s = map_Kd_s
+
+        self.vertexCount_i = vertexCount_i
+        self.indexCount_i = indexCount_i
+        self.lodIndexCounts_t = tuple( x for x in lodIndexCounts_t if x )
+        self.offsets_t = offsets_t  # vertices, texture coords, normals, indices
+
+        self.boundsMin_t = boundsMin_t
+        self.boundsMax_t = boundsMax_t
+
+    def __repr__(self):
+        return "< {}.SubmeshEntry object at 0x{:0>16X}, name: {}, vertexCount: {}, indexCount: {}, mtl: {} >".format(
+            __name__, id(self), self.name_s, self.vertexCount_i, self.indexCount_i, self.mtl_s
+        )
+
+    def getEnd(self) -> int:
+        return self.offsets_t[3] + ( self.indexCount_i + sum(self.lodIndexCounts_t) ) * 4
+
+
+class MeshCache:
+    def __init__(self, cacheDir_s:str=const.MESH_CACHE_DIR_s, enabled_b:bool=True):
+        self.cacheDir_s = cacheDir_s
+        self.enabled_b = bool(enabled_b)
+
+        self.hitCount_i = 0
+        self.missCount_i = 0
+
+        self.__stamps_d = {}  # key -> stamp of the files when the key was made by hashing them, written with the model.
+
+    def load(self, objFileDir_s:str, mtlFileDir_s:str) -> Tuple[ Dict[str, op.OneRenderer], Dict[str, op.OneMaterial], bool ]:
+        """
+        Returns renderers and materials of the model, and whether they came from cache.
+        The model is parsed and stored if it was not in cache.
+        """
+        meshes_t, key_s = self.lookUp(objFileDir_s, mtlFileDir_s)
+        if meshes_t is not None:
+            return meshes_t[0], meshes_t[1], True
+
+        renderers_d = op.parseObj(objFileDir_s)
+        for oneRenderer in renderers_d.values():
+            oneRenderer.makeLods()
+        materials_d = op.parseMtl(mtlFileDir_s)
+        self.store(objFileDir_s, key_s, renderers_d, materials_d)
+        return renderers_d, materials_d, False
+
+    def lookUp(self, objFileDir_s:str, mtlFileDir_s:str) -> Tuple[ Optional[Meshes], Optional[str] ]:
+        """
+        Returns the cached renderers and materials or None, and the key to store them with after parsing the model.
+        The key is None if cache is disabled.
+        Materials only have the ones renderers use.
+        """
+        if not self.enabled_b:
+            return None, None
+
+        key_s = self.getKey(objFileDir_s, mtlFileDir_s)
+        meshes_t = self.__load(self.getCacheFileDir(objFileDir_s), key_s)
+        if meshes_t is None:
+            self.missCount_i += 1
+        else:
+            self.hitCount_i += 1
+            if key_s in self.__stamps_d:  # Files were touched but not changed.
+                self.__writeStamp( self.getCacheFileDir(objFileDir_s), self.__stamps_d.pop(key_s) )
+        return meshes_t, key_s
+
+    def getKey(self, objFileDir_s:str, mtlFileDir_s:str) -> str:
+        """
+        Returns the key in the model's cache file if its stamp matches the files and parser version,
+        so the files are hashed only when they are changed or touched.
+        """
+        stamp_t = getFileStamp(objFileDir_s, mtlFileDir_s)
+        key_s = self.__readStampedKey(self.getCacheFileDir(objFileDir_s), stamp_t)
+        if key_s is None:
+            key_s = makeKey(objFileDir_s, mtlFileDir_s)
+            self.__stamps_d[key_s] = stamp_t
+        return key_s
+
+    def store(self, objFileDir_s:str, key_s:Optional[str], renderers_d:Dict[str, op.OneRenderer],
+              materials_d:Dict[str, op.OneMaterial]) -> None:
+        if key_s is not None:
+            self.__save(self.getCacheFileDir(objFileDir_s), key_s, renderers_d, materials_d)
+
+    def loadCollisionMesh(self, objFileDir_s:str, mtlFileDir_s:str) -> co.TriangleBvh:
+        """
+        Returns the collision tree of every renderer of the model together.
+        It is built from the cached model and stored if it was not in cache.
+        """
+        key_s = self.getKey(objFileDir_s, mtlFileDir_s) if self.enabled_b else None
+        if key_s is not None:
+            bvh = self.__loadBvh(self.getBvhFileDir(objFileDir_s), key_s)
+            if bvh is not None:
+                self.hitCount_i += 1
+                return bvh
+
+        renderers_d, _, _ = self.load(objFileDir_s, mtlFileDir_s)
+        triangles_l = []
+        for oneRenderer in renderers_d.values():
+            vertex_arr = oneRenderer.vertexNdarray.reshape(-1, 3)
+            if oneRenderer.indexNdarray is None:
+                triangles_l.append( vertex_arr.reshape(-1, 3, 3) )
+            else:
+                triangles_l.append( vertex_arr[ oneRenderer.indexNdarray.reshape(-1, 3) ] )
+        bvh = co.TriangleBvh.build( np.concatenate(triangles_l) if triangles_l else np.zeros((0, 3, 3), np.float32) )
+
+        if key_s is not None:
+            self.__saveBvh(self.getBvhFileDir(objFileDir_s), key_s, bvh)
+        return bvh
+
+    def getCacheFileDir(self, objFileDir_s:str) -> str:
+        # Names of models are unique, which op.findObjMtlDir makes sure of.
+        modelName_s = os.path.splitext( os.path.basename(objFileDir_s) )[0]
+        return os.path.join(self.cacheDir_s, modelName_s + ".smsh")
+
+    def getBvhFileDir(self, objFileDir_s:str) -> str:
+        return os.path.splitext( self.getCacheFileDir(objFileDir_s) )[0] + ".sbvh"
+
+    @staticmethod
+    def readSubmeshEntries(cacheFileDir_s:str, key_s:Optional[str]=None) -> Optional[ List[SubmeshEntry] ]:
+        """
+        Returns the submesh table of a cache file, or None if the key doesn't match.
+        Raises ValueError if the file is broken.
+        """
+        with open(cacheFileDir_s, "rb") as file:
+            header_b = file.read(_HEADER_STRUCT.size)
+            if len(header_b) != _HEADER_STRUCT.size:
+                raise ValueError("too short for a header")
+            magic_b, fileKey_b, count_i, stringsSize_i = _HEADER_STRUCT.unpack(header_b)
+            if magic_b != MAGIC_b:
+                raise ValueError("wrong magic number")
+            if key_s is not None and fileKey_b != key_s.encode("ascii"):
+                return None
+            if len( file.read(_STAMP_STRUCT.size) ) != _STAMP_STRUCT.size:
+                raise ValueError("too short for a stamp")
+
+            table_b = file.read(_SUBMESH_STRUCT.size * count_i)
+            strings_b = file.read(stringsSize_i)
+            if len(table_b) != _SUBMESH_STRUCT.size * count_i or len(strings_b) != stringsSize_i:
+                raise ValueError("submesh table is cut off")
+
+        entries_l = []
+        stringCursor_i = 0
+        for fields_t in _SUBMESH_STRUCT.iter_unpack(table_b):
+            names_l = []
+            for length_i in fields_t[0:3]:
+                names_l.append( strings_b[stringCursor_i:stringCursor_i + length_i].decode("utf8") )
+                stringCursor_i += length_i
+            entries_l.append( SubmeshEntry(
+                *names_l, fields_t[3], fields_t[4], fields_t[5:5 + MAX_LODS_i], fields_t[5 + MAX_LODS_i:9 + MAX_LODS_i],
+                fields_t[9 + MAX_LODS_i:12 + MAX_LODS_i], fields_t[12 + MAX_LODS_i:15 + MAX_LODS_i]
+            ) )
+
+        return entries_l
+
+    @staticmethod
+    def __readStampedKey(cacheFileDir_s:str, stamp_t:Tuple[int, int, int, int]) -> Optional[str]:
+        try:
+            with open(cacheFileDir_s, "rb") as file:
+                header_b = file.read(_HEADER_STRUCT.size + _STAMP_STRUCT.size)
+        except OSError:
+            return None
+        if len(header_b) != _HEADER_STRUCT.size + _STAMP_STRUCT.size:
+            return None
+
+        magic_b, fileKey_b, _, _ = _HEADER_STRUCT.unpack_from(header_b)
+        *fileStamp_l, version_b = _STAMP_STRUCT.unpack_from(header_b, _HEADER_STRUCT.size)
+        if magic_b != MAGIC_b or tuple(fileStamp_l) != stamp_t or version_b != getParserVersion().encode("ascii"):
+            return None
+        try:
+            return fileKey_b.decode("ascii")
+        except UnicodeDecodeError:
+            return None
+
+    @staticmethod
+    def __packStamp(stamp_t:Optional[ Tuple[int, int, int, int] ]) -> bytes:
+        # A model stored with a key from elsewhere has no stamp, so it is hashed once more next time.
+        return _STAMP_STRUCT.pack( *(stamp_t or (-1, -1, -1, -1)), getParserVersion().encode("ascii") )
+
+    def __writeStamp(self, cacheFileDir_s:str, stamp_t:Tuple[int, int, int, int]) -> None:
+        try:
+            with open(cacheFileDir_s, "r+b") as file:
+                file.seek(_HEADER_STRUCT.size)
+                file.write( self.__packStamp(stamp_t) )
+        except OSError as e:
+            print( "Failed to write mesh cache '{}': {}".format(cacheFileDir_s, e) )
+
+    @classmethod
+    def __load(cls, cacheFileDir_s:str, key_s:str) -> Optional[Meshes]:
+        try:
+            entries_l = cls.readSubmeshEntries(cacheFileDir_s, key_s)
+            if entries_l is None:
+                return None
+
+            fileSize_i = os.path.getsize(cacheFileDir_s)
+            if any( x.getEnd() > fileSize_i for x in entries_l ):
+                raise ValueError("arrays are cut off")
+            memmap_arr = np.memmap(cacheFileDir_s, np.uint8, "r") if entries_l else None
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:  # Broken file, it will be overwritten.
+            print( "Failed to read mesh cache '{}': {}".format(cacheFileDir_s, e) )
+            return None
+
+        renderers_d = {}
+        materials_d = {}
+        for entry in entries_l:
+            vertexOffset_i, texCoordOffset_i, normalOffset_i, indexOffset_i = entry.offsets_t
+            oneRenderer = op.OneRenderer()
+            oneRenderer.name_s = entry.name_s
+            oneRenderer.mtl_s = entry.mtl_s
+            oneRenderer.vertexNumber_i = entry.vertexCount_i
+            oneRenderer.vertexNdarray = cls.__getArray(memmap_arr, vertexOffset_i, np.float32, (entry.vertexCount_i, 3))
+            oneRenderer.textureCoordNdarray = cls.__getArray(memmap_arr, texCoordOffset_i, np.float32, (entry.vertexCount_i, 2))
+            oneRenderer.normalNdarray = cls.__getArray(memmap_arr, normalOffset_i, np.float32, (entry.vertexCount_i, 3))
+            oneRenderer.indexNdarray = cls.__getArray(memmap_arr, indexOffset_i, np.uint32, (entry.indexCount_i,))
+            lodOffset_i = indexOffset_i + entry.indexCount_i * 4
+            for lodIndexCount_i in entry.lodIndexCounts_t:
+                oneRenderer.lodIndexNdarrays_l.append( cls.__getArray(memmap_arr, lodOffset_i, np.uint32, (lodIndexCount_i,)) )
+                lodOffset_i += lodIndexCount_i * 4
+            renderers_d[entry.name_s] = oneRenderer
+
+            oneMaterial = op.OneMaterial()
+            oneMaterial.name_s = entry.mtl_s
+            oneMaterial.map_Kd_s = entry.map_Kd_s
+            materials_d[entry.mtl_s] = oneMaterial
+
+        return renderers_d, materials_d
+
+    @staticmethod
+    def __getArray(memmap_arr:np.memmap, offset_i:int, dtype, shape_t:Tuple[int, ...]) -> np.ndarray:
+        size_i = int( np.prod(shape_t) ) * np.dtype(dtype).itemsize
+        return memmap_arr[offset_i:offset_i + size_i].view(dtype).reshape(shape_t)
+
+    @classmethod
+    def __loadBvh(cls, bvhFileDir_s:str, key_s:str) -> Optional[co.TriangleBvh]:
+        try:
+            with open(bvhFileDir_s, "rb") as file:
+                header_b = file.read(_HEADER_STRUCT.size)
+            if len(header_b) != _HEADER_STRUCT.size:
+                raise ValueError("too short for a header")
+            magic_b, fileKey_b, nodeCount_i, triangleCount_i = _HEADER_STRUCT.unpack(header_b)
+            if magic_b != BVH_MAGIC_b:
+                raise ValueError("wrong magic number")
+            if fileKey_b != key_s.encode("ascii"):
+                return None
+
+            layout_l = cls.__getBvhLayout(nodeCount_i, triangleCount_i)
+            offset_i, dtype, shape_t = layout_l[-1]
+            if offset_i + int( np.prod(shape_t) ) * np.dtype(dtype).itemsize > os.path.getsize(bvhFileDir_s):
+                raise ValueError("arrays are cut off")
+            memmap_arr = np.memmap(bvhFileDir_s, np.uint8, "r")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:  # Broken file, it will be overwritten.
+            print( "Failed to read collision mesh cache '{}': {}".format(bvhFileDir_s, e) )
+            return None
+
+        return co.TriangleBvh( *( cls.__getArray(memmap_arr, *x) for x in layout_l ) )
+
+    @staticmethod
+    def __getBvhLayout(nodeCount_i:int, triangleCount_i:int) -> List[ Tuple[int, type, Tuple[int, ...]] ]:
+        """
+        (offset, dtype, shape) of arrays in the order of TriangleBvh's arguments.
+        """
+        layout_l = []
+        cursor_i = _HEADER_STRUCT.size
+        for dtype, shape_t in (
+            (np.float32, (nodeCount_i, 3)), (np.float32, (nodeCount_i, 3)), (np.int32, (nodeCount_i,)),
+            (np.int32, (nodeCount_i,)), (np.float32, (triangleCount_i, 3, 3))
+        ):
+            cursor_i += -cursor_i % _ALIGN_i
+            layout_l.append( (cursor_i, dtype, shape_t) )
+            cursor_i += int( np.prod(shape_t) ) * np.dtype(dtype).itemsize
+        return layout_l
+
+    def __saveBvh(self, bvhFileDir_s:str, key_s:str, bvh:co.TriangleBvh) -> None:
+        nodeCount_i = len(bvh.nodeStarts_arr)
+        triangleCount_i = len(bvh.triangles_arr)
+        arrays_l = (bvh.nodeMin_arr, bvh.nodeMax_arr, bvh.nodeStarts_arr, bvh.nodeCounts_arr, bvh.triangles_arr)
+
+        tempFileDir_s = "{}.{}.tmp".format(bvhFileDir_s, os.getpid())
+        try:
+            os.makedirs(self.cacheDir_s, exist_ok=True)
+            with open(tempFileDir_s, "wb") as file:
+                file.write( _HEADER_STRUCT.pack( BVH_MAGIC_b, key_s.encode("ascii"), nodeCount_i, triangleCount_i ) )
+                for (offset_i, dtype, _), data_arr in zip(self.__getBvhLayout(nodeCount_i, triangleCount_i), arrays_l):
+                    file.write( b"\0" * (offset_i - file.tell()) )
+                    file.write( np.ascontiguousarray(data_arr, dtype).tobytes() )
+            os.replace(tempFileDir_s, bvhFileDir_s)
+        except OSError as e:
+            print( "Failed to write collision mesh cache '{}': {}".format(bvhFileDir_s, e) )
+            try:
+                os.remove(tempFileDir_s)
+            except OSError:
+                pass
+
+    def __save(self, cacheFileDir_s:str, key_s:str, renderers_d:Dict[str, op.OneRenderer],
+               materials_d:Dict[str, op.OneMaterial]) -> None:
+        strings_l = []
+        nameLengths_l = []
+        fields_l = []
+        arrays_l = []  # (offset, array)
+
+        renderers_l = list( renderers_d.values() )
+        cursor_i = _HEADER_STRUCT.size + _STAMP_STRUCT.size + _SUBMESH_STRUCT.size * len(renderers_l)
+        for oneRenderer in renderers_l:
+            names_l = [ x_s.encode("utf8") for x_s in (oneRenderer.name_s, oneRenderer.mtl_s, materials_d[oneRenderer.mtl_s].map_Kd_s) ]
+            strings_l += names_l
+            nameLengths_l.append( tuple( len(x_b) for x_b in names_l ) )
+            cursor_i += sum(nameLengths_l[-1])
+        stringsSize_i = sum( len(x_b) for x_b in strings_l )
+
+        for oneRenderer, nameLengths_t in zip(renderers_l, nameLengths_l):
+            index_arr = oneRenderer.indexNdarray
+            if index_arr is None:
+                index_arr = np.arange(len(oneRenderer.vertexNdarray), dtype=np.uint32)
+            lods_l = oneRenderer.lodIndexNdarrays_l[:MAX_LODS_i]
+            lodIndexCounts_l = [ x.size for x in lods_l ] + [0] * (MAX_LODS_i - len(lods_l))
+            if lods_l:
+                index_arr = np.concatenate( [index_arr] + lods_l )
+
+            offsets_l = []
+            for data_arr, dtype in (
+                (oneRenderer.vertexNdarray, np.float32), (oneRenderer.textureCoordNdarray, np.float32),
+                (oneRenderer.normalNdarray, np.float32), (index_arr, np.uint32)
+            ):
+                cursor_i += -cursor_i % _ALIGN_i
+                data_arr = np.ascontiguousarray(data_arr, dtype)
+                offsets_l.append(cursor_i)
+                arrays_l.append( (cursor_i, data_arr) )
+                cursor_i += data_arr.nbytes
+
+            vertex_arr = oneRenderer.vertexNdarray.reshape(-1, 3)
+            if len(vertex_arr):
+                bounds_l = vertex_arr.min(axis=0).tolist() + vertex_arr.max(axis=0).tolist()
+            else:
+                bounds_l = [0.0] * 6
+            fields_l.append( (
+                *nameLengths_t, len(vertex_arr), index_arr.size - sum(lodIndexCounts_l), *lodIndexCounts_l, *offsets_l, *bounds_l
+            ) )
+
+        # Written to a temporary file first, so other processes never read a half written file.
+        tempFileDir_s = "{}.{}.tmp".format(cacheFileDir_s, os.getpid())
+        try:
+            os.makedirs(self.cacheDir_s, exist_ok=True)
+            with open(tempFileDir_s, "wb") as file:
+                file.write( _HEADER_STRUCT.pack( MAGIC_b, key_s.encode("ascii"), len(renderers_l), stringsSize_i ) )
+                file.write( self.__packStamp( self.__stamps_d.pop(key_s, None) ) )
+                for fields_t in fields_l:
+                    file.write( _SUBMESH_STRUCT.pack(*fields_t) )
+                file.write( b"".join(strings_l) )
+                for offset_i, data_arr in arrays_l:
+                    file.write( b"\0" * (offset_i - file.tell()) )
+                    file.write( data_arr.tobytes() )
+            os.replace(tempFileDir_s, cacheFileDir_s)
+        except OSError as e:
+            print( "Failed to write mesh cache '{}': {}".format(cacheFileDir_s, e) )
+            try:
+                os.remove(tempFileDir_s)
+            except OSError:
+                pass
+
+
+def main():
+    """
+    Loads given models twice and prints how long it took with and without cache.
+    """
+    meshCache = MeshCache()
+    for modelName_s in sys.argv[1:] or ["seoul_v2"]:
+        dirs_t = op.findObjMtlDir(modelName_s)
+        if dirs_t is None:
+            print( "Model not found: '{}'".format(modelName_s) )
+            continue
+
+        try:
+            os.remove( meshCache.getCacheFileDir(dirs_t[0]) )
+        except FileNotFoundError:
+            pass
+
+        for _ in range(2):
+            st = perf_counter()
+            renderers_d, _, hit_b = meshCache.load(*dirs_t)
+            print( "'{}' {} ({:.4f} sec), {} renderers, {} vertices".format(
+                modelName_s, "from cache" if hit_b else "parsed", perf_counter() - st, len(renderers_d),
+                sum( x.vertexNumber_i for x in renderers_d.values() )
+            ) )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Simplifies triangle meshes into levels of detail, with quadric error metrics of Garland and Heckbert.
+
+Edges are collapsed into one of their ends, so simplified meshes use the vertices of the original mesh
+and only need index arrays of their own.
+Collapses are done in rounds of array operations. In each round, vertices whose cost is the lowest among their neighbors
+are collapsed along their cheapest edge, so no triangle has more than one vertex moving in a round.
+Vertices on borders and on seams of texture coords or normals, where vertices share a position, never move,
+so simplified meshes keep their outline and have no cracks.
+
+사용법:
+    python mesh_simplify.py seoul_v2  -> 렌더러마다 단계별 삼각형 수와 걸린 시간을 보여줍니다.
+"""
+
+import sys
+from time import perf_counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+LOD_RATIOS_t = (0.5, 0.25, 0.1)  # Triangles each level keeps, of the original mesh.
+MIN_TRIANGLES_i = 256  # Smaller meshes are not simplified.
+MIN_SHRINK_f = 0.8  # A level is left out if it keeps more than this of triangles of the level before.
+_FLIP_COS_f = 0.2  # Collapses turning a triangle's normal further than this are rejected.
+
+
+def makeLodIndices(vertex_arr:np.ndarray, index_arr:np.ndarray, ratios_t:Tuple[float, ...]=LOD_RATIOS_t) -> List[np.ndarray]:
+    """
+    Returns uint32 index arrays of simplified meshes, from the most detailed, which index vertex_arr.
+    Each one aims to keep its ratio of triangles of index_arr. Levels that could not get much smaller than
+    the one before are left out, so there may be fewer arrays than ratios, or none.
+    """
+    positions_arr = np.asarray(vertex_arr, np.float64).reshape(-1, 3)
+    triangles_arr = np.asarray(index_arr, np.int64).reshape(-1, 3)
+    if len(triangles_arr) < MIN_TRIANGLES_i:
+        return []
+
+    locked_arr = _findLockedVertices(positions_arr, triangles_arr)
+    quadrics_arr = _makeQuadrics(positions_arr, triangles_arr)
+
+    lods_l = []
+    lastCount_i = len(triangles_arr)
+    for ratio_f in ratios_t:
+        target_i = int( len(index_arr) // 3 * ratio_f )
+        while len(triangles_arr) > target_i:
+            collapses_t = _findCollapses(positions_arr, triangles_arr, quadrics_arr, locked_arr, len(triangles_arr) - target_i)
+            if collapses_t is None:
+                break
+            sources_arr, targets_arr = collapses_t
+
+            np.add.at(quadrics_arr, targets_arr, quadrics_arr[sources_arr])
+            remap_arr = np.arange( len(positions_arr) )
+            remap_arr[sources_arr] = targets_arr
+            triangles_arr = remap_arr[triangles_arr]
+            triangles_arr = triangles_arr[
+                (triangles_arr[:, 0] != triangles_arr[:, 1]) & (triangles_arr[:, 1] != triangles_arr[:, 2]) &
+                (triangles_arr[:, 2] != triangles_arr[:, 0])
+            ]
+
+        if len(triangles_arr) <= lastCount_i * MIN_SHRINK_f:
+            lods_l.append( triangles_arr.ravel().astype(np.uint32) )
+            lastCount_i = len(triangles_arr)
+
+    return lods_l
+
+
+def _findLockedVertices(positions_arr:np.ndarray, triangles_arr:np.ndarray) -> np.ndarray:
+    """
+    Vertices on edges which don't have exactly two triangles, and vertices sharing their position with others.
+    """
+    vertexCount_i = len(positions_arr)
+    edges_arr = np.sort( np.concatenate( (triangles_arr[:, [0, 1]], triangles_arr[:, [1, 2]], triangles_arr[:, [2, 0]]) ), axis=1 )
+    keys_arr, counts_arr = np.unique( edges_arr[:, 0] * vertexCount_i + edges_arr[:, 1], return_counts=True )
+    borderKeys_arr = keys_arr[counts_arr != 2]
+
+    locked_arr = np.zeros(vertexCount_i, np.bool_)
+    locked_arr[borderKeys_arr // vertexCount_i] = True
+    locked_arr[borderKeys_arr % vertexCount_i] = True
+
+    _, groups_arr, groupSizes_arr = np.unique(positions_arr, axis=0, return_inverse=True, return_counts=True)
+    locked_arr |= groupSizes_arr[ groups_arr.ravel() ] > 1
+    return locked_arr
+
+
+def _makeQuadrics(positions_arr:np.ndarray, triangles_arr:np.ndarray) -> np.ndarray:
+    """
+    Sum of squared distance to planes of the triangles around each vertex, weighted by their area, as (n, 4, 4).
+    """
+    normals_arr = _getTriangleNormals(positions_arr, triangles_arr)
+    lengths_arr = np.linalg.norm(normals_arr, axis=1, keepdims=True)
+    units_arr = normals_arr / np.where(lengths_arr > 0.0, lengths_arr, 1.0)
+    planes_arr = np.concatenate( (units_arr, -np.einsum("ij,ij->i", units_arr, positions_arr[triangles_arr[:, 0]])[:, None]), axis=1 )
+
+    triangleQuadrics_arr = planes_arr[:, :, None] * planes_arr[:, None, :] * (lengths_arr[:, :, None] * 0.5)
+    quadrics_arr = np.zeros( (len(positions_arr), 4, 4), np.float64 )
+    for corner_i in range(3):
+        np.add.at(quadrics_arr, triangles_arr[:, corner_i], triangleQuadrics_arr)
+    return quadrics_arr
+
+
+def _findCollapses(positions_arr:np.ndarray, triangles_arr:np.ndarray, quadrics_arr:np.ndarray, locked_arr:np.ndarray,
+                   excess_i:int) -> Optional[ Tuple[np.ndarray, np.ndarray] ]:
+    """
+    Returns vertices to collapse and where they go, for one round. About excess_i triangles are removed at most.
+    None if no vertex can be collapsed.
+    """
+    vertexCount_i = len(positions_arr)
+    edges_arr = np.concatenate( (triangles_arr[:, [0, 1]], triangles_arr[:, [1, 2]], triangles_arr[:, [2, 0]]) )
+    keys_arr = np.unique( np.concatenate( (edges_arr[:, 0] * vertexCount_i + edges_arr[:, 1],
+                                           edges_arr[:, 1] * vertexCount_i + edges_arr[:, 0]) ) )
+    froms_arr, tos_arr = keys_arr // vertexCount_i, keys_arr % vertexCount_i
+
+    ######## Cheapest edge of each vertex ########
+
+    movable_arr = ~locked_arr[froms_arr]
+    candFroms_arr, candTos_arr = froms_arr[movable_arr], tos_arr[movable_arr]
+    if not candFroms_arr.size:
+        return None
+
+    homogeneous_arr = np.concatenate( (positions_arr[candTos_arr], np.ones( (candTos_arr.size, 1) )), axis=1 )
+    costs_arr = np.einsum(
+        "ki,kij,kj->k", homogeneous_arr, quadrics_arr[candFroms_arr] + quadrics_arr[candTos_arr], homogeneous_arr
+    )
+
+    order_arr = np.lexsort( (costs_arr, candFroms_arr) )
+    firsts_arr = order_arr[ np.flatnonzero( np.diff(candFroms_arr[order_arr], prepend=-1) ) ]
+    vertexCosts_arr = np.full(vertexCount_i, np.inf)
+    vertexCosts_arr[ candFroms_arr[firsts_arr] ] = costs_arr[firsts_arr]
+    targets_arr = np.full(vertexCount_i, -1, np.int64)
+    targets_arr[ candFroms_arr[firsts_arr] ] = candTos_arr[firsts_arr]
+
+    ######## Reject collapses which flip triangles ########
+
+    # A vertex is checked with its cheapest edge only, and left for later rounds if that flips a triangle.
+    rows_arr, corners_arr = np.nonzero(targets_arr[triangles_arr] >= 0)
+    moved_arr = triangles_arr[rows_arr]
+    sources_arr = moved_arr[np.arange(rows_arr.size), corners_arr]
+    dests_arr = targets_arr[sources_arr]
+    kept_arr = np.all(moved_arr != dests_arr[:, None], axis=1)  # Triangles with both ends of the edge disappear.
+    moved_arr, sources_arr, dests_arr = moved_arr[kept_arr], sources_arr[kept_arr], dests_arr[kept_arr]
+
+    oldNormals_arr = _getTriangleNormals(positions_arr, moved_arr)
+    moved_arr = np.where(moved_arr == sources_arr[:, None], dests_arr[:, None], moved_arr)
+    newNormals_arr = _getTriangleNormals(positions_arr, moved_arr)
+    dots_arr = np.einsum("ij,ij->i", oldNormals_arr, newNormals_arr)
+    flipped_arr = dots_arr <= _FLIP_COS_f * np.linalg.norm(oldNormals_arr, axis=1) * np.linalg.norm(newNormals_arr, axis=1)
+    vertexCosts_arr[ sources_arr[flipped_arr] ] = np.inf
+
+    ######## Vertices cheaper than all of their neighbors ########
+
+    # Flat areas have many ties, which are broken by scrambled indices so picked vertices are spread out.
+    vertexIndices_arr = np.arange(vertexCount_i, dtype=np.uint64)
+    scrambled_arr = (vertexIndices_arr * np.uint64(2654435761)) % np.uint64(2 ** 32)
+    ranks_arr = np.empty(vertexCount_i, np.int64)
+    ranks_arr[ np.lexsort( (scrambled_arr, vertexCosts_arr) ) ] = np.arange(vertexCount_i)
+    neighborRanks_arr = np.full(vertexCount_i, vertexCount_i, np.int64)
+    np.minimum.at(neighborRanks_arr, froms_arr, ranks_arr[tos_arr])
+    selected_arr = np.isfinite(vertexCosts_arr) & (ranks_arr < neighborRanks_arr)
+
+    ######## Cheapest ones, not removing many more triangles than needed ########
+
+    chosen_arr = np.flatnonzero(selected_arr)
+    if not chosen_arr.size:
+        return None
+    chosen_arr = chosen_arr[ np.argsort(vertexCosts_arr[chosen_arr], kind="stable") ][ :max(1, (excess_i + 1) // 2) ]
+    return chosen_arr, targets_arr[chosen_arr]
+
+
+def _getTriangleNormals(positions_arr:np.ndarray, triangles_arr:np.ndarray) -> np.ndarray:
+    """
+    Not normalized, their length is twice the area of the triangle.
+    """
+    corners_arr = positions_arr[triangles_arr]
+    return np.cross( corners_arr[:, 1] - corners_arr[:, 0], corners_arr[:, 2] - corners_arr[:, 0] )
+
+
+def main():
+    """
+    Simplifies every renderer of given models and prints triangle counts of each level.
+    """
+    import obj_parse as op
+
+    for modelName_s in sys.argv[1:] or ["seoul_v2"]:
+        dirs_t = op.findObjMtlDir(modelName_s)
+        if dirs_t is None:
+            print( "Model not found: '{}'".format(modelName_s) )
+            continue
+
+        for oneRenderer in op.parseObj(dirs_t[0]).values():
+            st = perf_counter()
+            lods_l = makeLodIndices(oneRenderer.vertexNdarray, oneRenderer.indexNdarray)
+            print( "'{}' {}: {} triangles{} ({:.4f} sec)".format(
+                modelName_s, oneRenderer.name_s, oneRenderer.indexNdarray.size // 3,
+                "".join( " -> {}".format(x.size // 3) for x in lods_l ), perf_counter() - st
+            ) )
+
+
+if __name__ == '__main__':
+    main()
@@ -170,6 +170,7 @@ class Vec4:
 class Angle:
     def __init__(self, degree_f:float, static_b:bool=False):
         self.__static_b = False
+        self.__onChange = None
 
         self.__degree_f = None
         self.setDegree(degree_f)
@@ -220,9 +221,19 @@ class Angle:
 
         self.__degree_f = degree_f
 
+        if self.__onChange is not None:
+            self.__onChange()
+
     def getStatic(self) -> bool:
         return self.__static_b
 
+    def setOnChange(self, callback) -> None:
+        """
+        The callback is called with no argument every time the degree is changed.
+        Actors use this to know when their cached matrices are out of date.
+        """
+        self.__onChange = callback
+
     ####  ####
 
     def getRadian(self) -> float:
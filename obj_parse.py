@@ -1,9 +1,457 @@
-from typing import Dict
+"""
+Parses Wavefront .obj and .mtl files.
+
+사용법:
+    python obj_parse.py assets/models/seoul/seoul_v2.obj 5  -> 두 파서의 속도를 비교합니다.
+"""
+
+import os
+import sys
+import signal
+from multiprocessing import Pool
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 
+import mesh_simplify as ms
+import const
+
+
+_NEWLINE_i = ord('\n')
+_IS_SPACE_arr = np.zeros(256, np.bool_)  # Indexed by bytes, faster than np.isin.
+_IS_SPACE_arr[ [ord(' '), ord('\t'), ord('\r')] ] = True
+
+# Tables for bytes.translate, which blank out prefixes of lines so only numbers are left.
+_V_TABLE_b = bytes.maketrans(b"v", b" ")
+_VT_TABLE_b = bytes.maketrans(b"vt", b"  ")
+_VN_TABLE_b = bytes.maketrans(b"vn", b"  ")
+_F_TABLE_b = bytes.maketrans(b"f/", b"  ")
+
+_MIN_CHUNKS_i = 4  # parseObjInChunks splits files into at least this many chunks, so renderers come out early.
+_chunkPools_t = None  # v, vt and vn arrays in worker processes of parseObjInChunks.
+
 
 def parseObj(fileDir_s:str) -> Dict[ str, "OneRenderer" ]:
+    """
+    The file is handled as an array of bytes. Lines are sorted by their first two bytes,
+    and then every line of a kind is gathered into one bytes and converted at once.
+    Faces are fan triangulated. Corners with the same v, vt and vn share a vertex, and indexNdarray has three for each
+    triangle, in the order of the file.
+    Negative indices count back from the v, vt or vn lines above the face.
+    If faces have no vt, texture coords are all zero. If they have no vn, flat normals are made.
+    """
+    lines = _ObjLines( _readObjFile(fileDir_s) )
+    pools_t = _parsePools(lines, fileDir_s)
+    return _parseObjects( lines, pools_t, _findFaceFormat(lines), (0, 0, 0), fileDir_s )
+
+
+def parseObjInChunks(fileDir_s:str, workers_i:Optional[int]=None,
+                     makeLods_b:bool=False) -> Iterator[ Dict[str, "OneRenderer"] ]:
+    """
+    Same as parseObj, but yields renderers a chunk at a time in the order of the file, so they can be used
+    before the whole file is parsed. Chunks are runs of whole objects, split at 'o' lines.
+    v, vt and vn lines are parsed here first, because faces of any object may use any of them.
+    Faces of chunks are parsed on worker processes, or here one chunk after another if workers_i is 1.
+    If makeLods_b is True, renderers come with simplified meshes of OneRenderer.makeLods, made on the same workers.
+    """
+    data_b = _readObjFile(fileDir_s)
+    lines = _ObjLines(data_b)
+    pools_t = _parsePools(lines, fileDir_s)
+    format_t = _findFaceFormat(lines)
+
+    workers_i = workers_i or os.cpu_count() or 1
+    jobs_l = _makeChunkJobs(fileDir_s, lines, len(data_b) - 2, workers_i, makeLods_b)
+
+    names_s = set()
+    def checkNames(renderers_d:Dict[str, OneRenderer]) -> Dict[str, OneRenderer]:
+        for name_s in renderers_d:
+            if name_s in names_s:
+                raise FileExistsError( "There are multiple objects named '{}' in '{}'".format(name_s, fileDir_s) )
+            names_s.add(name_s)
+        return renderers_d
+
+    if workers_i <= 1 or len(jobs_l) <= 1:
+        for _, start_i, end_i, bases_t, _, _ in jobs_l:
+            chunkLines = _ObjLines( data_b[start_i:end_i] + b"\n\n" )
+            renderers_d = _parseObjects(chunkLines, pools_t, format_t, bases_t, fileDir_s)
+            if makeLods_b:
+                for oneRenderer in renderers_d.values():
+                    oneRenderer.makeLods()
+            yield checkNames(renderers_d)
+    else:
+        del lines, data_b
+        with Pool( min(workers_i, len(jobs_l)), initializer=_initChunkWorker, initargs=(pools_t,) ) as pool:
+            for renderers_d in pool.imap(_parseChunkJob, jobs_l):
+                yield checkNames(renderers_d)
+
+
+def prepareObjChunks(fileDir_s:str, workers_i:int,
+                     makeLods_b:bool=False) -> Tuple[ Tuple[np.ndarray, np.ndarray, np.ndarray], List[tuple] ]:
+    """
+    First stage of parseObjInChunks, for callers that run chunks on their own workers.
+    Returns v, vt and vn pools of the file and jobs of its chunks. Each job is parsed by parseObjChunk with the pools,
+    and renderers of all of them are the same as parseObj.
+    """
+    data_b = _readObjFile(fileDir_s)
+    lines = _ObjLines(data_b)
+    return _parsePools(lines, fileDir_s), _makeChunkJobs(fileDir_s, lines, len(data_b) - 2, workers_i, makeLods_b)
+
+
+def parseObjChunk(job_t:tuple, pools_t:Tuple[np.ndarray, np.ndarray, np.ndarray]) -> Dict[ str, "OneRenderer" ]:
+    """
+    Parses faces of a chunk from prepareObjChunks. Only its own bytes are read from the file.
+    """
+    fileDir_s, start_i, end_i, bases_t, format_t, makeLods_b = job_t
+    with open(fileDir_s, "rb") as file:
+        file.seek(start_i)
+        data_b = file.read(end_i - start_i) + b"\n\n"
+
+    renderers_d = _parseObjects( _ObjLines(data_b), pools_t, format_t, bases_t, fileDir_s )
+    if makeLods_b:
+        for oneRenderer in renderers_d.values():
+            oneRenderer.makeLods()
+    return renderers_d
+
+
+######## Parsing stages ########
+
+def _initChunkWorker(pools_t:Tuple[np.ndarray, np.ndarray, np.ndarray]) -> None:
+    global _chunkPools_t
+    _chunkPools_t = pools_t
+
+    # Workers forked from a process with pygame inherit its SIGTERM handler, which only makes a quit event,
+    # and then Pool.terminate() would wait for them forever.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _parseChunkJob(job_t:tuple) -> Dict[ str, "OneRenderer" ]:
+    return parseObjChunk(job_t, _chunkPools_t)
+
+
+def _makeChunkJobs(fileDir_s:str, lines:"_ObjLines", dataEnd_i:int, workers_i:int, makeLods_b:bool) -> List[tuple]:
+    format_t = _findFaceFormat(lines)
+    return [
+        (fileDir_s, start_i, end_i, bases_t, format_t, makeLods_b)
+        for start_i, end_i, bases_t in _splitChunks( lines, dataEnd_i, max(_MIN_CHUNKS_i, workers_i * 2) )
+    ]
+
+
+def _readObjFile(fileDir_s:str) -> bytes:
+    # Two more newlines, so the last line always ends with one and every line has a second byte.
+    with open(fileDir_s, "rb") as file:
+        return file.read() + b"\n\n"
+
+
+class _ObjLines:
+    """
+    Lines of .obj data, sorted by kind.
+    """
+    def __init__(self, data_b:bytes):
+        self.data_b = data_b
+        data_arr = np.frombuffer(data_b, np.uint8)
+
+        self.lineEnds_arr = np.flatnonzero(data_arr == _NEWLINE_i)[:-1]  # Index of '\n' of each line.
+        self.lineStarts_arr = np.concatenate( ([0], self.lineEnds_arr[:-1] + 1) )
+        first_arr = data_arr[self.lineStarts_arr]
+        second_arr = data_arr[self.lineStarts_arr + 1]
+        secondIsSpace_arr = _IS_SPACE_arr[second_arr]
+
+        self.vLines_arr = np.flatnonzero( (first_arr == ord('v')) & secondIsSpace_arr )
+        self.vtLines_arr = np.flatnonzero( (first_arr == ord('v')) & (second_arr == ord('t')) )
+        self.vnLines_arr = np.flatnonzero( (first_arr == ord('v')) & (second_arr == ord('n')) )
+        self.fLines_arr = np.flatnonzero( (first_arr == ord('f')) & secondIsSpace_arr )
+        self.oLines_arr = np.flatnonzero( (first_arr == ord('o')) & secondIsSpace_arr )
+        self.usLines_arr = np.flatnonzero( (first_arr == ord('u')) & (second_arr == ord('s')) )
+
+    def getLine(self, line_i:int) -> str:
+        return self.data_b[ self.lineStarts_arr[line_i]:self.lineEnds_arr[line_i] ].decode("utf8")
+
+    def gatherLines(self, lines_arr:np.ndarray, table_b:bytes) -> bytes:
+        return _gatherLines(self.data_b, self.lineStarts_arr, self.lineEnds_arr, lines_arr).translate(table_b)
+
+
+def _parsePools(lines:_ObjLines, fileDir_s:str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    vertices_arr = _parseFloatLines( lines.gatherLines(lines.vLines_arr, _V_TABLE_b), len(lines.vLines_arr), 3 )
+    texCoords_arr = _parseFloatLines( lines.gatherLines(lines.vtLines_arr, _VT_TABLE_b), len(lines.vtLines_arr), 2 )
+    normals_arr = _parseFloatLines( lines.gatherLines(lines.vnLines_arr, _VN_TABLE_b), len(lines.vnLines_arr), 3 )
+    if vertices_arr is None or texCoords_arr is None or normals_arr is None:
+        raise ValueError( "Broken v, vt or vn lines in '{}'".format(fileDir_s) )
+    return vertices_arr, texCoords_arr, normals_arr
+
+
+def _findFaceFormat(lines:_ObjLines) -> Tuple[bool, bool]:
+    """
+    Returns whether faces have vt and vn, which is decided by the first corner of the first face.
+    """
+    if not lines.fLines_arr.size:
+        return False, False
+
+    firstCorner_l = lines.getLine(lines.fLines_arr[0]).split()[1].split('/')
+    hasTexCoord_b = len(firstCorner_l) > 1 and firstCorner_l[1] != ""
+    hasNormal_b = len(firstCorner_l) > 2 and firstCorner_l[2] != ""
+    return hasTexCoord_b, hasNormal_b
+
+
+def _splitChunks(lines:_ObjLines, dataEnd_i:int, chunks_i:int) -> List[ Tuple[int, int, Tuple[int, int, int]] ]:
+    """
+    Splits objects into about chunks_i runs with similar number of faces. An object is never split.
+    Returns start and end in bytes of each run and how many v, vt and vn lines are above it.
+    """
+    oLines_arr = lines.oLines_arr
+    if not oLines_arr.size:
+        return []
+
+    faceCounts_l = np.diff( np.searchsorted(lines.fLines_arr, np.append(oLines_arr, len(lines.lineStarts_arr))) ).tolist()
+    target_i = max( 1, sum(faceCounts_l) // chunks_i )
+
+    firstObjs_l = [0]
+    count_i = 0
+    for obj_i, faceCount_i in enumerate(faceCounts_l):
+        if count_i and count_i + faceCount_i > target_i:
+            firstObjs_l.append(obj_i)
+            count_i = 0
+        count_i += faceCount_i
+
+    chunks_l = []
+    for first_i, end_i in zip( firstObjs_l, firstObjs_l[1:] + [None] ):
+        line_i = int(oLines_arr[first_i])
+        bases_t = tuple( int(np.searchsorted(x, line_i)) for x in (lines.vLines_arr, lines.vtLines_arr, lines.vnLines_arr) )
+        endByte_i = dataEnd_i if end_i is None else int( lines.lineStarts_arr[ oLines_arr[end_i] ] )
+        chunks_l.append( ( int(lines.lineStarts_arr[line_i]), endByte_i, bases_t ) )
+    return chunks_l
+
+
+def _parseObjects(lines:_ObjLines, pools_t:Tuple[np.ndarray, np.ndarray, np.ndarray], format_t:Tuple[bool, bool],
+                  bases_t:Tuple[int, int, int], fileDir_s:str) -> Dict[ str, "OneRenderer" ]:
+    """
+    Makes renderers of objects in lines, whose faces use v, vt and vn of pools_t.
+    bases_t is the number of v, vt and vn lines above the lines, for negative indices.
+    """
+    vertices_arr, texCoords_arr, normals_arr = pools_t
+    hasTexCoord_b, hasNormal_b = format_t
+    fLines_arr, oLines_arr = lines.fLines_arr, lines.oLines_arr
+
+    ######## Faces ########
+
+    columns_i = 1 + hasTexCoord_b + hasNormal_b
+
+    # Index 0 is not valid in .obj, so it is put at the end of each face to find where faces end after converting.
+    faces_b = lines.gatherLines(fLines_arr, _F_TABLE_b).replace(b"\n", b" 0\n")
+    numbers_arr = np.fromstring(faces_b, np.int64, sep=' ') if faces_b else np.zeros(0, np.int64)
+    del faces_b
+    faceEnds_arr = np.flatnonzero(numbers_arr == 0)
+    if faceEnds_arr.size != fLines_arr.size:
+        raise ValueError( "Broken f lines in '{}'".format(fileDir_s) )
+
+    numberCounts_arr = np.diff(faceEnds_arr, prepend=-1) - 1
+    if np.any(numberCounts_arr % columns_i != 0):
+        raise ValueError( "Faces in '{}' are not all in the same v/vt/vn format.".format(fileDir_s) )
+    cornerCounts_arr = numberCounts_arr // columns_i
+    if np.any(cornerCounts_arr < 3):
+        raise ValueError( "A face with less than 3 vertices in '{}'".format(fileDir_s) )
+    if fLines_arr.size and np.all(cornerCounts_arr == cornerCounts_arr[0]):  # Mostly all triangles or all quads.
+        cornerIndices_arr = numbers_arr.reshape(fLines_arr.size, -1)[:, :-1].reshape(-1, columns_i)
+    else:
+        cornerIndices_arr = np.delete(numbers_arr, faceEnds_arr).reshape(-1, columns_i)
+
+    vIndices_arr = _resolveIndices(
+        cornerIndices_arr[:, 0], lines.vLines_arr, bases_t[0], fLines_arr, cornerCounts_arr, len(vertices_arr), "v", fileDir_s
+    )
+    if hasTexCoord_b:
+        vtIndices_arr = _resolveIndices(
+            cornerIndices_arr[:, 1], lines.vtLines_arr, bases_t[1], fLines_arr, cornerCounts_arr, len(texCoords_arr), "vt",
+            fileDir_s
+        )
+    if hasNormal_b:
+        vnIndices_arr = _resolveIndices(
+            cornerIndices_arr[:, -1], lines.vnLines_arr, bases_t[2], fLines_arr, cornerCounts_arr, len(normals_arr), "vn",
+            fileDir_s
+        )
+
+    # Fan triangulation, a face of n corners (c0, c1, ..., cn-1) becomes (c0, ck, ck+1) for k in 1 ... n-2.
+    triCounts_arr = cornerCounts_arr - 2
+    triFaces_arr = np.repeat( np.arange(fLines_arr.size), triCounts_arr )
+    if np.all(triCounts_arr == 1):
+        triCorners_arr = None  # Corners of triangles are already in order, so they are sliced instead.
+    else:
+        firstCorners_arr = ( np.cumsum(cornerCounts_arr) - cornerCounts_arr )[triFaces_arr]
+        k_arr = np.arange(triFaces_arr.size) - ( np.cumsum(triCounts_arr) - triCounts_arr )[triFaces_arr] + 1
+        triCorners_arr = np.stack( (firstCorners_arr, firstCorners_arr + k_arr, firstCorners_arr + k_arr + 1), axis=1 )
+
+    ######## Split by objects ########
+
+    # Object of each line, 0 for lines above the first 'o' which are thrown away.
+    objOfFace_arr = np.searchsorted(oLines_arr, fLines_arr, side="right")
+    objOfTri_arr = objOfFace_arr[triFaces_arr]
+    triBounds_arr = np.searchsorted( objOfTri_arr, np.arange(oLines_arr.size + 2) )
+
+    materials_d = {}
+    for x in lines.usLines_arr.tolist():
+        line_s = lines.getLine(x)
+        if line_s.startswith("usemtl "):
+            materials_d[ int(np.searchsorted(oLines_arr, x, side="right")) ] = line_s.split()[1]
+
+    resultData_d = {}
+    for obj_i, line_i in enumerate(oLines_arr.tolist(), 1):
+        oneRenderer = OneRenderer()
+        oneRenderer.name_s = lines.getLine(line_i).split()[1]
+        if oneRenderer.name_s in resultData_d:
+            raise FileExistsError( "There are multiple objects named '{}' in '{}'".format(oneRenderer.name_s, fileDir_s) )
+        oneRenderer.mtl_s = materials_d.get(obj_i)
+
+        if triCorners_arr is None:
+            corners = slice( 3 * triBounds_arr[obj_i], 3 * triBounds_arr[obj_i + 1] )
+        else:
+            corners = triCorners_arr[ triBounds_arr[obj_i]:triBounds_arr[obj_i + 1] ].ravel()
+        cornerVs_arr = vIndices_arr[corners]
+        cornerVts_arr = vtIndices_arr[corners] if hasTexCoord_b else np.zeros_like(cornerVs_arr)
+
+        if hasNormal_b:
+            # Corners with the same v, vt and vn become one vertex.
+            cornerVns_arr = vnIndices_arr[corners]
+            uniqueCorners_arr, oneRenderer.indexNdarray = _dedupeCorners(
+                (cornerVs_arr, cornerVts_arr, cornerVns_arr), ( len(vertices_arr), max(1, len(texCoords_arr)), len(normals_arr) )
+            )
+            oneRenderer.vertexNdarray = vertices_arr[ cornerVs_arr[uniqueCorners_arr] ]
+            oneRenderer.normalNdarray = normals_arr[ cornerVns_arr[uniqueCorners_arr] ]
+            cornerVts_arr = cornerVts_arr[uniqueCorners_arr]
+        else:
+            # Flat normals differ for every triangle, so corners are not merged.
+            oneRenderer.vertexNdarray = vertices_arr[cornerVs_arr]
+            oneRenderer.normalNdarray = _makeFlatNormals(oneRenderer.vertexNdarray)
+            oneRenderer.indexNdarray = np.arange( len(cornerVs_arr), dtype=np.uint32 )
+
+        if hasTexCoord_b:
+            oneRenderer.textureCoordNdarray = texCoords_arr[cornerVts_arr]
+        else:
+            oneRenderer.textureCoordNdarray = np.zeros( (len(oneRenderer.vertexNdarray), 2), np.float32 )
+        oneRenderer.vertexNumber_i = len(oneRenderer.vertexNdarray)
+
+        oneRenderer.vertices_l = None
+        oneRenderer.texCoords_l = None
+        oneRenderer.normals_l = None
+
+        oneRenderer.checkIntegrity()
+        resultData_d[oneRenderer.name_s] = oneRenderer
+
+    return resultData_d
+
+
+def _gatherLines(data_b:bytes, lineStarts_arr:np.ndarray, lineEnds_arr:np.ndarray, lines_arr:np.ndarray) -> bytes:
+    """
+    Returns given lines joined, each ending with '\\n'. Lines of a kind mostly come in long runs, so each run is sliced at once.
+    """
+    if lines_arr.size == 0:
+        return b""
+
+    breaks_arr = np.flatnonzero( np.diff(lines_arr) != 1 ) + 1
+    runStarts_arr = lineStarts_arr[ lines_arr[ np.concatenate( ([0], breaks_arr) ) ] ]
+    runEnds_arr = lineEnds_arr[ lines_arr[ np.concatenate( (breaks_arr - 1, [lines_arr.size - 1]) ) ] ] + 1
+    return b"".join( data_b[x:y] for x, y in zip(runStarts_arr.tolist(), runEnds_arr.tolist()) )
+
+
+def _parseFloatLines(data_b:bytes, lineCount_i:int, columns_i:int) -> Optional[np.ndarray]:
+    """
+    Extra columns like w of v or vt lines are dropped. None if lines have different number of columns or too few.
+    """
+    if lineCount_i == 0:
+        return np.zeros( (0, columns_i), np.float32 )
+
+    values_arr = _parseFixedDecimals(data_b)
+    if values_arr is None:
+        values_arr = np.fromstring( data_b, np.float32, sep=' ' )
+    if values_arr.size % lineCount_i != 0 or values_arr.size // lineCount_i < columns_i:
+        return None
+    return np.ascontiguousarray( values_arr.reshape(lineCount_i, -1)[:, :columns_i], np.float32 )
+
+
+def _parseFixedDecimals(data_b:bytes) -> Optional[np.ndarray]:
+    """
+    Exporters like Blender write every number with the same number of decimals, like '-0.123456'.
+    Those are converted as integers without dots and then divided, which is a few times faster than converting floats,
+    and gives the same values since both are rounded only once. None if numbers are not like that.
+    """
+    bytes_arr = np.frombuffer(data_b, np.uint8)
+    dots_arr = np.flatnonzero(bytes_arr == ord('.'))
+    if dots_arr.size == 0:
+        return None
+
+    decimals_i = 0
+    while dots_arr[0] + decimals_i + 1 < bytes_arr.size and chr(bytes_arr[ dots_arr[0] + decimals_i + 1 ]).isdigit():
+        decimals_i += 1
+    if decimals_i == 0 or dots_arr[-1] + decimals_i + 1 >= bytes_arr.size:
+        return None
+    for x in range(1, decimals_i + 1):
+        digits_arr = bytes_arr[dots_arr + x]
+        if np.any(digits_arr < ord('0')) or np.any(digits_arr > ord('9')):
+            return None
+    if not np.all( _IS_SPACE_arr[ bytes_arr[dots_arr + decimals_i + 1] ] | (bytes_arr[dots_arr + decimals_i + 1] == _NEWLINE_i) ):
+        return None
+
+    try:
+        integers_arr = np.fromstring( data_b.replace(b".", b""), np.int64, sep=' ' )
+    except ValueError:  # Other numbers, like '1e-07', are left to the float parser.
+        return None
+    # Numbers without a dot make the counts differ, and float64 holds integers up to 2 ** 53 exactly.
+    if integers_arr.size != dots_arr.size or np.abs(integers_arr).max() >= 2 ** 53:
+        return None
+    return integers_arr / 10.0 ** decimals_i
+
+
+def _resolveIndices(indices_arr:np.ndarray, kindLines_arr:np.ndarray, base_i:int, fLines_arr:np.ndarray,
+                    cornerCounts_arr:np.ndarray, total_i:int, kind_s:str, fileDir_s:str) -> np.ndarray:
+    """
+    Turns 1 based and negative indices into 0 based ones.
+    Negative ones count back from the lines of their kind above their face, of which base_i are above kindLines_arr.
+    """
+    if indices_arr.size and indices_arr.min() < 0:
+        countsAbove_arr = np.repeat( np.searchsorted(kindLines_arr, fLines_arr) + base_i, cornerCounts_arr )
+        resolved_arr = np.where(indices_arr < 0, indices_arr + countsAbove_arr, indices_arr - 1)
+    else:
+        resolved_arr = indices_arr - 1
+
+    if resolved_arr.size and ( resolved_arr.min() < 0 or resolved_arr.max() >= total_i ):
+        raise IndexError( "{} index out of range in '{}', there are {}".format(kind_s, fileDir_s, total_i) )
+    return resolved_arr
+
+
+def _dedupeCorners(indices_t:Tuple[np.ndarray, ...], sizes_t:Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds corners with the same index in every array of indices_t.
+    Returns the first corner of each group, in the order they first appear, and the group of every corner as uint32.
+    Vertices are kept in the order faces use them, which keeps index buffers friendly to vertex caches of GPU.
+    """
+    capacity_i = 1
+    for size_i in sizes_t:
+        capacity_i *= size_i
+
+    if capacity_i < 2 ** 63:  # Indices are packed into one int64 key per corner.
+        keys_arr = np.zeros( len(indices_t[0]), np.int64 )
+        for indices_arr, size_i in zip(indices_t, sizes_t):
+            keys_arr = keys_arr * size_i + indices_arr
+    else:
+        keys_arr = np.unique( np.stack(indices_t, axis=1), axis=0, return_inverse=True )[1].ravel()
+
+    _, firsts_arr, groups_arr = np.unique(keys_arr, return_index=True, return_inverse=True)
+    order_arr = np.argsort(firsts_arr)
+    ranks_arr = np.empty_like(order_arr)
+    ranks_arr[order_arr] = np.arange(order_arr.size)
+    return firsts_arr[order_arr], ranks_arr[ groups_arr.ravel() ].astype(np.uint32)
+
+
+def _makeFlatNormals(vertices_arr:np.ndarray) -> np.ndarray:
+    triangles_arr = vertices_arr.reshape(-1, 3, 3)
+    normals_arr = np.cross( triangles_arr[:, 1] - triangles_arr[:, 0], triangles_arr[:, 2] - triangles_arr[:, 0] )
+    lengths_arr = np.linalg.norm(normals_arr, axis=1, keepdims=True)
+    normals_arr = normals_arr / np.where(lengths_arr > 0.0, lengths_arr, 1.0)
+    return np.repeat( normals_arr.astype(np.float32), 3, axis=0 )
+
+
+def parseObjByLines(fileDir_s:str) -> Dict[ str, "OneRenderer" ]:
+    """
+    The old line by line parser, only for triangles. Kept to check parseObj against and to benchmark it.
+    """
     fileData_d = {}
     resultData_d = {}
 
@@ -139,15 +587,40 @@ class OneRenderer:
         self.vertexNdarray = None
         self.textureCoordNdarray = None
         self.normalNdarray = None
+        self.indexNdarray = None  # uint32, three for each triangle. None if every three vertices make a triangle.
+        self.lodIndexNdarrays_l = []  # uint32 index arrays of simplified meshes using the same vertices, from the most detailed.
 
         self.vertexNumber_i = None
         self.mtl_s = None
 
     def __repr__(self):
-        return "< {}.OneRenderer object at 0x{:0>16X}, name: {}, vertexNumber: {}, mtl: {} >".format(
-            __name__, id(self), self.name_s, self.vertexNumber_i, self.mtl_s
+        return "< {}.OneRenderer object at 0x{:0>16X}, name: {}, vertexNumber: {}, indexNumber: {}, mtl: {} >".format(
+            __name__, id(self), self.name_s, self.vertexNumber_i, None if self.indexNdarray is None else self.indexNdarray.size,
+            self.mtl_s
         )
 
+    def getTriangleArrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns vertex, texture coord and normal arrays where every three vertices make a triangle.
+        """
+        if self.indexNdarray is None:
+            return self.vertexNdarray, self.textureCoordNdarray, self.normalNdarray
+        else:
+            return (
+                self.vertexNdarray[self.indexNdarray], self.textureCoordNdarray[self.indexNdarray],
+                self.normalNdarray[self.indexNdarray]
+            )
+
+    def makeLods(self) -> None:
+        """
+        Fills lodIndexNdarrays_l with mesh_simplify. Meshes with flat normals have no vertex shared by triangles,
+        so they are never simplified.
+        """
+        index_arr = self.indexNdarray
+        if index_arr is None:
+            index_arr = np.arange(len(self.vertexNdarray), dtype=np.uint32)
+        self.lodIndexNdarrays_l = ms.makeLodIndices(self.vertexNdarray, index_arr)
+
     def checkIntegrity(self) -> None:
         if self.name_s is None:
             raise ValueError("name_s is not filled.")
@@ -178,18 +651,85 @@ class OneMaterial:
             raise ValueError("map_Kd_s is not filled")
 
 
-def main():
-    a = parseObj("C:/Users/sungmin/OneDrive/Programming/Python/3.5/escapeRoom/assets/models/palanquin.obj")
-    b = parseMtl("C:/Users/sungmin/OneDrive/Programming/Python/3.5/escapeRoom/assets/models/palanquin.mtl")
+def findObjMtlDir(objFileName_s:str) -> Optional[ Tuple[str, str] ]:
+    objFileDir_s = ""
+    mtlFileDir_s = ""
+
+    for folderDir_s, _, files_l in os.walk(const.MODEL_DIR_s):
+        for file_s in files_l:
+            if objFileDir_s and mtlFileDir_s:
+                break
 
-    print(a)
-    print(b)
+            if file_s == objFileName_s + ".obj":
+                if objFileDir_s:
+                    raise FileExistsError("There are multiple '{}' files.".format(objFileName_s))
+                else:
+                    objFileDir_s = "{}/{}".format(folderDir_s, file_s)
+                    continue
+            elif file_s == objFileName_s + ".mtl":
+                if mtlFileDir_s:
+                    raise FileExistsError("There are multiple '{}' files.".format(mtlFileDir_s))
+                else:
+                    mtlFileDir_s = "{}/{}".format(folderDir_s, file_s)
+                    continue
 
-    for x in a:
-        print(a[x])
+    if objFileDir_s and mtlFileDir_s:
+        return objFileDir_s, mtlFileDir_s
+    else:
+        return None
 
-    for x in b:
-        print(b[x])
+
+def main():
+    """
+    Parses a model with both parsers and prints how long they took and whether the results are the same.
+    """
+    objFileDir_s = sys.argv[1] if len(sys.argv) > 1 else const.MODEL_DIR_s + "seoul/seoul_v2.obj"
+    repeat_i = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    times_d = {}
+    results_d = {}
+    for parse in (parseObjByLines, parseObj):
+        times_l = []
+        for _ in range(repeat_i):
+            st = perf_counter()
+            results_d[parse.__name__] = parse(objFileDir_s)
+            times_l.append( perf_counter() - st )
+        times_d[parse.__name__] = min(times_l)
+        print( "{}: best {:.4f} sec of {}".format(parse.__name__, times_d[parse.__name__], repeat_i) )
+
+    print( "{:.1f}x faster".format(times_d["parseObjByLines"] / times_d["parseObj"]) )
+
+    old_d, new_d = results_d["parseObjByLines"], results_d["parseObj"]
+    same_b = list(old_d) == list(new_d) and all(
+        old_d[x].mtl_s == new_d[x].mtl_s and all(
+            np.array_equal(oldArr.reshape(newArr.shape), newArr)
+            for oldArr, newArr in zip( old_d[x].getTriangleArrays(), new_d[x].getTriangleArrays() )
+        )
+        for x in old_d
+    )
+    oldBytes_i = sum( sum( y.nbytes for y in x.getTriangleArrays() ) for x in old_d.values() )
+    newBytes_i = sum(
+        x.vertexNdarray.nbytes + x.textureCoordNdarray.nbytes + x.normalNdarray.nbytes + x.indexNdarray.nbytes
+        for x in new_d.values()
+    )
+    print( "{} renderers, {} vertices -> {} vertices and {} indices, {:.1f} KB -> {:.1f} KB, same results: {}".format(
+        len(new_d), sum( x.vertexNumber_i for x in old_d.values() ), sum( x.vertexNumber_i for x in new_d.values() ),
+        sum( x.indexNdarray.size for x in new_d.values() ), oldBytes_i / 1024, newBytes_i / 1024, same_b
+    ) )
+
+    st = perf_counter()
+    chunkTimes_l = []
+    chunked_d = {}
+    for renderers_d in parseObjInChunks(objFileDir_s):
+        chunkTimes_l.append( perf_counter() - st )
+        chunked_d.update(renderers_d)
+    same_b = list(chunked_d) == list(new_d) and all(
+        all( np.array_equal(a, b) for a, b in zip( new_d[x].getTriangleArrays(), chunked_d[x].getTriangleArrays() ) )
+        for x in new_d
+    )
+    print( "parseObjInChunks: {} chunks, first after {:.4f} sec, last after {:.4f} sec, same results: {}".format(
+        len(chunkTimes_l), chunkTimes_l[0] if chunkTimes_l else 0.0, chunkTimes_l[-1] if chunkTimes_l else 0.0, same_b
+    ) )
 
 
 if __name__ == '__main__':
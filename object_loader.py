@@ -1,51 +1,114 @@
-from queue import Empty
-from multiprocessing import Process, Queue
+import os
+import shutil
+import tempfile
+from time import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
 
 import obj_parse as op
 import blueprints as bp
+import collide as co
+from mesh_cache import MeshCache
+from asset_pool import JobPool, TaskResult
+
+
+class ObjectLoader:
+    """
+    Job of AssetPool which parses a model that is not in mesh cache and stores it to it.
+    Models in mesh cache are loaded by ObjectManager itself, which never sends them here.
+
+    v, vt and vn lines are parsed on a worker first, and then objects of the model are parsed in chunks on every worker.
+    The v, vt and vn pools go to chunks through .npy files in a temporary folder, which are removed when the model is done.
+    Each chunk is sent as soon as it is parsed, as (blueprint, False), so their order is not that of the file.
+    When the whole model is sent, (blueprint without renderers, True) follows. It also follows when the model fails.
+    With meshCollision_b, the collision tree is built on a worker from the stored model, and the last blueprint has it.
+    """
+    def __init__(self, objName_s:str, objFileDir_s:str, mtlFileDir_s:str, key_s:Optional[str], meshCache:MeshCache,
+                 meshCollision_b:bool=False):
+        self.objName_s = objName_s
+        self.objFileDir_s = objFileDir_s
+        self.mtlFileDir_s = mtlFileDir_s
+        self.key_s = key_s
+        self.meshCache = meshCache
+        self.meshCollision_b = bool(meshCollision_b)
+
+        self.__pool = None
+        self.__send = None
+        self.__startTime_f = None
+
+        self.__prepareResult = None
+        self.__parsedMtl_d = None
+        self.__poolDir_s = None
+        self.__chunkResults_l = []  # TaskResult of chunks that are not sent yet.
+        self.__parsedObj_d = {}
+        self.__collisionResult = None
+        self.__finished_b = False
+
+    def start(self, pool:JobPool, send) -> None:
+        self.__pool = pool
+        self.__send = send
+        self.__startTime_f = time()
+        self.__prepareResult = pool.apply_async( _prepareModel, (self.objFileDir_s, self.mtlFileDir_s, pool.workerCount_i) )
+
+    def poll(self) -> None:
+        if self.__finished_b:  # Chunks which were still parsing when another one failed.
+            return
+        elif self.__collisionResult is not None:
+            self.__finish( _takeCollisionMesh(self.__collisionResult, self.objName_s) )
+            return
 
-
-class ObjectLoader(Process):
-    def __init__(self, toMainQueue:Queue, toProcQueue:Queue):
-        super().__init__()
-
-        self.toMainQueue = toMainQueue
-        self.toProcQueue = toProcQueue
-
-        self.run_b = True
-
-    def run(self):
-        while self.run_b:
-            try:
-                objName_s, objFileDir_s, mtlFileDir_s = self.toProcQueue.get_nowait()
-            except Empty:
-                pass
-            else:
-                self.__jobForOneObj( objName_s, objFileDir_s, mtlFileDir_s )
-
-    def terminate(self):
-        self.run_b = False
         try:
-            super().terminate()
-        except AttributeError:
-            pass
-
-        print("Thread 'ObjectLoader' terminated")
-
-    def __jobForOneObj(self, objName_s, objFileDir_s, mtlFileDir_s) -> None:
-        objBprint = self.__assembleObject(objName_s, objFileDir_s, mtlFileDir_s)
-        self.toMainQueue.put(objBprint)
+            if self.__parsedMtl_d is None:
+                self.__parsedMtl_d, self.__poolDir_s, poolFileDirs_t, chunkJobs_l = self.__prepareResult.get()
+                self.__chunkResults_l = [ self.__pool.apply_async(_parseChunk, (x, poolFileDirs_t)) for x in chunkJobs_l ]
+            else:
+                self.__sendParsedChunks()
+        except Exception as e:
+            print( "(Error) Failed to load model '{}': {}".format(self.objFileDir_s, e) )
+            self.__finish(None)
+            return
+
+        if not self.__chunkResults_l:
+            self.meshCache.store(self.objFileDir_s, self.key_s, self.__parsedObj_d, self.__parsedMtl_d)
+            print( "Model loaded: '{}' ({:.4f} sec)".format(self.objName_s, time() - self.__startTime_f) )
+            if self.meshCollision_b:
+                self.__removePools()
+                self.__collisionResult = self.__pool.apply_async( self.meshCache.loadCollisionMesh, (self.objFileDir_s, self.mtlFileDir_s) )
+            else:
+                self.__finish(None)
+
+    def __finish(self, collisionMesh:Optional[co.TriangleBvh]) -> None:
+        self.__finished_b = True
+        self.__removePools()
+
+        objBprint = self.assembleObject(self.objName_s, {}, {})
+        objBprint.collisionMesh = collisionMesh
+        self.__send( (objBprint, True) )
+
+    def __removePools(self) -> None:
+        if self.__poolDir_s is not None:
+            shutil.rmtree(self.__poolDir_s, ignore_errors=True)
+            self.__poolDir_s = None
+
+    def __sendParsedChunks(self) -> None:
+        for result in [ x for x in self.__chunkResults_l if x.ready() ]:
+            self.__chunkResults_l.remove(result)
+            renderers_d = result.get()
+            for name_s in renderers_d:
+                if name_s in self.__parsedObj_d:
+                    raise FileExistsError( "There are multiple objects named '{}' in '{}'".format(name_s, self.objFileDir_s) )
+            self.__parsedObj_d.update(renderers_d)
+            self.__send( (self.assembleObject(self.objName_s, renderers_d, self.__parsedMtl_d), False) )
 
     @classmethod
-    def __assembleObject(cls, objName_s, objFileDir_s, mtlFileDir_s) -> bp.ObjectDefineBlueprint:
+    def assembleObject(cls, objName_s:str, parsedObj_d:Dict[str, op.OneRenderer],
+                       parsedMtl_d:Dict[str, op.OneMaterial]) -> bp.ObjectDefineBlueprint:
         objBprint = bp.ObjectDefineBlueprint()
         objBprint.name_s = objName_s
         objBprint.static_b = False
         objBprint.initPos_t = (0.0, 0.0, 0.0)
 
-        parsedObj_d = op.parseObj(objFileDir_s)
-        parsedMtl_d = op.parseMtl(mtlFileDir_s)
-
         for renderer_s in parsedObj_d.keys():
             oneRenderer = parsedObj_d[renderer_s]
             oneMaterial = parsedMtl_d[ oneRenderer.mtl_s ]
@@ -71,6 +134,8 @@ class ObjectLoader(Process):
         renBprint.vertexNdarray = oneRenderer.vertexNdarray
         renBprint.texCoordNdarray = oneRenderer.textureCoordNdarray
         renBprint.normalNdarray = oneRenderer.normalNdarray
+        renBprint.indexNdarray = oneRenderer.indexNdarray
+        renBprint.lodIndexNdarrays_l = oneRenderer.lodIndexNdarrays_l
 
         cls.checkRendererAab(renBprint)
 
@@ -111,3 +176,63 @@ class ObjectLoader(Process):
             raise ValueError
         elif renBprint.normalNdarray is None:
             raise ValueError
+
+
+class CollisionMeshLoader:
+    """
+    Job of AssetPool which loads the collision tree of a model whose template is already made, from mesh cache
+    or by building it on a worker. Sends (blueprint without renderers, True) with the tree, like the last piece of ObjectLoader.
+    """
+    def __init__(self, objName_s:str, objFileDir_s:str, mtlFileDir_s:str, meshCache:MeshCache):
+        self.objName_s = objName_s
+        self.objFileDir_s = objFileDir_s
+        self.mtlFileDir_s = mtlFileDir_s
+        self.meshCache = meshCache
+
+        self.__send = None
+        self.__result = None
+
+    def start(self, pool:JobPool, send) -> None:
+        self.__send = send
+        self.__result = pool.apply_async( self.meshCache.loadCollisionMesh, (self.objFileDir_s, self.mtlFileDir_s) )
+
+    def poll(self) -> None:
+        objBprint = ObjectLoader.assembleObject(self.objName_s, {}, {})
+        objBprint.collisionMesh = _takeCollisionMesh(self.__result, self.objName_s)
+        self.__send( (objBprint, True) )
+
+
+def _takeCollisionMesh(result:TaskResult, objName_s:str) -> co.TriangleBvh:
+    """
+    Returns the tree of a finished task, or an empty one if it failed so that it is not tried again.
+    """
+    try:
+        return result.get()
+    except Exception as e:
+        print( "(Error) Failed to load a collision mesh '{}': {}".format(objName_s, e) )
+        return co.TriangleBvh.build( np.zeros((0, 3, 3), np.float32) )
+
+
+def _prepareModel(objFileDir_s:str, mtlFileDir_s:str, workers_i:int) -> tuple:
+    """
+    Returns materials, a temporary folder with v, vt and vn pools, file names of the pools, and jobs of chunks.
+    Chunks only carry the file names, instead of each having a copy of the pools sent through the router.
+    """
+    parsedMtl_d = op.parseMtl(mtlFileDir_s)
+    pools_t, chunkJobs_l = op.prepareObjChunks(objFileDir_s, workers_i, makeLods_b=True)
+
+    poolDir_s = tempfile.mkdtemp(prefix="obj_pools_")
+    try:
+        poolFileDirs_t = tuple( os.path.join(poolDir_s, "{}.npy".format(x)) for x in range(len(pools_t)) )
+        for fileDir_s, pool_arr in zip(poolFileDirs_t, pools_t):
+            np.save(fileDir_s, pool_arr)
+    except:
+        shutil.rmtree(poolDir_s, ignore_errors=True)
+        raise
+
+    return parsedMtl_d, poolDir_s, poolFileDirs_t, chunkJobs_l
+
+
+def _parseChunk(job_t:tuple, poolFileDirs_t:Tuple[str, ...]) -> Dict[str, op.OneRenderer]:
+    # Pools are memory mapped, so workers share the pages of the files instead of reading them each.
+    return op.parseObjChunk( job_t, tuple(np.load(x, mmap_mode='r') for x in poolFileDirs_t) )
@@ -1,33 +1,43 @@
-import os
-from multiprocessing import Queue
 from typing import List, Tuple, Optional
-from queue import Empty
 
-import OpenGL.GL as gl
+import numpy as np
+from lazy_gl import gl
 
 import data_struct as ds
 from buffer_manager import BufferManager
 from texture_manager import TextureManager
 from blueprints import ObjectDefineBlueprint, RendererBlueprint, ObjectObjStaticBlueprint
-from object_loader import ObjectLoader
-import const
+from object_loader import ObjectLoader, CollisionMeshLoader
+from mesh_cache import MeshCache
+from asset_pool import AssetPool, JOB_MODEL_i
+import obj_parse as op
+import level_loader as ll
+import collide as co
 
 
 class ObjectManager:
-    def __init__(self):
+    def __init__(self, assetPool:Optional[AssetPool]=None):
         self.console = None
 
+        # Without one given, this has its own pool, which runProcesses starts and terminate stops.
+        self.__ownsAssetPool_b = assetPool is None
+        self.assetPool = AssetPool() if assetPool is None else assetPool
+
         self.__objTemplatesWatingVertices_l = []
         self.__objTemplatesWatingTextrue_l = []
+        self.__renderersWaitingTexture_l = []  # (ObjectTemplate, Renderer), added to the template once its texture is loaded.
+        self.__templatesBeingLoaded_d = {}  # Models that ObjectLoader or CollisionMeshLoader is still sending, None if deleted in the meantime.
 
         self.__objectTemplates_d = {}
+        self.__retiredTemplateCount_i = 0
 
         self.bufferManager = BufferManager()
-        self.texMan = TextureManager()
+        self.texMan = TextureManager(self.assetPool)
+
+        self.__unitCubeVao_i = None  # Shared by every BoxRenderer, made when the first one is.
+        self.__unitCubeIndexCount_i = None
 
-        self.__toHereQueue = Queue()
-        self.__toProcessQueue = Queue()
-        self.objectLoader = ObjectLoader(self.__toHereQueue, self.__toProcessQueue)
+        self.meshCache = MeshCache()
         self.__haveThingsToGetFromProcess_i = 0
 
     def update(self) -> None:
@@ -37,18 +47,12 @@ class ObjectManager:
             self.__popObjectBlueprintFromProcess()
 
     def terminate(self):
-        try:
-            self.objectLoader.terminate()
-        except AttributeError:
-            pass
-
-        try:
-            self.texMan.terminate()
-        except AssertionError:
-            pass
+        if self.__ownsAssetPool_b:
+            self.assetPool.terminate()
 
     def runProcesses(self):
-        self.objectLoader.start()
+        if self.__ownsAssetPool_b:
+            self.assetPool.start()
 
     def requestObject(self, objInitInfo:"ObjectInitInfo") -> Optional[ds.Object]:
         self.update()
@@ -58,10 +62,16 @@ class ObjectManager:
                 return None
             else:
                 objTemplate = self.__objectTemplates_d[objInitInfo.objTemplateName_s]
+                if objInitInfo.meshCollision_b and objTemplate.collisionMesh is None:
+                    # Collision trees come from workers, and objects wait for them like they do for their template.
+                    self.__requestCollisionMesh(objTemplate)
+                    if objTemplate.collisionMesh is None:
+                        return None
                 obj = objTemplate.makeObject(
                     objInitInfo.name_s, objInitInfo.level, objInitInfo.initPos_t, objInitInfo.static_b,
-                    objInitInfo.colliders_l, objInitInfo.colGroupTargets_l
+                    objInitInfo.colliders_l, objInitInfo.colGroupTargets_l, objInitInfo.meshCollision_b
                 )
+                obj.sourceKey_t = objInitInfo.sourceKey_t
                 self.console.appendLogs("Instancing object: {} ({})".format(objTemplate.templateName_s, objTemplate.refCount_i))
                 return obj
         else:
@@ -77,18 +87,52 @@ class ObjectManager:
             self.console.appendLogs("Deleted an object instance: '{}' ({})".format(objTemplate.templateName_s, objTemplate.refCount_i))
 
             if objTemplate.refCount_i <= 0:
-                trashes_l = objTemplate.terminate()
-                for trash_t in trashes_l:
-                    self.bufferManager.dumpVertexArray(trash_t[0])
-                    self.bufferManager.dumpBuffer(trash_t[1])
-                    self.bufferManager.dumpBuffer(trash_t[2])
-                    self.bufferManager.dumpBuffer(trash_t[3])
-                    self.texMan.dump(trash_t[4])
+                for trash_t in objTemplate.terminate():
+                    self.__dumpRendererTrash(trash_t)
+                self.__dropRenderersOfDeletedTemplate(objTemplate)
 
                 del self.__objectTemplates_d[objTempName_s], objTemplate
                 self.console.appendLogs( "Deleted ObjectTemplate: '{}'".format(tempName_s) )
 
-    def giveObjectDefineBlueprint(self, objBprint:ObjectDefineBlueprint) -> None:
+    def __dumpRendererTrash(self, trash_t:Tuple[int, int, int, int, int, Optional[int]]) -> None:
+        if trash_t[0] is not None:  # BoxRenderer doesn't own its buffers.
+            self.bufferManager.dumpVertexArray(trash_t[0])
+            self.bufferManager.dumpBuffer(trash_t[1])
+            self.bufferManager.dumpBuffer(trash_t[2])
+            self.bufferManager.dumpBuffer(trash_t[3])
+            if trash_t[5] is not None:
+                self.bufferManager.dumpBuffer(trash_t[5])
+        self.texMan.dump(trash_t[4])
+
+    def __dropRenderersOfDeletedTemplate(self, objTemplate:"ObjectTemplate") -> None:
+        for x in range(len(self.__renderersWaitingTexture_l) - 1, -1, -1):
+            if self.__renderersWaitingTexture_l[x][0] is objTemplate:
+                self.__dumpRendererTrash( self.__renderersWaitingTexture_l[x][1].terminate() )
+                del self.__renderersWaitingTexture_l[x]
+
+        for name_s, loadingTemplate in self.__templatesBeingLoaded_d.items():
+            if loadingTemplate is objTemplate:
+                self.__templatesBeingLoaded_d[name_s] = None
+
+    def retireObjectTemplate(self, objTempName_s:str) -> Optional[str]:
+        """
+        Moves a template to a new name, so that a changed define can take its name while instances of the old one are alive.
+        Returns the new name, or None if there is no ready template with the name.
+        """
+        objTemplate = self.__objectTemplates_d.get(objTempName_s)
+        if objTemplate is None:
+            return None
+
+        self.__retiredTemplateCount_i += 1
+        newName_s = "{}#{}".format(objTempName_s, self.__retiredTemplateCount_i)
+        del self.__objectTemplates_d[objTempName_s]
+        objTemplate.templateName_s = newName_s
+        self.__objectTemplates_d[newName_s] = objTemplate
+
+        self.console.appendLogs( "Retired ObjectTemplate: '{}' -> '{}'".format(objTempName_s, newName_s) )
+        return newName_s
+
+    def giveObjectDefineBlueprint(self, objBprint:ObjectDefineBlueprint) -> "ObjectTemplate":
         if objBprint.name_s in self.__objectTemplates_d.keys():
             if self.__objectTemplates_d[objBprint.name_s] is not None:
                 raise FileExistsError(objBprint.name_s)
@@ -102,18 +146,49 @@ class ObjectManager:
         self.console.appendLogs("Created an object template: '{}'".format(objTemp.templateName_s))
 
         self.__objTemplatesWatingTextrue_l.append(objTemp)
+        return objTemp
 
     def giveObjectObjStaticBlueprint(self, objBprint:ObjectObjStaticBlueprint) -> None:
         if objBprint.objFileName_s in self.__objectTemplates_d.keys():
             return
 
         self.__objectTemplates_d[objBprint.objFileName_s] = None
-        a = self.__findObjMtlDir(objBprint.objFileName_s)
+        a = op.findObjMtlDir(objBprint.objFileName_s)
         if a is None:
             self.console.appendLogs( "Failed to obj file: '{}'".format(objBprint.objFileName_s) )
-        else:
-            self.__toProcessQueue.put( (objBprint.objFileName_s, *a) )
+            return
+
+        # Cached models are memory mapped, so their arrays are read only while being uploaded to GPU.
+        meshes_t, key_s = self.meshCache.lookUp(*a)
+        if meshes_t is None:
+            self.assetPool.submit( JOB_MODEL_i, ObjectLoader(
+                objBprint.objFileName_s, *a, key_s, self.meshCache, objBprint.meshCollision_b
+            ) )
             self.__haveThingsToGetFromProcess_i += 1
+        else:
+            self.console.appendLogs( "Loaded a model from mesh cache: '{}'".format(objBprint.objFileName_s) )
+            objTemplate = self.giveObjectDefineBlueprint( ObjectLoader.assembleObject(objBprint.objFileName_s, *meshes_t) )
+            if objBprint.meshCollision_b:
+                self.__requestCollisionMesh(objTemplate)
+
+    def __requestCollisionMesh(self, objTemplate:"ObjectTemplate") -> None:
+        """
+        Loads the collision tree of a template of object::objstatic on a worker. The tree comes like the last piece of
+        the model, so the template is being loaded until then. If the model is gone, the template gets an empty tree.
+        """
+        name_s = objTemplate.templateName_s
+        if name_s in self.__templatesBeingLoaded_d:
+            return
+
+        a = op.findObjMtlDir(name_s)
+        if a is None:
+            self.console.appendLogs( "Failed to load a collision mesh: '{}', needs both .obj and .mtl".format(name_s) )
+            objTemplate.collisionMesh = co.TriangleBvh.build( np.zeros((0, 3, 3), np.float32) )
+            return
+
+        self.__templatesBeingLoaded_d[name_s] = objTemplate
+        self.assetPool.submit( JOB_MODEL_i, CollisionMeshLoader(name_s, *a, self.meshCache) )
+        self.__haveThingsToGetFromProcess_i += 1
 
     def __fillObjectTemplateWithTexture(self):
         for x in range(len(self.__objTemplatesWatingTextrue_l) - 1, -1, -1):
@@ -137,15 +212,60 @@ class ObjectManager:
                 self.__objectTemplates_d[objTemplate.templateName_s] = objTemplate
                 del self.__objTemplatesWatingTextrue_l[x]
 
+        # Renderers which came after their template was made. Objects share renderers_l of their template,
+        # so appending to it shows them on objects that are already instanced.
+        for x in range(len(self.__renderersWaitingTexture_l) - 1, -1, -1):
+            objTemplate, aRenderer = self.__renderersWaitingTexture_l[x]
+            result = self.texMan.request(aRenderer.diffuseMapName_s)
+            if result is not None:
+                aRenderer.diffuseMap_i = result
+                objTemplate.renderers_l.append(aRenderer)
+                del self.__renderersWaitingTexture_l[x]
+
     def __popObjectBlueprintFromProcess(self):
-        try:
-            objBprint = self.__toHereQueue.get_nowait()
-        except Empty:
+        """
+        ObjectLoader sends a model in pieces, as (blueprint, last_b). The first piece makes the template
+        and the rest add renderers to it. The last one has no renderers and only tells the model is done,
+        with the collision tree if it was asked for. CollisionMeshLoader sends only the last piece.
+        """
+        result_t = self.assetPool.popResult(JOB_MODEL_i)
+        if result_t is None:
             return None
+        objBprint, last_b = result_t
+
+        name_s = objBprint.name_s
+        if name_s not in self.__templatesBeingLoaded_d:
+            objTemplate = self.giveObjectDefineBlueprint(objBprint)
+            if not last_b:
+                self.__templatesBeingLoaded_d[name_s] = objTemplate
         else:
-            self.giveObjectDefineBlueprint(objBprint)
+            objTemplate = self.__templatesBeingLoaded_d[name_s]
+            if objTemplate is not None:
+                for renBprint in objBprint.rendererBlueprints_l:
+                    self.__renderersWaitingTexture_l.append( (objTemplate, self.__makeRendererFromBprint(renBprint)) )
+            if last_b:
+                del self.__templatesBeingLoaded_d[name_s]
+
+        if last_b:
+            self.__haveThingsToGetFromProcess_i -= 1
+            if objTemplate is not None:
+                self.console.appendLogs( "Finished loading a model: '{}' ({} renderers)".format(
+                    name_s, len(objTemplate.renderers_l) + sum( x[0] is objTemplate for x in self.__renderersWaitingTexture_l )
+                ) )
+            if objTemplate is not None and objBprint.collisionMesh is not None:
+                objTemplate.collisionMesh = objBprint.collisionMesh
+                self.console.appendLogs( "Loaded a collision mesh: '{}' ({} triangles)".format(
+                    name_s, len(objBprint.collisionMesh.triangles_arr)
+                ) )
 
     def __makeRendererFromBprint(self, renBprint:RendererBlueprint) -> ds.Renderer:
+        if renBprint.boxMin_t is not None:
+            newRenderer = ds.BoxRenderer(renBprint.name_s, renBprint.initPos_t, renBprint.static_b, renBprint.boxMin_t, renBprint.boxMax_t)
+            newRenderer.vao_i, newRenderer.indexCount_i = self.__getUnitCube()
+            self.__setRendererMaterial(newRenderer, renBprint)
+            newRenderer.vramUsage_i = 0
+            return newRenderer
+
         newRenderer = ds.Renderer(renBprint.name_s, renBprint.initPos_t, renBprint.static_b);
         vramUsage_i = 0;
 
@@ -191,45 +311,79 @@ class ObjectManager:
         gl.glVertexAttribPointer(2, 3, gl.GL_FLOAT, gl.GL_FALSE, 0, None);  # Defines vertex attributes. What are those?
         gl.glEnableVertexAttribArray(2);
 
+        ######## Index buffer ########
+
+        if renBprint.indexNdarray is not None:
+            newRenderer.indexCount_i = renBprint.indexNdarray.size
+
+            # Simplified meshes go after the full one in the same buffer, and are drawn with offsets.
+            index_arr = renBprint.indexNdarray
+            if renBprint.lodIndexNdarrays_l:
+                index_arr = np.concatenate( [index_arr] + list(renBprint.lodIndexNdarrays_l) ).astype(np.uint32, copy=False)
+                offset_i = renBprint.indexNdarray.nbytes
+                for lodIndex_arr in renBprint.lodIndexNdarrays_l:
+                    newRenderer.lodIndexRanges_l.append( (offset_i, lodIndex_arr.size) )
+                    offset_i += lodIndex_arr.nbytes
+
+                vertex_arr = renBprint.vertexNdarray.reshape(-1, 3)
+                boundsMin_arr, boundsMax_arr = vertex_arr.min(axis=0), vertex_arr.max(axis=0)
+                newRenderer.lodCenter_t = tuple( ((boundsMin_arr + boundsMax_arr) / 2).tolist() )
+                newRenderer.lodRadius_f = float( np.linalg.norm(boundsMax_arr - boundsMin_arr) ) / 2
+            vramUsage_i += index_arr.nbytes
+
+            # Element array buffer binding is a part of VAO state.
+            newRenderer.indexArrayBuffer_i = self.bufferManager.requestBuffer()
+            gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, newRenderer.indexArrayBuffer_i)
+            gl.glBufferData(gl.GL_ELEMENT_ARRAY_BUFFER, index_arr.nbytes, index_arr, gl.GL_STATIC_DRAW)
+
         ########  ########
 
+        self.__setRendererMaterial(newRenderer, renBprint)
+        newRenderer.vramUsage_i = vramUsage_i;
+
+        return newRenderer;
+
+    @staticmethod
+    def __setRendererMaterial(newRenderer:ds.Renderer, renBprint:RendererBlueprint) -> None:
         newRenderer.diffuseMapName_s = renBprint.textureDir_s;
 
         newRenderer.textureVerNum_f = renBprint.textureVerNum_f;
         newRenderer.textureHorNum_f = renBprint.textureHorNum_f;
         newRenderer.shininess_f = renBprint.shininess_f;
         newRenderer.specularStrength_f = renBprint.specularStrength_f;
-        newRenderer.vramUsage_i = vramUsage_i;
 
-        return newRenderer;
+    def __getUnitCube(self) -> Tuple[int, int]:
+        """
+        Returns VAO and index count of the unit cube, whose index buffer is bound to the VAO.
+        """
+        if self.__unitCubeVao_i is not None:
+            return self.__unitCubeVao_i, self.__unitCubeIndexCount_i
 
-    @staticmethod
-    def __findObjMtlDir(objFileName_s:str) -> Optional[ Tuple[str, str] ]:
-        objFileDir_s = ""
-        mtlFileDir_s = ""
-
-        for folderDir_s, _, files_l in os.walk(const.MODEL_DIR_s):
-            for file_s in files_l:
-                if objFileDir_s and mtlFileDir_s:
-                    break
-
-                if file_s == objFileName_s + ".obj":
-                    if objFileDir_s:
-                        raise FileExistsError("There are multiple '{}' files.".format(objFileName_s))
-                    else:
-                        objFileDir_s = "{}/{}".format(folderDir_s, file_s)
-                        continue
-                elif file_s == objFileName_s + ".mtl":
-                    if mtlFileDir_s:
-                        raise FileExistsError("There are multiple '{}' files.".format(mtlFileDir_s))
-                    else:
-                        mtlFileDir_s = "{}/{}".format(folderDir_s, file_s)
-                        continue
+        vertex_arr, texCoord_arr, normal_arr, index_arr = ll.makeUnitCubeNdArrays()
 
-        if objFileDir_s and mtlFileDir_s:
-            return objFileDir_s, mtlFileDir_s
-        else:
-            return None
+        vao_i = self.bufferManager.requestVertexArray()
+        gl.glBindVertexArray(vao_i)
+
+        for location_i, size_i, data_arr in ( (0, 3, vertex_arr), (1, 2, texCoord_arr), (2, 3, normal_arr) ):
+            buffer_i = self.bufferManager.requestBuffer()
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buffer_i)
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, data_arr.nbytes, data_arr, gl.GL_STATIC_DRAW)
+            gl.glVertexAttribPointer(location_i, size_i, gl.GL_FLOAT, gl.GL_FALSE, 0, None)
+            gl.glEnableVertexAttribArray(location_i)
+
+        # Element array buffer binding is a part of VAO state.
+        indexBuffer_i = self.bufferManager.requestBuffer()
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, indexBuffer_i)
+        gl.glBufferData(gl.GL_ELEMENT_ARRAY_BUFFER, index_arr.nbytes, index_arr, gl.GL_STATIC_DRAW)
+
+        gl.glBindVertexArray(0)
+
+        self.__unitCubeVao_i = vao_i
+        self.__unitCubeIndexCount_i = index_arr.size
+        self.console.appendLogs( "Created the shared unit cube (vram: {:.2f} KB)".format(
+            ( vertex_arr.nbytes + texCoord_arr.nbytes + normal_arr.nbytes + index_arr.nbytes ) / 1024.0
+        ) )
+        return self.__unitCubeVao_i, self.__unitCubeIndexCount_i
 
 
 class ObjectTemplate:
@@ -244,10 +398,13 @@ class ObjectTemplate:
 
         self.boundingBox = boundingBox
 
+        self.collisionMesh = None  # co.TriangleBvh of the model, loaded on a worker for objects with meshcollision(true).
+
     def __del__(self):
         print( "Deleted ObjectTemplate: '{}'".format(self.templateName_s) )
 
-    def makeObject(self, name_s, parent, initPos_t, static_b:bool, colliders_l, colGroupTargets_l) -> ds.Object:
+    def makeObject(self, name_s, parent, initPos_t, static_b:bool, colliders_l, colGroupTargets_l,
+                   meshCollision_b:bool=False) -> ds.Object:
         self.refCount_i += 1
         self.usedOnce_b = True
         anObject = ds.Object(name_s, parent, initPos_t, static_b)
@@ -256,10 +413,12 @@ class ObjectTemplate:
         anObject.boundingBox = self.boundingBox
         anObject.objTempName_s = self.templateName_s
         anObject.colGroupTargets_l = colGroupTargets_l
+        if meshCollision_b:
+            anObject.collisionMesh = self.collisionMesh
 
         return anObject
 
-    def terminate(self) -> List[ Tuple[int, int, int, int, int] ]:
+    def terminate(self) -> List[ Tuple[int, int, int, int, int, int] ]:
         rendererTrashes_l = []
         for renderer in self.renderers_l:
             rendererTrashes_l.append( renderer.terminate() )
@@ -267,7 +426,8 @@ class ObjectTemplate:
 
 
 class ObjectInitInfo:
-    def __init__(self, name_s, objTemplateName_s, level, static_b, initPos_t, colGroupTargets_l, colliders_l):
+    def __init__(self, name_s, objTemplateName_s, level, static_b, initPos_t, colGroupTargets_l, colliders_l, sourceKey_t=None,
+                 meshCollision_b:bool=False):
         self.name_s = name_s
         self.objTemplateName_s = objTemplateName_s
         self.level = level
@@ -277,3 +437,6 @@ class ObjectInitInfo:
 
         self.colliders_l = colliders_l
         self.colGroupTargets_l = colGroupTargets_l
+
+        self.sourceKey_t = sourceKey_t
+        self.meshCollision_b = meshCollision_b
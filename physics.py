@@ -1,7 +1,10 @@
-from time import time
+from typing import Tuple, List
 import math
 
+import numpy as np
+
 from actor import Actor
+import collide as co
 import mmath as mm
 
 
@@ -9,8 +12,9 @@ class PhysicsActor(Actor):
     def __init__( self, name_s:str, initPos_t:tuple=(0.0, 0.0, 0.0) ):
         super().__init__( name_s, None, initPos_t, False )
 
-        self.__lastUpdateTime_f = time()
         self.__lastApplyedPos_t = self.getPosXYZ()
+        self.__prevStepPos_t = self.getPosXYZ()  # Position before the last step, for render interpolation.
+        self.__realPos_t = None  # Position backed up while rendering with interpolated one.
 
         self.__standingOnGroud_b = False
 
@@ -25,8 +29,13 @@ class PhysicsActor(Actor):
 
         self.__movedABit_b = False
 
-    def applyPhysics(self, freeze_b:bool) -> None:
-        timeDelta_f = self.__precalculateConditions()
+    def applyPhysics(self, freeze_b:bool, timeDelta_f:float) -> None:
+        """
+        Advances one simulation step. timeDelta_f should be the fixed step of FixedStepClock.
+        """
+        self.__prevStepPos_t = self.getPosXYZ()
+
+        self.__precalculateConditions(timeDelta_f)
         if freeze_b:
             return
 
@@ -60,11 +69,7 @@ class PhysicsActor(Actor):
 
 
 
-    def __precalculateConditions(self) -> float:
-        thisTime_f = time()
-        timeDelta_f = thisTime_f - self.__lastUpdateTime_f
-        self.__lastUpdateTime_f = thisTime_f
-
+    def __precalculateConditions(self, timeDelta_f:float) -> None:
         if self.getPosY() > self.__lastApplyedPos_t[1]:  # Stand on the groud
             self.__standingOnGroud_b = True
         else:
@@ -81,10 +86,340 @@ class PhysicsActor(Actor):
             if self.__gravity_f < -100.0:
                 self.__gravity_f = -100.0
 
-        return timeDelta_f
-
     def startJumping(self) -> None:
         if self.__standingOnGroud_b:
             self.__lastApplyedPos_t = self.getPosXYZ()
             self.__standingOnGroud_b = False
             self.__jumpGravity_f = 8.0
+
+    ######## Render interpolation ########
+
+    def getInterpolatedXYZ(self, alpha_f:float) -> Tuple[float, float, float]:
+        """
+        Position between the previous step (alpha 0.0) and the current one (alpha 1.0).
+        """
+        xPrev_f, yPrev_f, zPrev_f = self.__prevStepPos_t
+        x, y, z = self.getPosXYZ()
+        return xPrev_f + (x - xPrev_f)*alpha_f, yPrev_f + (y - yPrev_f)*alpha_f, zPrev_f + (z - zPrev_f)*alpha_f
+
+    def beginInterpolation(self, alpha_f:float) -> None:
+        """
+        Moves to the interpolated position for rendering. Must be followed by endInterpolation().
+        """
+        self.__realPos_t = self.getPosXYZ()
+        self.setPosXYZ( *self.getInterpolatedXYZ(alpha_f) )
+
+    def endInterpolation(self) -> None:
+        self.setPosXYZ(*self.__realPos_t)
+        self.__realPos_t = None
+
+
+class FixedStepClock:
+    """
+    Accumulates frame time and tells how many fixed steps the simulation should advance.
+    When a frame takes too long, steps over maxStepsPerFrame_i are dropped so the game slows down instead of freezing.
+    """
+    def __init__(self, stepsPerSec_i:int=120, maxStepsPerFrame_i:int=10):
+        self.stepDelta_f = 1.0 / stepsPerSec_i
+        self.maxStepsPerFrame_i = int(maxStepsPerFrame_i)
+
+        self.tickCount_i = 0
+        self.__accumulator_f = 0.0
+
+    def advance(self, frameDelta_f:float) -> int:
+        """
+        Returns the number of steps to run for this frame.
+        """
+        if frameDelta_f > 0.0:
+            self.__accumulator_f += frameDelta_f
+
+        steps_i = int(self.__accumulator_f / self.stepDelta_f)
+        if steps_i > self.maxStepsPerFrame_i:
+            steps_i = self.maxStepsPerFrame_i
+            self.__accumulator_f = 0.0
+        else:
+            self.__accumulator_f -= steps_i * self.stepDelta_f
+
+        self.tickCount_i += steps_i
+        return steps_i
+
+    def getAlpha(self) -> float:
+        """
+        How far the render time is between the last two steps, from 0.0 to 1.0.
+        """
+        return min(self.__accumulator_f / self.stepDelta_f, 1.0)
+
+
+class PhysicsWorld:
+    """
+    Moves every dynamic body of loaded levels under gravity, all in one vectorized step.
+    A dynamic body is a non-static Object that has a blocking collider with weight over 0.
+    Collisions are resolved against the level's collider broadphase, the same way the player is pushed back.
+
+    pos_arr is where bodies are. Objects are moved only when their row changes, and anything else that moves them
+    is told by Object.onTransformChanged, so bodies are never read back every step.
+    """
+    gravity_f = -20.0
+    maxFallSpeed_f = 100.0
+
+    # Bodies that barely move for this many steps fall asleep until something moves them.
+    sleepSteps_i = 30
+    sleepDistance_f = 1e-4
+
+    # Pairs are found with boxes this much bigger, since bodies keep moving while pairs are resolved.
+    contactMargin_f = 0.1
+
+    def __init__(self):
+        self.bodies_l = []  # Objects
+        self.pos_arr = np.zeros( (0, 3), np.float64 )
+        self.prevPos_arr = np.zeros( (0, 3), np.float64 )  # pos_arr before the last step, for render interpolation.
+        self.vel_arr = np.zeros( (0, 3), np.float64 )
+        self.gravityScale_arr = np.zeros( 0, np.float64 )
+        self.sleeping_arr = np.zeros( 0, np.bool_ )
+        self.__stillSteps_arr = np.zeros( 0, np.int64 )
+        self.__levelIds_arr = np.zeros( 0, np.int64 )  # id(Level) of each body.
+
+        self.__bodyIndices_d = {}  # id(Object) -> index of bodies_l
+        self.__levels_d = {}  # id(Level) -> Level, of bodies.
+        self.__levelVersions_d = {}  # id(Level) -> Level.objectListVersion_i when bodies were synced last time.
+
+        self.__movedBodies_d = {}  # id(Object) -> Object, whose position is newer than its row of pos_arr.
+        self.__ignoreMoves_b = False  # While rows of pos_arr are written to objects.
+        self.__interpolated_arr = None  # Bodies drawn at interpolated positions, between beginInterpolation and endInterpolation.
+
+    def __repr__(self) -> str:
+        return "< {}.PhysicsWorld object at 0x{:0>16X}, bodies: {} >".format(__name__, id(self), len(self.bodies_l))
+
+    @staticmethod
+    def isDynamicBody(anObject:"Object") -> bool:
+        if anObject.getStatic():
+            return False
+        for collider in anObject.colliders_l:
+            _, blocking_b, _ = collider.getTypes()
+            if blocking_b and collider.getWeight() > 0.0:
+                return True
+        else:
+            return False
+
+    def addBody(self, anObject:"Object", gravityScale_f:float=1.0) -> None:
+        if id(anObject) in self.__bodyIndices_d:
+            return
+        level = anObject.getParent()
+        self.__levels_d[id(level)] = level
+
+        self.__bodyIndices_d[id(anObject)] = len(self.bodies_l)
+        self.bodies_l.append(anObject)
+        self.pos_arr = np.vstack( (self.pos_arr, anObject.getPosXYZ()) )
+        self.prevPos_arr = np.vstack( (self.prevPos_arr, anObject.getPosXYZ()) )
+        self.vel_arr = np.vstack( (self.vel_arr, (0.0, 0.0, 0.0)) )
+        self.gravityScale_arr = np.append(self.gravityScale_arr, float(gravityScale_f))
+        self.sleeping_arr = np.append(self.sleeping_arr, False)
+        self.__stillSteps_arr = np.append(self.__stillSteps_arr, 0)
+        self.__levelIds_arr = np.append(self.__levelIds_arr, id(level))
+        anObject.physicsWorld = self
+
+    def removeBody(self, anObject:"Object") -> None:
+        try:
+            index_i = self.__bodyIndices_d.pop(id(anObject))
+        except KeyError:
+            return
+        anObject.physicsWorld = None
+        self.__movedBodies_d.pop(id(anObject), None)
+
+        del self.bodies_l[index_i]
+        self.pos_arr = np.delete(self.pos_arr, index_i, axis=0)
+        self.prevPos_arr = np.delete(self.prevPos_arr, index_i, axis=0)
+        self.vel_arr = np.delete(self.vel_arr, index_i, axis=0)
+        self.gravityScale_arr = np.delete(self.gravityScale_arr, index_i)
+        self.sleeping_arr = np.delete(self.sleeping_arr, index_i)
+        self.__stillSteps_arr = np.delete(self.__stillSteps_arr, index_i)
+        self.__levelIds_arr = np.delete(self.__levelIds_arr, index_i)
+        for x in range(index_i, len(self.bodies_l)):
+            self.__bodyIndices_d[id(self.bodies_l[x])] = x
+
+    def notifyBodyMoved(self, anObject:"Object") -> None:
+        if not self.__ignoreMoves_b:
+            self.__movedBodies_d[id(anObject)] = anObject
+
+    def getVelocity(self, anObject:"Object") -> Tuple[float, float, float]:
+        return tuple( self.vel_arr[self.__bodyIndices_d[id(anObject)]].tolist() )
+
+    def setVelocity(self, anObject:"Object", x:float, y:float, z:float) -> None:
+        index_i = self.__bodyIndices_d[id(anObject)]
+        self.vel_arr[index_i] = (x, y, z)
+        self.__wakeUp(index_i)
+
+    def __wakeUp(self, index) -> None:
+        self.sleeping_arr[index] = False
+        self.__stillSteps_arr[index] = 0
+
+    def syncBodies(self, levels_l:List["Level"]) -> None:
+        """
+        Adds dynamic bodies of newly loaded objects and removes the ones that no longer belong to the given levels.
+        Does nothing if no level has added or deleted objects since the last call.
+        """
+        versions_d = { id(level):level.objectListVersion_i for level in levels_l }
+        if versions_d == self.__levelVersions_d:
+            return
+        self.__levelVersions_d = versions_d
+        self.__levels_d = { id(level):level for level in levels_l }
+
+        alive_d = {}
+        for level in levels_l:
+            for anObject in level.objects_l:
+                if self.isDynamicBody(anObject):
+                    alive_d[id(anObject)] = anObject
+
+        for anObject in list(self.bodies_l):
+            if id(anObject) not in alive_d:
+                self.removeBody(anObject)
+        for anObject in alive_d.values():
+            self.addBody(anObject)
+
+        # What sleeping bodies were lying on may be gone.
+        self.__wakeUp( slice(None) )
+
+    def step(self, timeDelta_f:float) -> None:
+        if not self.bodies_l:
+            return
+
+        self.__takeOutsideMoves()
+        self.prevPos_arr = self.pos_arr.copy()
+
+        awake_arr = np.flatnonzero(~self.sleeping_arr)
+        if not awake_arr.size:
+            return
+
+        vel_arr = self.vel_arr[awake_arr]
+        vel_arr[:, 1] += self.gravity_f * self.gravityScale_arr[awake_arr] * timeDelta_f
+        np.maximum( vel_arr[:, 1], -self.maxFallSpeed_f, out=vel_arr[:, 1] )
+        self.vel_arr[awake_arr] = vel_arr
+        self.__writePositions( awake_arr, self.pos_arr[awake_arr] + vel_arr * timeDelta_f )
+
+        levelIds_arr, groups_arr = np.unique( self.__levelIds_arr[awake_arr], return_inverse=True )
+        for x, levelId_i in enumerate( levelIds_arr.tolist() ):
+            self.__resolveLevel( self.__levels_d[levelId_i], awake_arr[groups_arr.ravel() == x] )
+
+        # Bodies pushed while resolving. Sleeping ones among them wake up.
+        pushed_arr = self.__takeMovedBodies()
+        self.__wakeUp( pushed_arr[ self.sleeping_arr[pushed_arr] ] )
+
+        still_arr = np.all( np.abs(self.pos_arr[awake_arr] - self.prevPos_arr[awake_arr]) < self.sleepDistance_f, axis=1 )
+        stillSteps_arr = np.where(still_arr, self.__stillSteps_arr[awake_arr] + 1, 0)
+        self.__stillSteps_arr[awake_arr] = stillSteps_arr
+        asleep_arr = awake_arr[stillSteps_arr >= self.sleepSteps_i]
+        self.sleeping_arr[asleep_arr] = True
+        self.vel_arr[asleep_arr] = 0.0
+
+    def skipStep(self) -> None:
+        """
+        Called instead of step() while logic is frozen, so bodies are drawn where they are.
+        """
+        self.__takeOutsideMoves()
+        self.prevPos_arr = self.pos_arr.copy()
+
+    def __takeOutsideMoves(self) -> None:
+        # Positions may have been changed by the player, obj_set_pos and so on. Those are not interpolated.
+        moved_arr = self.__takeMovedBodies()
+        self.__wakeUp(moved_arr)
+        self.prevPos_arr[moved_arr] = self.pos_arr[moved_arr]
+
+    def __takeMovedBodies(self) -> np.ndarray:
+        """
+        Copies positions of bodies moved since the last call to pos_arr, and returns indices of those which really moved.
+        """
+        if not self.__movedBodies_d:
+            return np.zeros( 0, np.int64 )
+
+        indices_l = []
+        positions_l = []
+        for anObject in self.__movedBodies_d.values():
+            indices_l.append( self.__bodyIndices_d[id(anObject)] )
+            positions_l.append( anObject.getPosXYZ() )
+        self.__movedBodies_d = {}
+
+        indices_arr = np.array(indices_l, np.int64)
+        pos_arr = np.array(positions_l, np.float64)
+        changed_arr = np.any(pos_arr != self.pos_arr[indices_arr], axis=1)
+        self.pos_arr[indices_arr] = pos_arr
+        return indices_arr[changed_arr]
+
+    def __writePositions(self, indices_arr:np.ndarray, pos_arr:np.ndarray) -> None:
+        """
+        Sets rows of pos_arr, and moves only the objects whose row changed.
+        """
+        changed_arr = np.any(pos_arr != self.pos_arr[indices_arr], axis=1)
+        self.pos_arr[indices_arr] = pos_arr
+
+        self.__ignoreMoves_b = True
+        try:
+            for index_i, pos_t in zip( indices_arr[changed_arr].tolist(), pos_arr[changed_arr].tolist() ):
+                self.bodies_l[index_i].setPosXYZ(*pos_t)
+        finally:
+            self.__ignoreMoves_b = False
+
+    ######## Render interpolation ########
+
+    def beginInterpolation(self, alpha_f:float) -> None:
+        """
+        Moves bodies which moved in the last step between their last two positions for rendering,
+        the same way as PhysicsActor. Must be followed by endInterpolation().
+        """
+        self.__takeOutsideMoves()
+        self.__interpolated_arr = np.flatnonzero( np.any(self.pos_arr != self.prevPos_arr, axis=1) )
+        prevPos_arr = self.prevPos_arr[self.__interpolated_arr]
+        self.__moveObjects( self.__interpolated_arr, prevPos_arr + (self.pos_arr[self.__interpolated_arr] - prevPos_arr)*alpha_f )
+
+    def endInterpolation(self) -> None:
+        self.__moveObjects( self.__interpolated_arr, self.pos_arr[self.__interpolated_arr] )
+        self.__interpolated_arr = None
+
+    def __moveObjects(self, indices_arr:np.ndarray, pos_arr:np.ndarray) -> None:
+        self.__ignoreMoves_b = True
+        try:
+            for index_i, pos_t in zip( indices_arr.tolist(), pos_arr.tolist() ):
+                self.bodies_l[index_i].setPosXYZ(*pos_t)
+        finally:
+            self.__ignoreMoves_b = False
+
+    def __resolveLevel(self, level:"Level", bodyIndices_arr:np.ndarray) -> None:
+        level.updateColliderArrays()
+
+        # Pairs of blocking colliders of the bodies and blocking colliders around each of them, found with the broadphase.
+        contacts_l = []
+        for index_i in bodyIndices_arr.tolist():
+            rowBegin_i, rowEnd_i = level.getColliderRowRange(self.bodies_l[index_i])
+            for bodyRow_i in range(rowBegin_i, rowEnd_i):
+                if not level.colliderBlocking_arr[bodyRow_i]:
+                    continue
+                anObject, collider = level.colliderRefs_l[bodyRow_i]
+                candidates_arr = level.findColliderRows(
+                    tuple( (level.colliderMin_arr[bodyRow_i] - self.contactMargin_f).tolist() ),
+                    tuple( (level.colliderMax_arr[bodyRow_i] + self.contactMargin_f).tolist() )
+                )
+                candidates_arr = np.unique( candidates_arr[ level.colliderBlocking_arr[candidates_arr] ] )
+                for candidate_i in candidates_arr.tolist():
+                    otherObj, otherCollider = level.colliderRefs_l[candidate_i]
+                    if otherObj is not anObject:
+                        contacts_l.append( (otherObj.getStatic(), index_i, anObject, collider, otherObj, otherCollider) )
+
+        # Pairs with static colliders go last, so bodies pushed by each other don't end up inside walls or floors.
+        contacts_l.sort(key=lambda xx:xx[0])
+
+        for _, index_i, anObject, collider, otherObj, otherCollider in contacts_l:
+            # Positions change while resolving, so test again with the latest ones.
+            if not co.checkAabbAabb(collider, anObject, otherCollider, otherObj):
+                continue
+
+            a = co.getDistanceToPushBackAabbAabb(collider, anObject, otherCollider, otherObj)
+            x, y, z = anObject.getPosXYZ()
+            anObject.setPosXYZ( x + a[0], y + a[1], z + a[2] )
+            if not otherObj.getStatic():
+                x, y, z = otherObj.getPosXYZ()
+                otherObj.setPosXYZ( x + a[3], y + a[4], z + a[5] )
+
+            # Stop moving into what it was pushed out of, like landing on the floor.
+            vel_arr = self.vel_arr[index_i]
+            for axis_i in range(3):
+                if a[axis_i] * vel_arr[axis_i] < 0.0:
+                    vel_arr[axis_i] = 0.0
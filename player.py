@@ -1,3 +1,5 @@
+from typing import Tuple
+
 import collide as co
 from physics import PhysicsActor
 from light import SpotLight
@@ -5,22 +7,35 @@ import mmath as mm
 
 class Player(PhysicsActor):
     moveSpeed_f = 5.0
+    reachDist_f = 3.0
 
-    def __init__(self):
+    def __init__(self, genShadowMap_b:bool=True):
         super().__init__("player", (0.0, 1.0, 0.0) )
 
-        self.nearbyTriggers = []
-
         self.boundingBoxAabb = co.Aabb(
             (-0.4, 0.0,-0.4 ), (0.4, 1.8, 0.4), "player_boudingbox", 10, (0.0, 0.0, 0.0), False, True, True, False, [], 2
         )
 
         self.flashLightOn_b = True
         self.flashLight = SpotLight( "flashlight", False, (0.0, 1.4, 0.0), (0.8, 0.8, 0.8), 30.0, 30.0)
-        self.flashLight.genShadowMap()
+        if genShadowMap_b:  # Needs GL context.
+            self.flashLight.genShadowMap()
 
         self.segment = co.Segment("aim", False, (0.0, 1.6, 0.0), mm.Vec4(0, 0, -1000, 0))
 
         self.biggerBoundingBoxAabb = co.Aabb(
             (-2, -1,-2 ), (2, 3, 2), "player_reach_area", 10, (0.0, 0.0, 0.0), False, True, True, False, [], 2
-        )
\ No newline at end of file
+        )
+
+    def getAimSegment(self) -> Tuple[Tuple[float, float, float], Tuple[float, float, float]]:
+        """
+        Returns world space start and vector of self.segment, pointing where the camera looks.
+        """
+        ver, hor, _ = self.getWorldDegreeXYZ()
+        length_f = mm.Vec4( *self.segment.getSegmentDirection(None), 0.0 ).getLength()
+
+        vec = mm.Vec4(0, 0, -1)
+        vec = vec.transform(mm.getRotateXYZMat4(-ver, 1, 0, 0), mm.getRotateXYZMat4(-hor, 0, 1, 0)).normalize()
+        xVec_f, yVec_f, zVec_f = vec.getXYZ()
+
+        return self.segment.getSegmentPos(self), ( xVec_f*length_f, yVec_f*length_f, zVec_f*length_f )
\ No newline at end of file
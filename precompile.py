@@ -0,0 +1,243 @@
+"""
+Compiles every level in assets/levels ahead of time and writes them to level cache, so the game never compiles them.
+
+Levels are compiled in parallel, one level per worker process. Dependencies of each level are resolved as well,
+which are .obj and .mtl files of object::objstatic and textures of their materials and of renderers.
+Models are parsed and written to mesh cache too, so the game only memory maps them.
+Collision trees are built and written as well for models of object::objstatic with meshcollision(true).
+A level fails if it has a compile error or a dependency is missing, and the exit code is 1 if any level failed.
+
+사용법:
+    python precompile.py
+    python precompile.py --levels c01_01 entry --workers 4 --force --json precompile.json
+"""
+
+import os
+import json
+import argparse
+from multiprocessing import Pool
+from time import perf_counter
+from typing import List, Optional
+
+import blueprints as bp
+import obj_parse as op
+from level_cache import LevelCache, makeKey
+from mesh_cache import MeshCache
+from level_loader import SmllCompiler, CompileErrorSmll, getLevelNameOfFile
+from data_struct import Level
+import const
+
+
+class LevelReport:
+    def __init__(self, smllFileDir_s:str):
+        self.name_s = getLevelNameOfFile(smllFileDir_s)
+        self.smllFileDir_s = smllFileDir_s
+
+        self.error_s = None  # Compile error, levels with it have no stats below.
+        self.fromCache_b = False
+        self.compileTime_f = 0.0
+
+        self.smllSize_i = 0
+        self.cacheSize_i = 0
+        self.objectCount_i = 0
+        self.defineCount_i = 0
+        self.vertexCount_i = 0
+
+        self.models_l = []    # .obj and .mtl file dirs
+        self.textures_l = []  # texture names
+        self.dependencySize_i = 0
+        self.missing_l = []   # messages about dependencies that could not be resolved
+
+    def failed(self) -> bool:
+        return self.error_s is not None or bool(self.missing_l)
+
+    def toDict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def findSmllFiles(levelNames_l:Optional[List[str]]=None) -> List[str]:
+    if levelNames_l:
+        return [ const.MAP_DIR_s + x_s + ".smll" for x_s in levelNames_l ]
+    else:
+        return [ const.MAP_DIR_s + x_s for x_s in sorted(os.listdir(const.MAP_DIR_s)) if x_s.endswith(".smll") ]
+
+
+def precompileLevel(smllFileDir_s:str, cacheDir_s:str=const.LEVEL_CACHE_DIR_s, force_b:bool=False) -> LevelReport:
+    report = LevelReport(smllFileDir_s)
+    levelCache = LevelCache(cacheDir_s)
+
+    st = perf_counter()
+    try:
+        if force_b:
+            with open(smllFileDir_s, "rb") as file:
+                key_s = makeKey( file.read() )
+            level = SmllCompiler(smllFileDir_s).compile()
+            levelCache.store(smllFileDir_s, key_s, level)
+        else:
+            level, report.fromCache_b = levelCache.compile(smllFileDir_s)
+    except CompileErrorSmll as e:
+        report.error_s = str(e)
+        return report
+    except OSError as e:
+        report.error_s = "{}: {}".format(type(e).__name__, e)
+        return report
+    report.compileTime_f = perf_counter() - st
+
+    report.smllSize_i = os.path.getsize(smllFileDir_s)
+    try:
+        report.cacheSize_i = os.path.getsize( levelCache.getCacheFileDir(smllFileDir_s) )
+    except OSError:
+        report.missing_l.append( "level cache was not written: '{}'".format(levelCache.getCacheFileDir(smllFileDir_s)) )
+
+    _resolveDependencies(level, report)
+    return report
+
+
+def _resolveDependencies(level:Level, report:LevelReport) -> None:
+    textures_s = set()
+    meshCollisionModels_s = set()
+    for objBprint in level.objectBlueprints_l:
+        report.objectCount_i += 1
+
+        if isinstance(objBprint, bp.ObjectDefineBlueprint):
+            report.defineCount_i += 1
+            for renBprint in objBprint.rendererBlueprints_l:
+                textures_s.add(renBprint.textureDir_s)
+                if renBprint.vertexNdarray is not None:
+                    report.vertexCount_i += len(renBprint.vertexNdarray) // 3
+        elif isinstance(objBprint, bp.ObjectObjStaticBlueprint):
+            textures_s.update( _resolveModel(objBprint.objFileName_s, report) )
+            if objBprint.meshCollision_b:
+                meshCollisionModels_s.add(objBprint.objFileName_s)
+
+    for objFileName_s in sorted(meshCollisionModels_s):
+        _resolveCollisionMesh(objFileName_s, report)
+
+    try:
+        textureFiles_s = set( os.listdir(const.TEXTURE_DIR_s) )
+    except OSError:
+        textureFiles_s = set()
+    for textureName_s in sorted(textures_s):
+        if textureName_s in textureFiles_s:
+            report.textures_l.append(textureName_s)
+            report.dependencySize_i += os.path.getsize(const.TEXTURE_DIR_s + textureName_s)
+        else:
+            report.missing_l.append( "texture not found: '{}'".format(textureName_s) )
+
+
+def _resolveModel(objFileName_s:str, report:LevelReport) -> List[str]:
+    """
+    Returns names of textures the model's materials use.
+    """
+    try:
+        dirs_t = op.findObjMtlDir(objFileName_s)
+    except FileExistsError as e:
+        report.missing_l.append( "model '{}': {}".format(objFileName_s, e) )
+        return []
+    if dirs_t is None:
+        report.missing_l.append( "model not found: '{}' needs both .obj and .mtl".format(objFileName_s) )
+        return []
+
+    objFileDir_s, mtlFileDir_s = dirs_t
+    if objFileDir_s in report.models_l:
+        return []
+
+    report.models_l += [ objFileDir_s, mtlFileDir_s ]
+    report.dependencySize_i += os.path.getsize(objFileDir_s) + os.path.getsize(mtlFileDir_s)
+
+    try:
+        materials_d = op.parseMtl(mtlFileDir_s)
+    except (ValueError, FileExistsError) as e:
+        report.missing_l.append( "broken material file '{}': {}".format(mtlFileDir_s, e or type(e).__name__) )
+        return []
+
+    try:
+        MeshCache().load(objFileDir_s, mtlFileDir_s)
+    except (ValueError, IndexError, KeyError, FileExistsError) as e:
+        report.missing_l.append( "broken model file '{}': {}".format(objFileDir_s, e or type(e).__name__) )
+
+    return [ x.map_Kd_s for x in materials_d.values() ]
+
+
+def _resolveCollisionMesh(objFileName_s:str, report:LevelReport) -> None:
+    """
+    Missing models are already reported by _resolveModel.
+    """
+    try:
+        dirs_t = op.findObjMtlDir(objFileName_s)
+    except FileExistsError:
+        return
+    if dirs_t is None:
+        return
+
+    try:
+        MeshCache().loadCollisionMesh(*dirs_t)
+    except (ValueError, IndexError, KeyError, FileExistsError) as e:
+        report.missing_l.append( "broken collision mesh of '{}': {}".format(dirs_t[0], e or type(e).__name__) )
+
+
+def _precompileLevelArgs(args_t:tuple) -> LevelReport:
+    return precompileLevel(*args_t)
+
+
+def _formatSize(size_i:int) -> str:
+    if size_i < 1024 * 1024:
+        return "{:.1f} KB".format(size_i / 1024)
+    else:
+        return "{:.2f} MB".format(size_i / 1024 / 1024)
+
+
+def printReport(report:LevelReport) -> None:
+    if report.error_s is not None:
+        print( "[FAIL] {}: {}".format(report.name_s, report.error_s) )
+        return
+
+    print( "[{}] {}: {} ({:.4f} sec), {} objects, {} defines, {} vertices, smll {} -> cache {}, "
+           "{} models, {} textures ({})".format(
+        "FAIL" if report.failed() else " OK ", report.name_s,
+        "from cache" if report.fromCache_b else "compiled", report.compileTime_f,
+        report.objectCount_i, report.defineCount_i, report.vertexCount_i,
+        _formatSize(report.smllSize_i), _formatSize(report.cacheSize_i),
+        len(report.models_l) // 2, len(report.textures_l), _formatSize(report.dependencySize_i)
+    ) )
+    for x_s in report.missing_l:
+        print("\t" + x_s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiles levels to level cache ahead of time and checks their dependencies.")
+    parser.add_argument("--levels", nargs='+', default=None, help="level names without .smll, every level by default")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes, number of CPUs by default")
+    parser.add_argument("--cache-dir", default=const.LEVEL_CACHE_DIR_s, help="where compiled levels are written")
+    parser.add_argument("--force", action="store_true", help="compiles levels even if their cache is up to date")
+    parser.add_argument("--json", default=None, help="writes reports of every level to this file")
+    args = parser.parse_args()
+
+    smllFileDirs_l = findSmllFiles(args.levels)
+    jobs_l = [ (x_s, args.cache_dir, args.force) for x_s in smllFileDirs_l ]
+
+    st = perf_counter()
+    reports_l = []
+    with Pool( args.workers or None ) as pool:
+        for report in pool.imap_unordered(_precompileLevelArgs, jobs_l):
+            printReport(report)
+            reports_l.append(report)
+    elapsed_f = perf_counter() - st
+
+    reports_l.sort(key=lambda x: x.name_s)
+    failed_l = [ x.name_s for x in reports_l if x.failed() ]
+    print( "\n{} levels in {:.4f} sec, compile time sum {:.4f} sec, cache {}, {} failed{}".format(
+        len(reports_l), elapsed_f, sum( x.compileTime_f for x in reports_l ),
+        _formatSize( sum( x.cacheSize_i for x in reports_l ) ), len(failed_l),
+        ": " + ", ".join(failed_l) if failed_l else ""
+    ) )
+
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump( { "elapsed": elapsed_f, "levels": [ x.toDict() for x in reports_l ] }, file, indent=4 )
+
+    raise SystemExit(1 if failed_l else 0)
+
+
+if __name__ == '__main__':
+    main()
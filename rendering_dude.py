@@ -60,7 +60,7 @@ class RenderingDude:
             else:
                 gl.glUniform1i(self.uniLoc.drawFlashLightShadow_i, 0)
 
-        self.resourceMan.renderAll(self.uniLoc)
+        self.resourceMan.renderAll( self.uniLoc, self.camera.getWorldXYZ() )
 
     def renderShadow(self, winWidth_i, winHeight_i) -> None:
         if self.player.flashLightOn_b and self.configs.drawFlashLightShadow_b:
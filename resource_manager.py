@@ -1,43 +1,54 @@
 import os
 from time import time
-from typing import Optional, Generator
-from multiprocessing import Queue
-from queue import Empty
+from typing import Optional, Generator, Tuple
 
 import OpenGL.GL as gl
 
 from level_loader import LevelLoader
+from asset_pool import AssetPool, JOB_LEVEL_i
+import level_loader as ll
+from level_cache import LevelCache
 from data_struct import Level, Object
 from object_manager import ObjectManager, ObjectInitInfo
 import blueprints as bp
+import level_diff as ld
 from uniloc import UniformLocs
 from overlay_ui import OverlayUiManager
 from curstate import GlobalStates
 
 
 class ResourceManager:
-    def __init__(self, globalStates:GlobalStates):
+    HOT_RELOAD_INTERVAL_f = 0.5  # Seconds between checking modified time of level files.
+
+    def __init__(self, globalStates:GlobalStates, hotReload_b:bool=True, assetWorkers_i:Optional[int]=None):
         self.globalStates = globalStates
 
-        self._levelsWaitingObj_l = []
+        self._levelsWaitingObj_d = {}  # level name -> Level, whose objects are not all instanced yet.
         self._levels_l = []
+        self._levelsByName_d = {}  # level name -> Level in _levels_l
+        self._streamingLevels_d = {}  # level name -> Level, which LevelLoader is still sending blocks of.
+
+        # Levels whose files are modified are recompiled and applied to the live level by diffing blueprints.
+        self.hotReload_b = bool(hotReload_b)
+        self._levelFileStamps_d = {}  # level name -> (.smll file dir, st_mtime_ns when it was requested)
+        self.__lastFileCheckTime_f = 0.0
 
         self._watingForLevel_i = 0
-        self._fromLevelLoaderQueue = Queue()
-        self._toLevelLoaderQueue = Queue()
+        self._levelCache = LevelCache()
 
-        self._levelLoader = LevelLoader(self._fromLevelLoaderQueue, self._toLevelLoaderQueue)
+        # Levels, models and textures are all loaded on this, with assetWorkers_i processes or one per core.
+        self._assetPool = AssetPool(assetWorkers_i)
 
-        self._objectMan = ObjectManager()
+        self._objectMan = ObjectManager(self._assetPool)
 
         self.overlayUiMan = OverlayUiManager(self._objectMan.texMan, self.globalStates)
         self.console = self.overlayUiMan.consoleWin
 
         self._objectMan.console = self.console
 
-    def renderAll(self, uniLoc:UniformLocs) -> None:
+    def renderAll(self, uniLoc:UniformLocs, viewPos_t:Optional[Tuple[float, float, float]]=None) -> None:
         for level in self._levels_l:
-            level.renderAll(uniLoc)
+            level.renderAll(uniLoc, viewPos_t)
 
         gl.glDisable(gl.GL_CULL_FACE)
         gl.glDisable(gl.GL_DEPTH_TEST)
@@ -62,28 +73,24 @@ class ResourceManager:
             objTempNames_l = level.terminate()
             self._objectMan.dumpObjects(objTempNames_l)
 
-        del self._levels_l, self._levelsWaitingObj_l
+        del self._levels_l, self._levelsByName_d, self._levelsWaitingObj_d
 
-        try:
-            self._levelLoader.terminate()
-        except AttributeError:
-            pass
+        self._assetPool.terminate()
 
     def runProcesses(self) -> None:
-        self._levelLoader.start()
+        self._assetPool.start()
         self._objectMan.runProcesses()
 
     def update(self) -> None:
+        if self.hotReload_b:
+            self.__checkLevelFiles()
+
         self.__popFromLevelLoader()
 
         self.__fillLevelWithObjects()
 
     def findLevelByName(self, levelName_s:str) -> Optional[Level]:
-        for level in self._levels_l:
-            if level.getName() == levelName_s:
-                return level
-        else:
-            return None
+        return self._levelsByName_d.get(levelName_s)
 
     def findObjectInLevelByName(self, levelName_s:str, objectName_s:str) -> Optional[Object]:
         level = self.findLevelByName(levelName_s)
@@ -93,15 +100,12 @@ class ResourceManager:
             return level.findObjectByName(objectName_s)
 
     def requestLevelLoad(self, levelName_s:str, waitTime_f:float=0.0) -> None:
-        for level in self._levels_l:
-            if level.getName() == levelName_s:
-                print("Already loaded level:", levelName_s)
-                self.console.appendLogs( "Already loaded level: '{}'".format(levelName_s) )
-                break
+        if levelName_s in self._levelsByName_d:
+            print("Already loaded level:", levelName_s)
+            self.console.appendLogs( "Already loaded level: '{}'".format(levelName_s) )
         else:
             smllFileDir_s = self.__findLevelDir(levelName_s + ".smll")
-            self._toLevelLoaderQueue.put(smllFileDir_s)
-            self._watingForLevel_i += 1
+            self.__requestCompile(levelName_s, smllFileDir_s, True)
 
         if waitTime_f <= 0.0:
             return
@@ -119,24 +123,36 @@ class ResourceManager:
         else:
             raise FileNotFoundError("Level loading time out")
 
-    def deleteLevel(self, levelName_s:str) -> None:
-        for x, level in enumerate(self._levels_l):
-            if level.getName() == levelName_s:
-                del self._levels_l[x]
-                self._objectMan.dumpObjects( level.terminate() )
+    def requestLevelReload(self, levelName_s:str) -> None:
+        """
+        Recompiles a loaded level, and only objects whose blueprints changed are made again when it arrives.
+        """
+        if self.findLevelByName(levelName_s) is None:
+            raise FileNotFoundError(levelName_s)
+        elif levelName_s in self._streamingLevels_d:
+            self.console.appendLogs( "Level is still being loaded: '{}'".format(levelName_s) )
+            return
+        self.__requestCompile( levelName_s, self.__findLevelDir(levelName_s + ".smll"), False )
 
-        for x, level in enumerate(self._levelsWaitingObj_l):
-            if level.getName() == levelName_s:
-                del self._levels_l[x]
+    def deleteLevel(self, levelName_s:str) -> None:
+        self._levelFileStamps_d.pop(levelName_s, None)
+        self._streamingLevels_d.pop(levelName_s, None)
+        self._levelsWaitingObj_d.pop(levelName_s, None)
+        level = self._levelsByName_d.pop(levelName_s, None)
+        if level is not None:
+            self._levels_l.remove(level)
+            self._objectMan.dumpObjects( level.terminate() )
 
     def deleteAllLevels(self):
+        self._levelFileStamps_d = {}
+        self._streamingLevels_d = {}
         for x in range(len(self._levels_l) - 1, -1, -1):
             level = self._levels_l[x]
             del self._levels_l[x]
             self._objectMan.dumpObjects( level.terminate() )
 
-        for x in range(len(self._levelsWaitingObj_l) - 1, -1, -1):
-            del self._levels_l[x]
+        self._levelsByName_d = {}
+        self._levelsWaitingObj_d = {}
 
     def deleteAnObject(self, levelName_s:str, objectName_s:str) -> bool:
         level = self.findLevelByName(levelName_s)
@@ -150,19 +166,31 @@ class ResourceManager:
             else:
                 return False
 
-    def getLevelWithNameInLevelsList(self, levelName_s:str) -> Optional[Level]:
-        for level in self._levels_l:
-            if level.getName() == levelName_s:
-                return level
+    def renameAnObject(self, levelName_s:str, objectName_s:str, newName_s:str) -> bool:
+        level = self.findLevelByName(levelName_s)
+        if level is None:
+            return False
+        elif not level.renameObject(objectName_s, newName_s):
+            return False
         else:
-            return None
+            self.console.appendLogs(
+                "An object '{}' in level '{}' has been renamed to '{}'.".format(objectName_s, levelName_s, newName_s)
+            )
+            return True
+
+    def isLevelReady(self, levelName_s:str) -> bool:
+        """
+        True if the level has arrived and every object of it is instanced.
+        """
+        if self.getLevelWithNameInLevelsList(levelName_s) is None:
+            return False
+        return self.getLevelWithNameInLevelWaitingObjList(levelName_s) is None and levelName_s not in self._streamingLevels_d
+
+    def getLevelWithNameInLevelsList(self, levelName_s:str) -> Optional[Level]:
+        return self._levelsByName_d.get(levelName_s)
 
     def getLevelWithNameInLevelWaitingObjList(self, levelName_s:str) -> Optional[Level]:
-        for level in self._levelsWaitingObj_l:
-            if level.getName() == levelName_s:
-                return level
-        else:
-            return None
+        return self._levelsWaitingObj_d.get(levelName_s)
 
     @staticmethod
     def __findLevelDir(levelName_s:str) -> str:
@@ -172,60 +200,203 @@ class ResourceManager:
         else:
             raise FileNotFoundError(levelName_s)
 
-    def __popFromLevelLoader(self) -> None:
-        if self._watingForLevel_i:
+    def __requestCompile(self, levelName_s:str, smllFileDir_s:str, stream_b:bool) -> None:
+        try:
+            self._levelFileStamps_d[levelName_s] = ( smllFileDir_s, os.stat(smllFileDir_s).st_mtime_ns )
+        except OSError:
+            pass
+        self._assetPool.submit( JOB_LEVEL_i, LevelLoader(smllFileDir_s, stream_b, self._levelCache) )
+        self._watingForLevel_i += 1
+
+    def __checkLevelFiles(self) -> None:
+        if time() - self.__lastFileCheckTime_f < self.HOT_RELOAD_INTERVAL_f:
+            return
+        self.__lastFileCheckTime_f = time()
+
+        for level in self._levels_l:
+            if level.getName() in self._levelsWaitingObj_d:
+                continue
             try:
-                result = self._fromLevelLoaderQueue.get_nowait()
-            except Empty:
+                smllFileDir_s, mtime_i = self._levelFileStamps_d[level.getName()]
+                newMtime_i = os.stat(smllFileDir_s).st_mtime_ns
+            except (KeyError, OSError):
+                continue
+            if newMtime_i != mtime_i:
+                print( "Level file modified: '{}'".format(smllFileDir_s) )
+                self.__requestCompile(level.getName(), smllFileDir_s, False)
+
+    def __popFromLevelLoader(self) -> None:
+        # Levels come in many pieces while streamed, so everything in the queue is taken at once.
+        while self._watingForLevel_i:
+            result = self._assetPool.popResult(JOB_LEVEL_i)
+            if result is None:
                 return
-            else:
+
+            if isinstance(result, tuple) and result[0] > 0:
+                self.__takeStreamPiece(*result)
+            elif isinstance(result, tuple):  # Failed to load a level.
                 self._watingForLevel_i -= 1
-                if isinstance(result, tuple):  # Failed to load a level.
-                    if result[0] == -1:  # File does not exist.
-                        print( "(Error) File not found:", result[1] )
-                elif isinstance(result, Level):
-                    self._levelsWaitingObj_l.append(result)
-                    self._levels_l.append(result)
-                    text_s = "Level loaded: '{}'".format(result.getName())
-                    print( text_s )
-                    self.console.appendLogs( text_s )
-                else:
-                    raise ValueError( "Recived wrong data type from LevelLoader: {}".format(type(result)) )
+                if result[0] == -1:  # File does not exist.
+                    print( "(Error) File not found:", result[1] )
+                elif result[0] == -2:  # Compile error, the live level is kept as it is if there is one.
+                    print( "(Error) Failed to compile '{}': {}".format(result[1], result[2]) )
+                    self.console.appendLogs( "Failed to compile '{}': {}".format(result[1], result[2]) )
+
+                    # Objects of a level that failed in the middle of streaming are already instanced.
+                    levelName_s = ll.getLevelNameOfFile(result[1])
+                    if levelName_s in self._streamingLevels_d:
+                        self.deleteLevel(levelName_s)
+            elif isinstance(result, Level):
+                self._watingForLevel_i -= 1
+                oldLevel = self.getLevelWithNameInLevelsList(result.getName())
+                if oldLevel is not None:
+                    self.__reloadLevel(oldLevel, result)
+                    continue
+
+                self.__addLevel(result)
+                text_s = "Level loaded: '{}'".format(result.getName())
+                print( text_s )
+                self.console.appendLogs( text_s )
+            else:
+                raise ValueError( "Recived wrong data type from LevelLoader: {}".format(type(result)) )
+
+    def __addLevel(self, level:Level) -> None:
+        self._levels_l.append(level)
+        self._levelsByName_d[level.getName()] = level
+        self._levelsWaitingObj_d[level.getName()] = level
+
+    def __takeStreamPiece(self, kind_i:int, levelName_s:str, payload) -> None:
+        if kind_i == ll.STREAM_HEAD_i:
+            self._streamingLevels_d[levelName_s] = payload
+            self.__addLevel(payload)
+            self.console.appendLogs( "Level streaming: '{}'".format(levelName_s) )
+            return
+        elif kind_i == ll.STREAM_TAIL_i:
+            self._watingForLevel_i -= 1
+
+        # Pieces of a level deleted while streamed are thrown away.
+        level = self._streamingLevels_d.get(levelName_s)
+        if level is None:
+            return
+
+        if kind_i == ll.STREAM_OBJECT_i:
+            level.objectBlueprints_l.append(payload)
+        elif kind_i == ll.STREAM_POINT_LIGHT_i:
+            level.pointLights_l.append(payload)
+        elif kind_i == ll.STREAM_COL_GROUP_i:
+            level.addColGroup(payload)
+        elif kind_i == ll.STREAM_TAIL_i:
+            level.takeLayoutFrom(payload)
+            del self._streamingLevels_d[levelName_s]
+            text_s = "Level loaded: '{}'".format(levelName_s)
+            print( text_s )
+            self.console.appendLogs( text_s )
+        else:
+            raise ValueError( "Unknown stream piece from LevelLoader: {}".format(kind_i) )
+
+    def __reloadLevel(self, level:Level, newLevel:Level) -> None:
+        """
+        Applies a recompiled level to the live one. Templates and GPU buffers of unchanged object::define blocks are reused.
+        """
+        levelName_s = level.getName()
+        diff = ld.LevelDiff(level, newLevel)
+
+        # Levels are static actors that can't be moved, so a level whose position changed is made from scratch.
+        # So is a level whose objects are not all instanced yet, since the diff only knows instanced ones.
+        if diff.levelPosChanged_b or levelName_s in self._levelsWaitingObj_d:
+            fileStamp_t = self._levelFileStamps_d.get(levelName_s)
+            self.deleteLevel(levelName_s)
+            if fileStamp_t is not None:
+                self._levelFileStamps_d[levelName_s] = fileStamp_t
+            self.__addLevel(newLevel)
+            text_s = "Level reloaded from scratch: '{}'".format(levelName_s)
+            print( text_s )
+            self.console.appendLogs( text_s )
+            return
+
+        ######## Changed templates ########
+
+        # Their instances go first, so that old templates are terminated or retired before new ones take the names.
+        changedTemplateNames_s = set( diff.getChangedTemplateNames() )
+        self._objectMan.dumpObjects( level.deleteObjects(
+            [ x for x in diff.deletes_l if x.objTempName_s in changedTemplateNames_s ]
+        ) )
+        for objTempName_s in changedTemplateNames_s:
+            retiredName_s = self._objectMan.retireObjectTemplate(objTempName_s)
+            if retiredName_s is None:
+                continue
+            for otherLevel in self._levels_l:  # Instances made by object::use in other levels
+                for anObject in otherLevel.objects_l:
+                    if anObject.objTempName_s == objTempName_s:
+                        anObject.objTempName_s = retiredName_s
+
+        for objBprint in diff.newTemplates_l + diff.changedTemplates_l:
+            self._objectMan.giveObjectDefineBlueprint(objBprint)
+        level.templateKeys_d = diff.newTemplateKeys_d
+
+        ######## Instances ########
+
+        for anObject, initPos_t, sourceKey_t in diff.moves_l:
+            anObject.setPosXYZ(*initPos_t)
+            anObject.sourceKey_t = sourceKey_t
+
+        # New instances are requested before the rest is deleted,
+        # so that a template shared by deleted and new instances is not terminated in between.
+        for objBprint in diff.creates_l:
+            if isinstance(objBprint, bp.ObjectObjStaticBlueprint):
+                self._objectMan.giveObjectObjStaticBlueprint(objBprint)
+            level.objectObjInitInfo_l.append( self.__makeObjInitInfo(level, objBprint) )
+        if not self.__instanceObjects(level):
+            self._levelsWaitingObj_d[levelName_s] = level
+
+        self._objectMan.dumpObjects( level.deleteObjects(
+            [ x for x in diff.deletes_l if x.objTempName_s not in changedTemplateNames_s ]
+        ) )
+
+        level.takeLayoutFrom(newLevel)
+
+        text_s = "Level reloaded: '{}' ({})".format(levelName_s, diff)
+        print( text_s )
+        self.console.appendLogs( text_s )
 
     def __fillLevelWithObjects(self) -> None:
-        for x in range(len(self._levelsWaitingObj_l) - 1, -1, -1):
-            level = self._levelsWaitingObj_l[x]
+        for level in reversed( list(self._levelsWaitingObj_d.values()) ):
             for y in range(len(level.objectBlueprints_l) - 1, -1, -1):
                 objBprint = level.objectBlueprints_l[y]
                 if isinstance(objBprint, bp.ObjectDefineBlueprint):
                     self._objectMan.giveObjectDefineBlueprint(objBprint)
-                    level.objectObjInitInfo_l.append( ObjectInitInfo(
-                        objBprint.name_s, objBprint.name_s, level, objBprint.static_b, objBprint.initPos_t,
-                        objBprint.colGroupTargets_l, []
-                    ) )
-                    del level.objectBlueprints_l[y]
-                elif isinstance(objBprint, bp.ObjectUseBlueprint):
-                    level.objectObjInitInfo_l.append( ObjectInitInfo(
-                        objBprint.name_s, objBprint.templateName_s, level, objBprint.static_b, objBprint.initPos_t,
-                        objBprint.colGroupTargets_l, []
-                    ) )
-                    del level.objectBlueprints_l[y]
+                    level.templateKeys_d[objBprint.name_s] = ld.makeTemplateKey(objBprint)
                 elif isinstance(objBprint, bp.ObjectObjStaticBlueprint):
                     self._objectMan.giveObjectObjStaticBlueprint(objBprint)
-                    level.objectObjInitInfo_l.append( ObjectInitInfo(
-                        objBprint.name_s, objBprint.objFileName_s, level, objBprint.static_b, objBprint.initPos_t,
-                        objBprint.colGroupTargets_l, objBprint.colliders_l
-                    ) )
-                    del level.objectBlueprints_l[y]
-                else:
-                    raise ValueError
+                level.objectObjInitInfo_l.append( self.__makeObjInitInfo(level, objBprint) )
+                del level.objectBlueprints_l[y]
+
+            if self.__instanceObjects(level) and level.getName() not in self._streamingLevels_d:
+                del self._levelsWaitingObj_d[level.getName()]
 
-            for y in range(len(level.objectObjInitInfo_l) - 1, -1, -1):
-                objInitInfo = level.objectObjInitInfo_l[y]
-                result = self._objectMan.requestObject( objInitInfo )
-                if result is not None:
-                    del level.objectObjInitInfo_l[y]
-                    level.objects_l.append(result)
+    def __instanceObjects(self, level:Level) -> bool:
+        """
+        Returns True if every object of the level is instanced.
+        """
+        for y in range(len(level.objectObjInitInfo_l) - 1, -1, -1):
+            objInitInfo = level.objectObjInitInfo_l[y]
+            result = self._objectMan.requestObject( objInitInfo )
+            if result is not None:
+                del level.objectObjInitInfo_l[y]
+                level.addObject(result)
+
+        return len( level.objectObjInitInfo_l ) <= 0
+
+    @staticmethod
+    def __makeObjInitInfo(level:Level, objBprint) -> ObjectInitInfo:
+        if isinstance(objBprint, bp.ObjectObjStaticBlueprint):
+            colliders_l = objBprint.colliders_l
+            meshCollision_b = objBprint.meshCollision_b
+        else:
+            colliders_l = []
+            meshCollision_b = False
 
-            if len( level.objectObjInitInfo_l ) <= 0:
-                del self._levelsWaitingObj_l[x]
+        return ObjectInitInfo(
+            objBprint.name_s, ld.getTemplateName(objBprint), level, objBprint.static_b, objBprint.initPos_t,
+            objBprint.colGroupTargets_l, colliders_l, ld.getSourceKey(objBprint), meshCollision_b
+        )
@@ -0,0 +1,268 @@
+"""
+Makes synthetic .smll levels of given size, to see how compiling, loading, collision and rendering scale.
+
+Objects are unit boxes laid on a square grid over a floor, centered at the origin.
+    object::define : each has a renderer::aab and given number of collider::aabb stacked on the box.
+    object::use    : instances of the defines in turn, placed on the rest of the grid cells.
+    colGroup::aabb : the grid is split into square cells, and every object targets the cell it is in.
+    light::PointLight : spread over the grid. The shader only takes the first 10 of a level.
+
+사용법:
+    python stress_level.py stress_10k --defines 100 --uses 9900 --colliders 2 --lights 10 --colgroups 16
+"""
+
+import math
+import argparse
+from typing import List, Tuple
+
+import const
+
+
+FLOOR_TEXTURE_s = "0021.bmp"
+BOX_TEXTURES_t = ("0012.bmp", "0022.bmp", "0032.bmp", "wood_01.jpg", "concrete_01.jpg")
+
+
+class StressLevelSpec:
+    def __init__(self, defineCount_i:int=10, useCount_i:int=90, collidersPerObject_i:int=1, pointLightCount_i:int=4,
+                 colGroupCount_i:int=4, spacing_f:float=3.0):
+        if defineCount_i < 1 and useCount_i > 0:
+            raise ValueError("object::use needs at least one object::define.")
+
+        self.defineCount_i = int(defineCount_i)
+        self.useCount_i = int(useCount_i)
+        self.collidersPerObject_i = int(collidersPerObject_i)
+        self.pointLightCount_i = int(pointLightCount_i)
+        self.colGroupCount_i = int(colGroupCount_i)
+        self.spacing_f = float(spacing_f)
+
+    def __str__(self) -> str:
+        return "defines: {}, uses: {}, colliders per object: {}, point lights: {}, col groups: {}".format(
+            self.defineCount_i, self.useCount_i, self.collidersPerObject_i, self.pointLightCount_i, self.colGroupCount_i
+        )
+
+    @classmethod
+    def fromObjectCount(cls, objectCount_i:int) -> "StressLevelSpec":
+        """
+        One define for every ten objects, one col group cell for every hundred and as many point lights as the shader takes.
+        """
+        defineCount_i = max( 1, objectCount_i // 10 )
+        return cls(
+            defineCount_i, max(0, objectCount_i - defineCount_i), 1, min( 10, max(1, objectCount_i // 100) ),
+            max( 1, objectCount_i // 100 )
+        )
+
+    def getObjectCount(self) -> int:
+        return self.defineCount_i + self.useCount_i
+
+    def toDict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def _formatFloat(value_f:float) -> str:
+    return "{:g}".format(value_f)
+
+
+def _formatXYZ(xyz_t:Tuple[float, float, float]) -> str:
+    return ", ".join( _formatFloat(x) for x in xyz_t )
+
+
+class _Grid:
+    def __init__(self, spec:StressLevelSpec):
+        self.spacing_f = spec.spacing_f
+        self.side_i = max( 1, math.ceil(math.sqrt( spec.getObjectCount() )) )
+        self.halfWidth_f = self.side_i * self.spacing_f / 2
+
+        self.groupSide_i = max( 1, math.ceil(math.sqrt( spec.colGroupCount_i )) ) if spec.colGroupCount_i > 0 else 0
+
+    def getCellPos(self, index_i:int) -> Tuple[float, float, float]:
+        row_i, col_i = divmod(index_i, self.side_i)
+        return (
+            (col_i + 0.5) * self.spacing_f - self.halfWidth_f, 0.0, (row_i + 0.5) * self.spacing_f - self.halfWidth_f
+        )
+
+    def getGroupOfCell(self, index_i:int) -> int:
+        row_i, col_i = divmod(index_i, self.side_i)
+        groupRow_i = row_i * self.groupSide_i // self.side_i
+        groupCol_i = col_i * self.groupSide_i // self.side_i
+        return groupRow_i * self.groupSide_i + groupCol_i
+
+    def getGroupBox(self, group_i:int) -> Tuple[ Tuple[float, float, float], Tuple[float, float, float] ]:
+        groupRow_i, groupCol_i = divmod(group_i, self.groupSide_i)
+        width_f = self.halfWidth_f * 2 / self.groupSide_i
+        minX_f = groupCol_i * width_f - self.halfWidth_f
+        minZ_f = groupRow_i * width_f - self.halfWidth_f
+        return (minX_f, -1.0, minZ_f), (minX_f + width_f, 4.0, minZ_f + width_f)
+
+
+def makeStressLevel(spec:StressLevelSpec) -> str:
+    """
+    Returns source of a .smll level.
+    """
+    grid = _Grid(spec)
+    texts_l = [ "initPos(0, 0, 0);\n" ]
+
+    groupCount_i = grid.groupSide_i ** 2
+    extent_f = grid.halfWidth_f + 1
+    texts_l.append( _makeAabbBlock("bounding::aabb", "bounding", (-extent_f, -2, -extent_f), (extent_f, 20, extent_f)) )
+    for group_i in range(groupCount_i):
+        texts_l.append( _makeAabbBlock("colGroup::aabb", "group_{}".format(group_i), *grid.getGroupBox(group_i)) )
+
+    for light_i in range(spec.pointLightCount_i):
+        x_f, _, z_f = grid.getCellPos( light_i * spec.getObjectCount() // max(1, spec.pointLightCount_i) )
+        texts_l.append( _makePointLightBlock( "light_{}".format(light_i), (x_f, 3.0, z_f) ) )
+
+    texts_l.append( _makeFloorBlock(extent_f) )
+
+    for define_i in range(spec.defineCount_i):
+        texts_l.append( _makeDefineBlock(spec, define_i, grid.getCellPos(define_i), _getGroupTargets(grid, define_i)) )
+
+    for use_i in range(spec.useCount_i):
+        cell_i = spec.defineCount_i + use_i
+        texts_l.append( _makeUseBlock(
+            "use_{}".format(use_i), "box_{}".format(use_i % spec.defineCount_i), grid.getCellPos(cell_i),
+            _getGroupTargets(grid, cell_i)
+        ) )
+
+    return "\n\n".join(texts_l) + "\n"
+
+
+def writeStressLevel(fileDir_s:str, spec:StressLevelSpec) -> None:
+    with open(fileDir_s, "w", encoding="utf8") as file:
+        file.write( makeStressLevel(spec) )
+
+
+def _getGroupTargets(grid:_Grid, cell_i:int) -> List[str]:
+    if grid.groupSide_i <= 0:
+        return []
+    else:
+        return [ "group_{}".format(grid.getGroupOfCell(cell_i)) ]
+
+
+def _makeAabbBlock(type_s:str, name_s:str, min_t, max_t) -> str:
+    return """{}
+{{
+    name({});
+    initPos(0, 0, 0);
+    minPos({}); maxPos({});
+    weight(0);
+    static(true);
+}}""".format( type_s, name_s, _formatXYZ(min_t), _formatXYZ(max_t) )
+
+
+def _makePointLightBlock(name_s:str, pos_t) -> str:
+    return """light::PointLight
+{{
+    name({});
+    static(true);
+    initPos({});
+    color(0.5, 0.5, 0.5);
+    maxDist(12);
+}}""".format( name_s, _formatXYZ(pos_t) )
+
+
+def _makeFloorBlock(extent_f:float) -> str:
+    return """object::define
+{{
+    name("floor");
+    static(true);
+    initpos(0, 0, 0);
+
+    renderer::quad
+    {{
+        name(floor);
+        initPos(0, 0, 0);
+
+        pos01({e0}, 0, {e0}); pos11({e1}, 0, {e0});
+        pos00({e0}, 0, {e1}); pos10({e1}, 0, {e1});
+
+        texverc({t}); texhorc({t});
+        texture({tex});
+        shininess(32);
+        specstrength(0.2);
+    }}
+    collider::aabb
+    {{
+        name(floor_col);
+        initPos(0, 0, 0);
+        type ( blocking );
+        minPos({e0}, -1, {e0}); maxPos({e1}, 0, {e1});
+        weight(0);
+        static(true);
+        activateOption(toggle);
+    }}
+}}""".format( e0=_formatFloat(-extent_f), e1=_formatFloat(extent_f), t=_formatFloat(extent_f), tex=FLOOR_TEXTURE_s )
+
+
+def _makeDefineBlock(spec:StressLevelSpec, define_i:int, pos_t, colGroupTargets_l:List[str]) -> str:
+    texts_l = [
+        "object::define\n{",
+        '    name("box_{}");'.format(define_i),
+        "    static(true);",
+        "    initpos({});".format( _formatXYZ(pos_t) ),
+    ]
+    if colGroupTargets_l:
+        texts_l.append( "    colgrouptargets({});".format( ", ".join( '"{}"'.format(x) for x in colGroupTargets_l ) ) )
+
+    texts_l.append( """
+    renderer::aab
+    {{
+        name(box);
+        initpos(0, 0, 0);
+        minPos(-0.5, 0, -0.5); maxPos(0.5, 1, 0.5);
+        texverc(1); texhorc(1);
+        texture({});
+        shininess(8);
+        specstrength(0.5);
+    }}""".format( BOX_TEXTURES_t[define_i % len(BOX_TEXTURES_t)] ) )
+
+    # Colliders are stacked, so each of them covers a slice of the box.
+    sliceHeight_f = 1.0 / max(1, spec.collidersPerObject_i)
+    for collider_i in range(spec.collidersPerObject_i):
+        texts_l.append( """    collider::aabb
+    {{
+        name(box_col_{});
+        initpos(0, 0, 0);
+        type ( blocking );
+        minPos(-0.5, {}, -0.5); maxPos(0.5, {}, 0.5);
+        activateOption(toggle);
+        weight(0);
+        static(true);
+    }}""".format( collider_i, _formatFloat(collider_i * sliceHeight_f), _formatFloat((collider_i + 1) * sliceHeight_f) ) )
+
+    texts_l.append("}")
+    return "\n".join(texts_l)
+
+
+def _makeUseBlock(name_s:str, templateName_s:str, pos_t, colGroupTargets_l:List[str]) -> str:
+    texts_l = [
+        "object::use\n{",
+        "    name({});".format(name_s),
+        '    tempname("{}");'.format(templateName_s),
+        "    static(true);",
+        "    initpos({});".format( _formatXYZ(pos_t) ),
+    ]
+    if colGroupTargets_l:
+        texts_l.append( "    colgrouptargets({});".format( ", ".join( '"{}"'.format(x) for x in colGroupTargets_l ) ) )
+    texts_l.append("}")
+    return "\n".join(texts_l)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes a synthetic level to assets/levels.")
+    parser.add_argument("name", help="level name without .smll")
+    parser.add_argument("--defines", type=int, default=10, help="number of object::define boxes")
+    parser.add_argument("--uses", type=int, default=90, help="number of object::use instances of the defines")
+    parser.add_argument("--colliders", type=int, default=1, help="collider::aabb per define")
+    parser.add_argument("--lights", type=int, default=4, help="number of light::PointLight")
+    parser.add_argument("--colgroups", type=int, default=4, help="number of colGroup::aabb cells, rounded up to a square")
+    parser.add_argument("--spacing", type=float, default=3.0, help="distance between grid cells")
+    args = parser.parse_args()
+
+    spec = StressLevelSpec(args.defines, args.uses, args.colliders, args.lights, args.colgroups, args.spacing)
+    fileDir_s = const.MAP_DIR_s + args.name + ".smll"
+    writeStressLevel(fileDir_s, spec)
+    print( "'{}' written ({})".format(fileDir_s, spec) )
+
+
+if __name__ == '__main__':
+    main()
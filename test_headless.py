@@ -0,0 +1,43 @@
+"""
+Smoke check of headless.py on a machine without libGL. OpenGL and pygame are made impossible to import,
+and a level is run for a few ticks in a new process.
+
+사용법:
+    python -m pytest test_headless.py
+    python test_headless.py
+"""
+
+import os
+import sys
+import subprocess
+
+
+_RUN_WITHOUT_GL_s = """
+import sys
+import runpy
+import importlib.abc
+
+class BlockGl(importlib.abc.MetaPathFinder):
+    def find_spec(self, name_s, path, target=None):
+        if name_s.split('.')[0] in ('OpenGL', 'pygame'):
+            raise ImportError('No GL on this machine: ' + name_s)
+
+sys.meta_path.insert(0, BlockGl())
+sys.argv[0] = 'headless.py'
+runpy.run_path('headless.py', run_name='__main__')
+"""
+
+
+def test_headless_without_gl():
+    result = subprocess.run(
+        [sys.executable, "-c", _RUN_WITHOUT_GL_s, "--levels", "entry", "--ticks", "60", "--no-cache"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert "ticks: 60" in result.stdout
+
+
+if __name__ == '__main__':
+    test_headless_without_gl()
+    print("ok")
@@ -0,0 +1,70 @@
+"""
+Checks parseObj against the old line by line parser, on small models written to a temporary folder.
+parseObjByLines only reads triangles with v/vt/vn, so faces it can't read are compared with the same model written that way.
+
+사용법:
+    python -m pytest test_obj_parse.py
+    python test_obj_parse.py
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+import obj_parse as op
+
+
+_HEAD_s = """\
+v 0.000000 0.000000 0.000000
+v 1.000000 0.000000 0.000000
+v 1.000000 1.000000 0.000000
+v 0.000000 1.000000 0.000000
+v 0.500000 1.500000 0.000000
+vt 0.000000 0.000000
+vt 1.000000 0.000000
+vt 1.000000 1.000000
+vt 0.000000 1.000000
+vt 0.500000 1.000000
+vn 0.000000 0.000000 1.000000
+"""
+
+# (name, model for parseObj, the same model for parseObjByLines or None if it reads the first one as it is)
+_CASES_l = [
+    ( "triangles", _HEAD_s + "o A\nusemtl m\nf 1/1/1 2/2/1 3/3/1\nf 1/1/1 3/3/1 4/4/1\no B\nusemtl n\nf 2/2/1 3/3/1 5/5/1\n", None ),
+    ( "quad", _HEAD_s + "o A\nusemtl m\nf 1/1/1 2/2/1 3/3/1 4/4/1\n", _HEAD_s + "o A\nusemtl m\nf 1/1/1 2/2/1 3/3/1\nf 1/1/1 3/3/1 4/4/1\n" ),
+    ( "ngon", _HEAD_s + "o A\nusemtl m\nf 1/1/1 2/2/1 3/3/1 5/5/1 4/4/1\n",
+      _HEAD_s + "o A\nusemtl m\nf 1/1/1 2/2/1 3/3/1\nf 1/1/1 3/3/1 5/5/1\nf 1/1/1 5/5/1 4/4/1\n" ),
+    ( "negative", _HEAD_s + "o A\nusemtl m\nf -5/-5/-1 -4/-4/-1 -3/-3/-1\n", _HEAD_s + "o A\nusemtl m\nf 1/1/1 2/2/1 3/3/1\n" ),
+    ( "no_vt", _HEAD_s + "o A\nusemtl m\nf 1//1 2//1 3//1\n", _HEAD_s + "vt 0.0 0.0\no A\nusemtl m\nf 1/6/1 2/6/1 3/6/1\n" ),
+    ( "crlf", ( _HEAD_s + "o A\nusemtl m\nf 1/1/1 2/2/1 3/3/1\nf 1/1/1 3/3/1 4/4/1\n" ).replace("\n", "\r\n"), None ),
+    ( "exponent", "v 1.5 2.5 1e-07\nv 0.5 0.5 0.5\nv 1.0 2E+02 1.0\nvt 0.0 0.0\nvn 0.0 1.0 0.0\no A\nusemtl m\nf 1/1/1 2/1/1 3/1/1\n", None ),
+]
+
+
+def _writeModel(folderDir_s:str, name_s:str, text_s:str) -> str:
+    fileDir_s = os.path.join(folderDir_s, name_s + ".obj")
+    with open(fileDir_s, "w", newline="") as file:
+        file.write(text_s)
+    return fileDir_s
+
+
+def _checkSame(old_d:dict, new_d:dict, name_s:str) -> None:
+    assert list(old_d) == list(new_d), name_s
+    for x in old_d:
+        assert old_d[x].mtl_s == new_d[x].mtl_s, (name_s, x)
+        for oldArr, newArr in zip( old_d[x].getTriangleArrays(), new_d[x].getTriangleArrays() ):
+            assert np.array_equal( oldArr.reshape(newArr.shape), newArr ), (name_s, x)
+
+
+def test_parse_obj_same_as_by_lines():
+    with tempfile.TemporaryDirectory() as folderDir_s:
+        for name_s, text_s, refText_s in _CASES_l:
+            fileDir_s = _writeModel(folderDir_s, name_s, text_s)
+            refFileDir_s = fileDir_s if refText_s is None else _writeModel(folderDir_s, name_s + "_ref", refText_s)
+            _checkSame( op.parseObjByLines(refFileDir_s), op.parseObj(fileDir_s), name_s )
+
+
+if __name__ == '__main__':
+    test_parse_obj_same_as_by_lines()
+    print("ok")
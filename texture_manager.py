@@ -1,81 +1,69 @@
 import os
 from typing import Optional, Tuple
-from multiprocessing import Process, Queue
-from queue import Empty
 from time import time
 
 from PIL import Image
 import numpy as np
-import OpenGL.GL as gl
+from lazy_gl import gl
 
 import const
+from asset_pool import AssetPool, JobPool, TaskError, JOB_TEXTURE_i
 
 
-class TextureLoader(Process):
-    def __init__(self, toMainQueue:Queue, toProcQueue:Queue):
-        super().__init__()
+class TextureLoader:
+    """
+    Job of AssetPool which decodes an image file on a worker and sends LoadedImageData.
+    success_b of it is False if the file could not be decoded.
+    """
+    def __init__(self, textureName_s:str, fileDir_s:str):
+        self.textureName_s = textureName_s
+        self.fileDir_s = fileDir_s
 
-        self.toMainQueue = toMainQueue
-        self.toProcQueue = toProcQueue
+        self.__result = None
+        self.__send = None
 
-        self.run_b = True
+    def start(self, pool:JobPool, send) -> None:
+        self.__send = send
+        self.__result = pool.apply_async( _decodeImage, (self.textureName_s, self.fileDir_s) )
 
-    def run(self):
-        while True:
-            try:
-                textureName_s, fileDir_s = self.toProcQueue.get_nowait()
-            except Empty:
-                pass
-            else:
-                self.__job(textureName_s, fileDir_s)
-
-    def terminate(self):
-        self.run_b = False
+    def poll(self) -> None:
         try:
-            super().terminate()
-        except AttributeError:
-            pass
+            imgData = self.__result.get()
+        except TaskError as e:
+            print( "(Error) Failed to decode texture '{}': {}".format(self.fileDir_s, e) )
+            imgData = LoadedImageData()
+            imgData.name_s = self.textureName_s
+            imgData.success_b = False
 
-        print("Thread 'TextureLoader' terminated")
+        self.__send(imgData)
 
-    def __job(self, textureName_s, fileDir_s):
-        imgData = self.__loadImg(fileDir_s)
-        imgData.name_s = textureName_s
-        imgData.success_b = True
-        imgData.checkIntegrity()
 
-        self.toMainQueue.put(imgData)
+def _decodeImage(textureName_s:str, fileDir_s:str) -> "LoadedImageData":
+    imgData = LoadedImageData()
+    imgData.name_s = textureName_s
 
-    @staticmethod
-    def __loadImg(fileDir_s) -> "LoadedImageData":
-        imgData = LoadedImageData()
-
-        aImg = Image.open(fileDir_s)
-        imgData.width_i = aImg.size[0]
-        imgData.height_i = aImg.size[1]
-        try:
-            image_bytes = aImg.tobytes("raw", "RGBA", 0, -1)
-            imgData.alpha_b = True
-        except ValueError:
-            image_bytes = aImg.tobytes("raw", "RGBX", 0, -1)
-            imgData.alpha_b = False
-        imgData.ndarray = np.array([x/255 for x in image_bytes], dtype=np.float32)
+    aImg = Image.open(fileDir_s)
+    imgData.width_i = aImg.size[0]
+    imgData.height_i = aImg.size[1]
+    try:
+        image_bytes = aImg.tobytes("raw", "RGBA", 0, -1)
+        imgData.alpha_b = True
+    except ValueError:
+        image_bytes = aImg.tobytes("raw", "RGBX", 0, -1)
+        imgData.alpha_b = False
+    imgData.ndarray = ( np.frombuffer(image_bytes, np.uint8) / 255 ).astype(np.float32)
 
-        return imgData
+    imgData.success_b = True
+    imgData.checkIntegrity()
+    return imgData
 
 
 class TextureManager:
-    def __init__(self):
+    def __init__(self, assetPool:AssetPool):
         self.__textures_d = {}
 
-        self.__toMainQueue = Queue()
-        self.__toProcQueue = Queue()
-        self.__texLoader = TextureLoader(self.__toMainQueue, self.__toProcQueue)
+        self.__assetPool = assetPool
         self.__waitingForImgData_i = 0
-        self.__texLoader.start()
-
-    def terminate(self):
-        self.__texLoader.terminate()
 
     def request(self, textureName_s:str) -> Optional[int]:
         self.__popTexNdarrayFromProc()
@@ -111,7 +99,7 @@ class TextureManager:
 
     def __load(self, textureName_s:str) -> None:
         fileDir_s = self.__findTexFile(textureName_s)
-        self.__toProcQueue.put( (textureName_s, fileDir_s) )
+        self.__assetPool.submit( JOB_TEXTURE_i, TextureLoader(textureName_s, fileDir_s) )
         self.__waitingForImgData_i += 1
 
         #
@@ -122,11 +110,8 @@ class TextureManager:
         if self.__waitingForImgData_i <= 0:
             return
         st = time()
-        try:
-            imgData = self.__toMainQueue.get_nowait()
-        except Empty:
-            pass
-        else:
+        imgData = self.__assetPool.popResult(JOB_TEXTURE_i)
+        if imgData is not None:
             if not imgData.success_b:
                 raise FileNotFoundError("Failed to load texture in Process")
 
@@ -1,4 +1,4 @@
-import OpenGL.GL as gl
+from lazy_gl import gl
 
 
 class UniformLocs: